@@ -1,19 +1,17 @@
 # Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
 
 # This script generates graphs with campaigns' target/actual spend, together with the value of the pacing signal
-import csv
 import datetime
-import sys
 
 import matplotlib.pyplot as plt
+import numpy as np
 
 import src.system.budget_pacing.mystique.mystique_constants as mystique_constants
 from src import configuration as config
 from src import constants as constants
+from src.statistics_store import StatisticsStore
 
-csv.field_size_limit(sys.maxsize)
-
-STATS_FILE_PATH = '../output/without-lifetime/Camp100-UntrackedF1-Traffic3000-0.6-Seed123/BudgetPacingAlgorithms.MYSTIQUE_LINEAR.csv'
+STATISTICS_STORE_PATH = '../output/without-lifetime/Camp100-UntrackedF1-Traffic3000-0.6-Seed123/BudgetPacingAlgorithms.MYSTIQUE_LINEAR'
 
 if __name__ == '__main__':
     # n_days = 7
@@ -30,30 +28,30 @@ if __name__ == '__main__':
     # plt.show()
     # exit()
 
-    with open(STATS_FILE_PATH, 'r') as f:
-        dict_reader = csv.DictReader(f)
-        campaigns_stats_list = list(dict_reader)
+    store = StatisticsStore(STATISTICS_STORE_PATH)
     # Choose a campaign
-    campaign_stats = campaigns_stats_list[60]
+    campaign_index = 60
     # Plotting
-    day_ended = config.num_days_to_simulate-1 if campaign_stats[constants.FIELD_DAY_ENDED] == '' else int(campaign_stats[constants.FIELD_DAY_ENDED])
-    run_period = day_ended - int(campaign_stats[constants.FIELD_DAY_STARTED]) + 1
+    day_started = int(store[constants.FIELD_DAY_STARTED][campaign_index])
+    day_ended = store[constants.FIELD_DAY_ENDED][campaign_index]
+    day_ended = config.num_days_to_simulate-1 if np.isnan(day_ended) else int(day_ended)
+    run_period = day_ended - day_started + 1
+    days = slice(day_started, day_ended + 1)
     # defining the x-axis of our plots
     time_as_dates = [datetime.datetime.fromtimestamp(ts * 60, tz=datetime.timezone.utc) for ts in
                      range(config.num_iterations_per_day * run_period)]
 
     fig, axs = plt.subplots(2, 1)
     # Plotting Spend
-    spend_history = eval(campaign_stats[mystique_constants.FIELD_SPEND_HISTORY])
-    daily_budget = eval(campaign_stats[constants.FIELD_DAILY_BUDGET])
-    target_spend_history = eval(campaign_stats[mystique_constants.FIELD_TARGET_SPEND_HISTORY])
+    # the per-minute (or per-hour) histories have (day, entry in day) axes
+    spend_history = store[mystique_constants.FIELD_SPEND_HISTORY][campaign_index, days]
+    daily_budget = store[constants.FIELD_DAILY_BUDGET][campaign_index]
+    target_spend_history = store[mystique_constants.FIELD_TARGET_SPEND_HISTORY][campaign_index, days]
 
     # represent each entry of each day an accumulated sum of the spend until that moment of the day
-    spend_history_accumulated = [[sum(sublist[: i + 1]) for i in range(len(sublist))] for sublist in spend_history]
-    # flatten spend history into a single list
-    spend_history_flat = [item for sublist in spend_history_accumulated for item in sublist]
+    spend_history_flat = np.cumsum(spend_history, axis=1).reshape(-1)
     axs[0].plot(time_as_dates, spend_history_flat, label='Spend')
-    target_spend_history_flat = [item*daily_budget for sublist in target_spend_history for item in sublist]
+    target_spend_history_flat = target_spend_history.reshape(-1) * daily_budget
     # since we store the target spend history on hourly basis, we draw the target spend of an hour as a value of the
     # last minute (index 59) of that hour.
     axs[0].plot(time_as_dates[59::60], target_spend_history_flat, label='Target Spend')
@@ -64,9 +62,8 @@ if __name__ == '__main__':
     axs[0].legend()
 
     # Plotting Pacing Signal
-    pacing_signal_history = eval(campaign_stats[mystique_constants.FIELD_PACING_SIGNAL_HISTORY])
-    # flatten pacing signal history into a single list
-    pacing_history_flat = [item for sublist in pacing_signal_history for item in sublist]
+    pacing_signal_history = store[mystique_constants.FIELD_PACING_SIGNAL_HISTORY][campaign_index, days]
+    pacing_history_flat = pacing_signal_history.reshape(-1)
     axs[1].plot(time_as_dates, pacing_history_flat, label='PS')
 
     axs[1].xaxis.set_major_formatter(plt.matplotlib.dates.DateFormatter('%d/%m\n%H:%M'))
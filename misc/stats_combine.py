@@ -26,6 +26,9 @@ if __name__ == '__main__':
     keys = []
     row_by_system = {}
     for stat_file in os.listdir(path=trial_folder):
+        if not stat_file.endswith('.csv'):
+            # skip the statistics stores
+            continue
         with open(f'{trial_folder}/{stat_file}', 'r') as f:
             csv_reader = csv.reader(f)
             rows_list = list(csv_reader)
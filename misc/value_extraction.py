@@ -3,12 +3,12 @@
 # This script extracts the 'total value' metric for each campaign
 import csv
 import os
-import sys
+
+import numpy as np
 
 import src.system.budget_pacing.mystique.mystique_constants as mystique_constants
 from src import constants as constants
-
-csv.field_size_limit(sys.maxsize)
+from src.statistics_store import METADATA_FILE_NAME, StatisticsStore
 
 RESULTS_FOLDER_PATH = ''
 
@@ -19,57 +19,33 @@ if __name__ == '__main__':
         if not folder.startswith('Camp'):
             continue
         total_value_by_pacing = {}
-        for stat_file in os.listdir(f'{RESULTS_FOLDER_PATH}/{folder}'):
-            if not stat_file.endswith('.csv') or stat_file.startswith('summary'):
+        for store_name in os.listdir(f'{RESULTS_FOLDER_PATH}/{folder}'):
+            if not os.path.exists(f'{RESULTS_FOLDER_PATH}/{folder}/{store_name}/{METADATA_FILE_NAME}'):
+                # not a statistics store
                 continue
             print(folder)
-            print(stat_file)
-            with open(f'{RESULTS_FOLDER_PATH}/{folder}/{stat_file}', 'r') as f:
-                dict_reader = csv.DictReader(f)
-                campaigns_stats_list = list(dict_reader)
-                output_file_path = f'{RESULTS_FOLDER_PATH}/{folder}/{stat_file.removesuffix(".csv") + "_new.csv"}'
-                if os.path.exists(output_file_path):
-                    continue
-                total_value_per_day = [0] * n_days
-                for campaign in campaigns_stats_list[:100]:
-                    total_value = 0
-                    daily_budget = eval(campaign['Daily Budget'])
-                    if stat_file.startswith('No_Pacing'):
-                        budget_util = eval(campaign['Budget Utilization'])
-                    else:
-                        spend_history = eval(campaign['Spend History'])
-                        ps_history = eval(campaign.get('Pacing Signal History'))
-
-                    for day in range(n_days):
-                        if stat_file.startswith('No_Pacing'):
-                            total_value += budget_util[day] * daily_budget
-                            total_value_per_day[day] += budget_util[day] * daily_budget
-                            continue
-                        for minute in range(constants.num_minutes_in_day):
-                            if spend_history[day][minute] == 0:
-                                continue
-                            if stat_file.removesuffix('.csv').endswith('soft'):
-                                ps = ps_history[day][
-                                    minute - 1] if minute > 0 else mystique_constants.max_ps if daily_budget > mystique_constants.min_daily_budget_for_high_initialization else mystique_constants.pacing_signal_for_initialization
-                                total_value += spend_history[day][minute] / ps_history[day][minute - 1]
-                                # the index offset in ps_history is because of how the ps history is stored
-                                total_value_per_day[day] += spend_history[day][minute] / ps_history[day][minute - 1]
-                            elif stat_file.removesuffix('.csv').endswith('hard'):
-                                total_value += spend_history[day][minute]
-                                total_value_per_day[day] += spend_history[day][minute]
-                            else:
-                                raise 'ERROR'
-                    campaign['Total Value'] = total_value
-                # with open(output_file_path, 'w') as new_f:
-                #     all_fields = campaigns_stats_list[0].keys()
-                #     w = csv.DictWriter(new_f, fieldnames=all_fields)
-                #     w.writeheader()
-                #     campaigns_stats_list[100]['Total Value'] = 'Total Value'
-                #     for day in range(n_days):
-                #         campaigns_stats_list[101 + day]['Total Value'] = total_value_per_day[day]
-                #     campaigns_stats_list[-1]['Total Value'] = sum(total_value_per_day)
-                #     w.writerows(campaigns_stats_list)
-            total_value_by_pacing[stat_file.removesuffix('.csv')] = sum(total_value_per_day)
+            print(store_name)
+            store = StatisticsStore(f'{RESULTS_FOLDER_PATH}/{folder}/{store_name}')
+            # the statistics of days in which the campaigns didn't run are NaN
+            daily_budgets = store[constants.FIELD_DAILY_BUDGET][:100]
+            if store_name.startswith('No_Pacing'):
+                budget_util = store[constants.FIELD_BUDGET_UTILIZATION][:100, :n_days]
+                total_value_per_day = np.nansum(budget_util * daily_budgets[:, np.newaxis], axis=0)
+            else:
+                spend_history = store[mystique_constants.FIELD_SPEND_HISTORY][:100, :n_days]
+                if store_name.endswith('soft'):
+                    ps_history = store[mystique_constants.FIELD_PACING_SIGNAL_HISTORY][:100, :n_days]
+                    # the spend of each minute is divided by the ps of the previous minute, because of how the ps
+                    # history is stored
+                    previous_ps = np.roll(ps_history, 1, axis=2)
+                    value = np.divide(spend_history, previous_ps, out=np.zeros_like(spend_history),
+                                      where=spend_history > 0)
+                elif store_name.endswith('hard'):
+                    value = np.where(spend_history > 0, spend_history, 0)
+                else:
+                    raise Exception('ERROR')
+                total_value_per_day = value.sum(axis=(0, 2))
+            total_value_by_pacing[store_name] = total_value_per_day.sum()
         summary_file_name = \
         list(filter(lambda name: name.startswith('summary') and name.endswith('.csv'), os.listdir(f'{RESULTS_FOLDER_PATH}/{folder}')))[0]
         with open(f'{RESULTS_FOLDER_PATH}/{folder}/{summary_file_name}', 'r') as summary_f:
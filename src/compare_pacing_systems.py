@@ -0,0 +1,90 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+# Runs the simulation with several pacing systems (and without pacing) concurrently, in a pool of worker processes.
+# The campaigns are generated once, and their configurations are sent to each worker process only once, when the
+# process starts. The statistics of each pacing system are written into the trial folder of the current configuration,
+# exactly as src/main.py writes them.
+# In the common random numbers mode, the random inputs (auctions and bids) are recorded first, by a pre-pass that only
+# draws and saves them without running the auctions, and are then replayed by the simulations of all the algorithms
+# (which run concurrently), so that all the algorithms face the same inputs.
+# Usage (from the src directory):
+# python compare_pacing_systems.py [--algorithms linear-soft none ...] [--workers N] [--common-random-numbers]
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
+
+import src.configuration as config
+from src import simulation_runner, system_generation_utils
+from src.constants import BudgetPacingAlgorithms
+from src.system_generation_utils import CampaignConfiguration
+
+NO_PACING = 'none'
+COMMON_RANDOM_NUMBERS_FOLDER_NAME = 'common_random_numbers'
+ALL_PACING_ALGORITHMS = [None] + list(BudgetPacingAlgorithms)
+
+# the campaign configurations of the worker process, set once by _initialize_worker
+_campaign_configurations = None
+
+
+def _initialize_worker(campaign_configurations: list[CampaignConfiguration]):
+    global _campaign_configurations
+    _campaign_configurations = campaign_configurations
+
+
+def _run_worker(pacing_algorithm: Optional[BudgetPacingAlgorithms], trial_folder: str, num_iterations: int,
+                replay_random_numbers_path: str = None) -> str:
+    return simulation_runner.run_and_write_statistics(pacing_algorithm=pacing_algorithm,
+                                                      campaign_configurations=_campaign_configurations,
+                                                      trial_folder=trial_folder, num_iterations=num_iterations,
+                                                      replay_random_numbers_path=replay_random_numbers_path)
+
+
+def run_pacing_comparison(pacing_algorithms: list[Optional[BudgetPacingAlgorithms]], max_workers: int = None,
+                          output_folder_path: str = simulation_runner.OUTPUT_FOLDER_PATH,
+                          num_iterations: int = None,
+                          common_random_numbers: bool = False) -> dict[Optional[BudgetPacingAlgorithms], str]:
+    """Runs the simulation with each of the pacing algorithms (None means without pacing), and returns the path of
+    the output file of each algorithm"""
+    if max_workers is None:
+        max_workers = min(len(pacing_algorithms), os.cpu_count())
+    campaign_configurations = system_generation_utils.generate_campaign_configurations(config.num_campaigns)
+    trial_folder = simulation_runner.create_trial_folder(output_folder_path)
+    output_file_paths = {}
+    replay_random_numbers_path = None
+    if common_random_numbers:
+        # the random inputs are recorded before any of the algorithms can replay them, by a pre-pass that is much
+        # cheaper than a simulation (it doesn't run the auctions nor the pacing)
+        replay_random_numbers_path = f'{trial_folder}/{COMMON_RANDOM_NUMBERS_FOLDER_NAME}'
+        simulation_runner.record_random_numbers(campaign_configurations, replay_random_numbers_path,
+                                                num_iterations=num_iterations)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_initialize_worker,
+                             initargs=(campaign_configurations,)) as executor:
+        futures = {executor.submit(_run_worker, pacing_algorithm, trial_folder, num_iterations,
+                                   replay_random_numbers_path=replay_random_numbers_path): pacing_algorithm
+                   for pacing_algorithm in pacing_algorithms}
+        for future in as_completed(futures):
+            output_file_paths[futures[future]] = future.result()
+            print(f'Finished {futures[future] or "No_Pacing"}: {output_file_paths[futures[future]]}')
+    return output_file_paths
+
+
+def _parse_pacing_algorithm(name: str) -> Optional[BudgetPacingAlgorithms]:
+    return None if name == NO_PACING else BudgetPacingAlgorithms(name)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the simulation with several pacing systems concurrently')
+    parser.add_argument('--algorithms', nargs='+', type=_parse_pacing_algorithm,
+                        default=ALL_PACING_ALGORITHMS,
+                        help=f'the pacing algorithms to run ({", ".join(a.value for a in BudgetPacingAlgorithms)}, '
+                             f'or {NO_PACING} for running without pacing). By default, all of them are run')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='the number of worker processes (by default, up to the number of cores)')
+    parser.add_argument('--output', default=simulation_runner.OUTPUT_FOLDER_PATH,
+                        help='the folder in which the trial folder is created')
+    parser.add_argument('--common-random-numbers', action='store_true',
+                        help='record the auctions and bids once, and replay them for all the algorithms')
+    args = parser.parse_args()
+    run_pacing_comparison(pacing_algorithms=args.algorithms, max_workers=args.workers, output_folder_path=args.output,
+                          common_random_numbers=args.common_random_numbers)
@@ -5,14 +5,30 @@ import os
 
 from scipy import stats
 
-from src.constants import AuctionType
+from src.constants import AuctionType, AuctionEngine
 from src.system.daily_cosine import DailyCosineWave
 
 # General
 num_days_to_simulate = 7
 num_iterations_per_day = 1440
 auction_type = AuctionType.FP
-output_only_summarized_statistics = False
+batch_auction_generation = False  # Generate the auctions of each iteration with one vectorized draw per user property
+auction_engine = AuctionEngine.REFERENCE  # The batched engine always uses batch auction generation
+# The statistics are written into a columnar statistics store (see src/statistics_store.py), and optionally exported
+# into a CSV file, which by default holds only the summarized (global) statistics
+output_csv_statistics = True
+output_only_summarized_statistics = True
+# Write the statistics of each finished day to disk and release the detailed histories from memory (only daily totals
+# are kept), so that long simulations run in bounded memory. The statistics store is assembled from the written days
+stream_statistics = False
+
+# Auction traces
+# When set, the auctions are replayed from the trace in the given folder (see src/system/auction_trace.py), instead of
+# being generated from traffic_mean_cos_wave and user_properties
+auction_trace_path = None
+# Maps the user properties of the trace onto user_properties, as {feature: trace feature} or
+# {feature: (trace feature, {trace value: value})}. By default, the user properties of the trace with the same names
+auction_trace_user_properties_mapping = None
 
 # Budget Pacing System
 pacing_algorithm = os.environ.get('PACING_SYSTEM')
@@ -26,6 +42,9 @@ max_bid_factor_of_bids_mean = 50  # Defines the maximal bid for campaigns as a f
 
 # Untracked bids
 factor_untracked_bids = 2
+# Sample only the two highest untracked bids of each auction directly from their order-statistic distribution,
+# instead of sampling all the untracked bids. Only the top bids can affect the results of FP and GSP auctions.
+untracked_bids_order_statistics = False
 
 # Auctions
 # # Targeting Groups
@@ -75,4 +94,7 @@ daily_budgets_log_distribution = stats.gamma(a=3.77, loc=0.0, scale=1.0)
 # Set the following seed value to generate consistent campaigns across simulations
 campaign_generation_seed_value = 123
 
+# the number of untracked bids that are sampled at once
 bid_sampling_batch_size = 100000
+# the number of bids of each campaign that are sampled at once (into the campaign's row in the pool of its distribution)
+bid_sampling_block_size = 4096
@@ -18,6 +18,11 @@ class AuctionType(Enum):
     GSP = 2
 
 
+class AuctionEngine(Enum):
+    REFERENCE = 1  # runs the auctions one by one
+    BATCHED = 2  # resolves all the auctions of an iteration at once
+
+
 # output metrics field names
 FIELD_CAMPAIGN_ID = 'Campaign'
 FIELD_DAILY_BUDGET = 'Daily Budget'
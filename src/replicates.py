@@ -0,0 +1,170 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+# Runs replicates of the same configuration (the same campaigns and pacing algorithm), each with a different seed of
+# the simulation's random state, in a pool of worker processes.
+# The global statistics of the replicates are aggregated online, with Welford's algorithm, into a mean and a variance
+# per day and overall. New replicates are launched only until the confidence intervals of the chosen overall metrics
+# are narrow enough, relative to their means.
+# Usage (from the src directory): python replicates.py [--algorithm linear-soft] [--precision 0.01] [--workers N]
+import argparse
+import csv
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Optional
+
+import numpy as np
+from scipy import stats
+
+import src.configuration as config
+from src import constants, simulation_runner, system_generation_utils
+from src.constants import BudgetPacingAlgorithms
+from src.system_generation_utils import CampaignConfiguration
+
+DEFAULT_METRICS = [constants.FIELD_CPM, constants.FIELD_OVERSPEND, constants.FIELD_SPEND]
+FIELD_NUM_REPLICATES = '# Replicates'
+MEAN_SUFFIX = ' Mean'
+STD_SUFFIX = ' Std'
+CI_SUFFIX = ' CI Half Width'
+
+
+class RunningStatistics:
+    """The mean and the variance of a stream of values, updated with Welford's algorithm"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._sum_squared_deviations = 0.0
+
+    def update(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._sum_squared_deviations += delta * (value - self.mean)
+
+    def variance(self) -> float:
+        """The sample variance (nan for less than two values)"""
+        if self.count < 2:
+            return math.nan
+        return self._sum_squared_deviations / (self.count - 1)
+
+    def confidence_interval_half_width(self, confidence: float) -> float:
+        """The half width of the confidence interval of the mean, based on Student's t distribution"""
+        if self.count < 2:
+            return math.inf
+        return stats.t.ppf((1 + confidence) / 2, df=self.count - 1) * math.sqrt(self.variance() / self.count)
+
+
+class ReplicateStatistics:
+    """Running statistics of each numeric field of the global statistics, per day and overall"""
+
+    def __init__(self):
+        self.num_replicates = 0
+        self.statistics: dict[object, dict[str, RunningStatistics]] = {}  # day id -> field -> statistics
+
+    def update(self, global_statistics: list[dict[str, object]]):
+        self.num_replicates += 1
+        for row in global_statistics:
+            day_statistics = self.statistics.setdefault(row[constants.FIELD_DAY_ID], {})
+            for field, value in row.items():
+                # days without wins have no CPM
+                if field != constants.FIELD_DAY_ID and value is not None:
+                    day_statistics.setdefault(field, RunningStatistics()).update(value)
+
+    def overall(self, field: str) -> RunningStatistics:
+        return self.statistics[constants.OVERALL_STATISTICS_ROW_NAME][field]
+
+    def is_precise(self, metrics: list[str], relative_precision: float, confidence: float) -> bool:
+        """Whether the half width of the confidence interval of each of the overall metrics is at most
+        relative_precision of its mean"""
+        for metric in metrics:
+            statistics = self.overall(metric)
+            if statistics.confidence_interval_half_width(confidence) > relative_precision * abs(statistics.mean):
+                return False
+        return True
+
+    def as_csv_rows(self, confidence: float) -> list[dict[str, object]]:
+        rows = []
+        for day, day_statistics in self.statistics.items():
+            row = {constants.FIELD_DAY_ID: day, FIELD_NUM_REPLICATES: self.num_replicates}
+            for field, statistics in day_statistics.items():
+                row[field + MEAN_SUFFIX] = statistics.mean
+                row[field + STD_SUFFIX] = math.sqrt(statistics.variance())
+                row[field + CI_SUFFIX] = statistics.confidence_interval_half_width(confidence)
+            rows.append(row)
+        return rows
+
+
+def _run_replicate(pacing_algorithm: Optional[BudgetPacingAlgorithms],
+                   campaign_configurations: list[CampaignConfiguration], seed: np.random.SeedSequence,
+                   num_iterations: int) -> list[dict[str, object]]:
+    return simulation_runner.run_and_get_global_statistics(pacing_algorithm=pacing_algorithm,
+                                                           campaign_configurations=campaign_configurations,
+                                                           num_iterations=num_iterations, seed=seed)
+
+
+def run_replicates(pacing_algorithm: Optional[BudgetPacingAlgorithms], max_replicates: int, min_replicates: int = 3,
+                   metrics: list[str] = None, relative_precision: float = 0.01, confidence: float = 0.95,
+                   seed: int = 0, max_workers: int = None, num_iterations: int = None) -> ReplicateStatistics:
+    """Runs replicates until the confidence intervals of the overall metrics are within relative_precision of their
+    means (or until max_replicates replicates have been run). The replicates that are still running when the
+    precision is reached are also aggregated."""
+    assert 2 <= min_replicates <= max_replicates
+    if metrics is None:
+        metrics = DEFAULT_METRICS
+    campaign_configurations = system_generation_utils.generate_campaign_configurations(config.num_campaigns)
+    # spawned seed sequences have independent streams
+    seeds = np.random.SeedSequence(seed).spawn(max_replicates)
+    replicate_statistics = ReplicateStatistics()
+    if max_workers is None:
+        max_workers = os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # keep only as many replicates in flight as there are workers, so that no replicate is launched in vain
+        running = set()
+        is_precise = False
+        while True:
+            while seeds and not is_precise and len(running) < max_workers:
+                running.add(executor.submit(_run_replicate, pacing_algorithm, campaign_configurations, seeds.pop(0),
+                                            num_iterations))
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                replicate_statistics.update(future.result())
+            is_precise = replicate_statistics.num_replicates >= min_replicates and replicate_statistics.is_precise(
+                metrics=metrics, relative_precision=relative_precision, confidence=confidence)
+    return replicate_statistics
+
+
+def write_replicate_statistics(replicate_statistics: ReplicateStatistics, output_file_path: str, confidence: float):
+    rows = replicate_statistics.as_csv_rows(confidence)
+    with open(output_file_path, 'w') as f:
+        w = csv.DictWriter(f, fieldnames=list(dict.fromkeys(field for row in rows for field in row)))
+        w.writeheader()
+        w.writerows(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run replicates of the simulation until the overall metrics are '
+                                                 'estimated precisely enough')
+    parser.add_argument('--algorithm', default=config.pacing_algorithm,
+                        help='the pacing algorithm (by default, the one of the configuration)')
+    parser.add_argument('--max-replicates', type=int, default=30)
+    parser.add_argument('--min-replicates', type=int, default=3)
+    parser.add_argument('--metrics', nargs='+', default=DEFAULT_METRICS)
+    parser.add_argument('--precision', type=float, default=0.01,
+                        help='the maximal half width of the confidence intervals, as a fraction of the means')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--seed', type=int, default=0, help='the seed from which the replicate seeds are derived')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='the number of worker processes (by default, the number of cores)')
+    args = parser.parse_args()
+    algorithm = BudgetPacingAlgorithms(args.algorithm) if args.algorithm else None
+    result = run_replicates(pacing_algorithm=algorithm, max_replicates=args.max_replicates,
+                            min_replicates=args.min_replicates, metrics=args.metrics,
+                            relative_precision=args.precision, confidence=args.confidence, seed=args.seed,
+                            max_workers=args.workers)
+    trial_folder = simulation_runner.create_trial_folder()
+    output_file_path = f'{trial_folder}/replicates-{algorithm.value if algorithm else "No_Pacing"}.csv'
+    write_replicate_statistics(result, output_file_path, confidence=args.confidence)
+    print(f'{result.num_replicates} replicates: {output_file_path}')
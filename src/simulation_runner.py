@@ -0,0 +1,215 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import contextlib
+import csv
+import os
+import shutil
+from typing import Iterator, Optional, Union
+
+import numpy as np
+
+import src.configuration as config
+from src import statistics_store, system_generation_utils
+from src.constants import AuctionEngine, BudgetPacingAlgorithms
+from src.system.auction_trace import AuctionTraceReader, AuctionTraceWriter
+from src.system.common_random_numbers import CommonRandomNumbersRecorder, CommonRandomNumbersReplayer
+from src.system.daily_cosine import DailyCosineWave
+from src.system.marketplace import Marketplace
+from src.system.serving_system import ServingSystem
+from src.system.simulation_context import SimulationContext
+from src.system.statistics_sink import StatisticsSink
+from src.system_generation_utils import CampaignConfiguration
+
+OUTPUT_FOLDER_PATH = '../output'
+# the folder of the daily statistics, inside the statistics store, while the simulation runs
+STATISTICS_SINK_FOLDER_NAME = 'days'
+
+# configuration overrides that don't correspond to a single configuration variable
+TRAFFIC_DC = 'traffic_dc'
+TRAFFIC_AMPLITUDE = 'traffic_amplitude'
+
+
+@contextlib.contextmanager
+def configuration_overrides(overrides: dict[str, object]) -> Iterator[None]:
+    """Temporarily overrides variables of the configuration module.
+    The DC and amplitude of the traffic cosine wave can be overridden with TRAFFIC_DC and TRAFFIC_AMPLITUDE"""
+    overrides = dict(overrides)
+    if TRAFFIC_DC in overrides or TRAFFIC_AMPLITUDE in overrides:
+        traffic_mean_cos_wave = overrides.get('traffic_mean_cos_wave', config.traffic_mean_cos_wave)
+        overrides['traffic_mean_cos_wave'] = DailyCosineWave(
+            dc=overrides.pop(TRAFFIC_DC, traffic_mean_cos_wave.dc),
+            amplitude=overrides.pop(TRAFFIC_AMPLITUDE, traffic_mean_cos_wave.amplitude),
+            phase=traffic_mean_cos_wave.phase)
+    for name in overrides:
+        if not hasattr(config, name):
+            raise Exception(f'unknown configuration variable: {name}')
+    original_values = {name: getattr(config, name) for name in overrides}
+    try:
+        for name, value in overrides.items():
+            setattr(config, name, value)
+        yield
+    finally:
+        for name, value in original_values.items():
+            setattr(config, name, value)
+
+
+def build_simulation(pacing_algorithm: Optional[BudgetPacingAlgorithms],
+                     campaign_configurations: list[CampaignConfiguration],
+                     context: SimulationContext = None,
+                     random_numbers_recorder: CommonRandomNumbersRecorder = None,
+                     random_numbers_replayer: CommonRandomNumbersReplayer = None,
+                     auction_trace_writer: AuctionTraceWriter = None,
+                     statistics_sink: StatisticsSink = None) -> Marketplace:
+    campaigns = system_generation_utils.build_campaigns(campaign_configurations, context=context)
+    pacing_system = system_generation_utils.generate_pacing_system(pacing_algorithm, context=context)
+    serving_system = ServingSystem(pacing_system=pacing_system, tracked_campaigns=campaigns, context=context,
+                                   statistics_sink=statistics_sink)
+    # common random numbers are supported only by the batched auction engine
+    common_random_numbers = random_numbers_recorder is not None or random_numbers_replayer is not None
+    auction_trace = None
+    if config.auction_trace_path is not None and random_numbers_replayer is None:
+        auction_trace = AuctionTraceReader(config.auction_trace_path, features=list(config.user_properties),
+                                           user_properties_mapping=config.auction_trace_user_properties_mapping)
+    return Marketplace(serving_system=serving_system,
+                       auction_type=config.auction_type,
+                       traffic_mean_cos_wave=config.traffic_mean_cos_wave,
+                       batch_auction_generation=config.batch_auction_generation,
+                       auction_engine=AuctionEngine.BATCHED if common_random_numbers else config.auction_engine,
+                       random_numbers_recorder=random_numbers_recorder,
+                       random_numbers_replayer=random_numbers_replayer,
+                       auction_trace=auction_trace,
+                       auction_trace_writer=auction_trace_writer)
+
+
+def run_simulation(marketplace: Marketplace, num_iterations: int = None, print_progress: bool = True):
+    if num_iterations is None:
+        num_iterations = config.num_days_to_simulate * config.num_iterations_per_day
+    clock = marketplace.context.clock
+    for _ in range(num_iterations):
+        if print_progress and clock.minute_in_hour() == 0:
+            print(f'Day: {clock.days()}, Hour: {clock.hour_in_day()}')
+        marketplace.run_iteration()
+
+
+def create_trial_folder(output_folder_path: str = OUTPUT_FOLDER_PATH) -> str:
+    # if the current configuration's directory is not present then create it.
+    trial_folder = (f'{output_folder_path}/'
+                    f'Camp{config.num_campaigns}-UntrackedF{config.factor_untracked_bids}-'
+                    f'Traffic{config.traffic_mean_cos_wave.dc}-{config.traffic_mean_cos_wave.amplitude}-'
+                    f'Seed{config.campaign_generation_seed_value}')
+    os.makedirs(trial_folder, exist_ok=True)
+    return trial_folder
+
+
+def _get_algorithm_name(pacing_algorithm: Optional[BudgetPacingAlgorithms]) -> str:
+    # the algorithm may also be given as a string (e.g. from the PACING_SYSTEM environment variable)
+    return BudgetPacingAlgorithms(pacing_algorithm).value if pacing_algorithm else 'No_Pacing'
+
+
+def get_output_file_path(trial_folder: str, pacing_algorithm: Optional[BudgetPacingAlgorithms]) -> str:
+    return f'{trial_folder}/{_get_algorithm_name(pacing_algorithm)}.csv'
+
+
+def get_statistics_store_path(trial_folder: str, pacing_algorithm: Optional[BudgetPacingAlgorithms]) -> str:
+    return f'{trial_folder}/{_get_algorithm_name(pacing_algorithm)}'
+
+
+def create_statistics_sink(trial_folder: str,
+                           pacing_algorithm: Optional[BudgetPacingAlgorithms]) -> Optional[StatisticsSink]:
+    """Returns the sink of the daily statistics of the simulation, or None if the statistics aren't streamed"""
+    if not config.stream_statistics:
+        return None
+    return StatisticsSink(f'{get_statistics_store_path(trial_folder, pacing_algorithm)}/{STATISTICS_SINK_FOLDER_NAME}')
+
+
+def write_all_statistics(serving_system: ServingSystem, trial_folder: str,
+                         pacing_algorithm: Optional[BudgetPacingAlgorithms]) -> str:
+    """Writes the statistics store of the simulation, and the CSV export if enabled.
+    Returns the path of the CSV file, or of the statistics store if the CSV export is disabled"""
+    store_path = get_statistics_store_path(trial_folder, pacing_algorithm)
+    if serving_system.statistics_sink is not None:
+        statistics_store.write_statistics_store_from_sink(serving_system, serving_system.statistics_sink.folder_path,
+                                                          store_path)
+        # the daily statistics are in the store now
+        shutil.rmtree(serving_system.statistics_sink.folder_path)
+    else:
+        statistics_store.write_statistics_store(serving_system, store_path)
+    if not config.output_csv_statistics:
+        return store_path
+    output_file_path = get_output_file_path(trial_folder, pacing_algorithm)
+    write_statistics(serving_system, output_file_path)
+    return output_file_path
+
+
+def write_statistics(serving_system: ServingSystem, output_file_path: str):
+    with open(output_file_path, 'w') as f:
+        if not config.output_only_summarized_statistics:
+            # Get the per-campaign output metrics as rows
+            statistics_per_campaign = serving_system.get_statistics_per_campaign_csv_rows()
+            all_fields = statistics_per_campaign[0].keys()
+            w = csv.DictWriter(f, fieldnames=all_fields)
+            w.writeheader()
+            w.writerows(statistics_per_campaign)
+        # Append global statistics to csv file
+        global_statistics = serving_system.get_global_statistics_csv_rows()
+        w = csv.DictWriter(f, fieldnames=global_statistics[0].keys())
+        w.writeheader()
+        w.writerows(global_statistics)
+
+
+def run_and_write_statistics(pacing_algorithm: Optional[BudgetPacingAlgorithms],
+                             campaign_configurations: list[CampaignConfiguration], trial_folder: str,
+                             num_iterations: int = None, record_random_numbers_path: str = None,
+                             replay_random_numbers_path: str = None, record_auction_trace_path: str = None) -> str:
+    """Runs a whole simulation in a context of its own, and returns the path of its output file.
+    The random inputs of the simulation can be recorded into (or replayed from) a common random numbers folder, and
+    its auctions can be recorded into an auction trace"""
+    recorder = None
+    if record_random_numbers_path is not None:
+        recorder = CommonRandomNumbersRecorder(record_random_numbers_path, features=list(config.user_properties))
+    replayer = None
+    if replay_random_numbers_path is not None:
+        replayer = CommonRandomNumbersReplayer(replay_random_numbers_path)
+    auction_trace_writer = None
+    if record_auction_trace_path is not None:
+        auction_trace_writer = AuctionTraceWriter(record_auction_trace_path, features=list(config.user_properties))
+    marketplace = build_simulation(pacing_algorithm=pacing_algorithm,
+                                   campaign_configurations=campaign_configurations,
+                                   context=SimulationContext(),
+                                   random_numbers_recorder=recorder,
+                                   random_numbers_replayer=replayer,
+                                   auction_trace_writer=auction_trace_writer,
+                                   statistics_sink=create_statistics_sink(trial_folder, pacing_algorithm))
+    run_simulation(marketplace, num_iterations=num_iterations, print_progress=False)
+    if recorder is not None:
+        recorder.close()
+    if auction_trace_writer is not None:
+        auction_trace_writer.close()
+    return write_all_statistics(marketplace.serving_system, trial_folder, pacing_algorithm)
+
+
+def record_random_numbers(campaign_configurations: list[CampaignConfiguration], random_numbers_path: str,
+                          num_iterations: int = None):
+    """Records the random inputs of a simulation into a common random numbers folder, without running its auctions
+    (the inputs don't depend on the outcomes of the auctions, nor on the pacing algorithm)"""
+    if num_iterations is None:
+        num_iterations = config.num_days_to_simulate * config.num_iterations_per_day
+    recorder = CommonRandomNumbersRecorder(random_numbers_path, features=list(config.user_properties))
+    marketplace = build_simulation(pacing_algorithm=None, campaign_configurations=campaign_configurations,
+                                   context=SimulationContext(), random_numbers_recorder=recorder)
+    for _ in range(num_iterations):
+        marketplace.record_iteration()
+    recorder.close()
+
+
+def run_and_get_global_statistics(pacing_algorithm: Optional[BudgetPacingAlgorithms],
+                                  campaign_configurations: list[CampaignConfiguration],
+                                  num_iterations: int = None,
+                                  seed: Union[int, np.random.SeedSequence] = None) -> list[dict[str, object]]:
+    """Runs a whole simulation in a context of its own, and returns its global statistics.
+    The seed, if given, seeds the random streams of the simulation (but not the generation of the campaigns)"""
+    marketplace = build_simulation(pacing_algorithm=pacing_algorithm,
+                                   campaign_configurations=campaign_configurations,
+                                   context=SimulationContext(seed=seed))
+    run_simulation(marketplace, num_iterations=num_iterations, print_progress=False)
+    return marketplace.serving_system.get_global_statistics_csv_rows()
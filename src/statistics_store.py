@@ -0,0 +1,184 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import json
+import math
+import os
+from typing import Callable, Optional
+
+import numpy as np
+
+from src import constants
+from src.system import statistics_sink
+from src.system.serving_system import ServingSystem
+
+METADATA_FILE_NAME = 'metadata.json'
+AXIS_CAMPAIGN = 'campaign'
+AXIS_DAY = 'day'
+AXIS_HOUR = 'hour'
+AXIS_MINUTE = 'minute'
+AXIS_ENTRY = 'entry'
+
+
+# The statistics store keeps the statistics of a simulation as a folder with an .npy file per metric, instead of rows
+# of a CSV file in which whole histories are stringified into single cells.
+# The per-campaign metrics are arrays with a campaign axis (in the order of campaign_ids), and for metrics that are
+# kept per day, a day axis (the day of the simulation), and an axis of the entries of each day (e.g. the minutes of
+# the day for the spend history). Days in which a campaign didn't run, and missing values, are NaN.
+# The metadata.json file holds the ids of the campaigns, the file and axes of each metric, and the global statistics
+# (which are small, and kept as rows).
+# The loader memory-maps each metric only when it is accessed, so a single metric of a large simulation is loaded
+# without reading the rest of the statistics.
+def write_statistics_store(serving_system: ServingSystem, folder_path: str):
+    os.makedirs(folder_path, exist_ok=True)
+    rows = serving_system.get_statistics_per_campaign_csv_rows()
+    num_days = serving_system.context.clock.days()
+    campaign_ids = [row.pop(constants.FIELD_CAMPAIGN_ID) for row in rows]
+    first_days = [row[constants.FIELD_DAY_STARTED] for row in rows]
+    metrics = {}
+    for field in dict.fromkeys(field for row in rows for field in row):
+        values = [row.get(field) for row in rows]
+
+        def fill(metric: np.ndarray):
+            for campaign_index, value in enumerate(values):
+                _fill_campaign_values(metric, campaign_index, value, first_days[campaign_index])
+        metrics[field] = _write_metric(folder_path, field, _metric_shape(values, num_days), fill)
+    _write_metadata(serving_system, folder_path, campaign_ids, num_days, metrics)
+
+
+def write_statistics_store_from_sink(serving_system: ServingSystem, sink_folder_path: str, folder_path: str):
+    """Writes the statistics store of a simulation whose daily statistics were written into a statistics sink.
+    The per-day metrics are read from the sink one day at a time"""
+    os.makedirs(folder_path, exist_ok=True)
+    # the campaign-level statistics are kept in memory, while the per-day statistics were released
+    rows = [{field: value for field, value in row.items() if not isinstance(value, list)}
+            for row in serving_system.get_statistics_per_campaign_csv_rows()]
+    num_days = serving_system.context.clock.days()
+    campaign_ids = [row.pop(constants.FIELD_CAMPAIGN_ID) for row in rows]
+    campaign_indices = {campaign_id: i for i, campaign_id in enumerate(campaign_ids)}
+    metrics = {}
+    for field in dict.fromkeys(field for row in rows for field in row):
+        values = [row.get(field) for row in rows]
+
+        def fill(metric: np.ndarray):
+            for campaign_index, value in enumerate(values):
+                _fill_campaign_values(metric, campaign_index, value, None)
+        metrics[field] = _write_metric(folder_path, field, (len(campaign_ids),), fill)
+    days = [day for day in statistics_sink.written_days(sink_folder_path) if day < num_days]
+    # the number of entries in a day of each per-day metric (None for metrics with a single value per day)
+    entries_per_day = {}
+    for day in days:
+        for field, day_values in statistics_sink.load_day_statistics(sink_folder_path, day)[1].items():
+            if day_values.ndim == 1:
+                entries_per_day.setdefault(field, None)
+            else:
+                entries_per_day[field] = max(entries_per_day.get(field) or 0, day_values.shape[1])
+    for field, num_entries in entries_per_day.items():
+        shape = (len(campaign_ids), num_days) if num_entries is None else (len(campaign_ids), num_days, num_entries)
+
+        def fill(metric: np.ndarray):
+            for day in days:
+                day_campaign_ids, day_statistics = statistics_sink.load_day_statistics(sink_folder_path, day)
+                if field not in day_statistics:
+                    continue
+                day_values = day_statistics[field]
+                indices = [campaign_indices[campaign_id] for campaign_id in day_campaign_ids]
+                if day_values.ndim == 1:
+                    metric[indices, day] = day_values
+                else:
+                    metric[indices, day, :day_values.shape[1]] = day_values
+        metrics[field] = _write_metric(folder_path, field, shape, fill)
+    _write_metadata(serving_system, folder_path, campaign_ids, num_days, metrics)
+
+
+def _write_metric(folder_path: str, field: str, shape: tuple[int, ...],
+                  fill: Callable[[np.ndarray], None]) -> dict[str, object]:
+    """Writes a metric of the given shape (NaN, unless filled by the fill function), and returns its metadata"""
+    file_name = statistics_sink.metric_file_name(field)
+    metric = np.lib.format.open_memmap(f'{folder_path}/{file_name}', mode='w+', dtype=np.float64, shape=shape)
+    metric[:] = np.nan
+    fill(metric)
+    metric.flush()
+    del metric
+    return {'file': file_name, 'axes': _metric_axes(shape)}
+
+
+def _write_metadata(serving_system: ServingSystem, folder_path: str, campaign_ids: list[str], num_days: int,
+                    metrics: dict[str, dict[str, object]]):
+    with open(f'{folder_path}/{METADATA_FILE_NAME}', 'w') as f:
+        json.dump({'campaign_ids': campaign_ids, 'num_days': num_days, 'metrics': metrics,
+                   'global_statistics': serving_system.get_global_statistics_csv_rows()}, f, default=float)
+
+
+class StatisticsStore:
+    def __init__(self, folder_path: str):
+        with open(f'{folder_path}/{METADATA_FILE_NAME}') as f:
+            metadata = json.load(f)
+        self.folder_path = folder_path
+        self.campaign_ids: list[str] = metadata['campaign_ids']
+        self.num_days: int = metadata['num_days']
+        self.global_statistics: list[dict[str, object]] = metadata['global_statistics']
+        self._metrics: dict[str, dict] = metadata['metrics']
+        self._campaign_indices = {campaign_id: i for i, campaign_id in enumerate(self.campaign_ids)}
+        self._loaded_metrics: dict[str, np.ndarray] = {}
+
+    def fields(self) -> list[str]:
+        return list(self._metrics)
+
+    def axes(self, field: str) -> list[str]:
+        return self._metrics[field]['axes']
+
+    def campaign_index(self, campaign_id: str) -> int:
+        return self._campaign_indices[campaign_id]
+
+    def __contains__(self, field: str) -> bool:
+        return field in self._metrics
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        """Returns the (read-only, memory-mapped) array of the metric"""
+        if field not in self._loaded_metrics:
+            if field not in self._metrics:
+                raise Exception(f'metric {field} is not in the statistics store')
+            self._loaded_metrics[field] = np.load(f'{self.folder_path}/{self._metrics[field]["file"]}', mmap_mode='r')
+        return self._loaded_metrics[field]
+
+    def campaign_metric(self, field: str, campaign_id: str) -> np.ndarray:
+        return self[field][self.campaign_index(campaign_id)]
+
+
+def _metric_shape(values: list[object], num_days: int) -> tuple[int, ...]:
+    if not any(isinstance(value, list) for value in values):
+        # a single value per campaign
+        return len(values),
+    entries_per_day = [len(day_values) for value in values if isinstance(value, list)
+                       for day_values in value if isinstance(day_values, list)]
+    if not entries_per_day:
+        # a value per day
+        return len(values), num_days
+    return len(values), num_days, max(entries_per_day)
+
+
+def _metric_axes(shape: tuple[int, ...]) -> list[str]:
+    axes = [AXIS_CAMPAIGN, AXIS_DAY][:len(shape)]
+    if len(shape) == 3:
+        num_hours_in_day = constants.num_minutes_in_day // constants.num_minutes_in_hour
+        axes.append({constants.num_minutes_in_day: AXIS_MINUTE, num_hours_in_day: AXIS_HOUR}.get(shape[2], AXIS_ENTRY))
+    return axes
+
+
+def _fill_campaign_values(metric: np.ndarray, campaign_index: int, value: object, first_day: Optional[int]):
+    if metric.ndim == 1:
+        metric[campaign_index] = _as_float(value)
+        return
+    if not value or first_day is None:
+        return
+    for day, day_values in enumerate(value, start=first_day):
+        if day >= metric.shape[1]:
+            break
+        if metric.ndim == 2:
+            metric[campaign_index, day] = _as_float(day_values)
+        else:
+            metric[campaign_index, day, :len(day_values)] = [_as_float(day_value) for day_value in day_values]
+
+
+def _as_float(value: object) -> float:
+    return math.nan if value is None else float(value)
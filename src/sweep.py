@@ -0,0 +1,141 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+# Runs the simulation over a grid of configurations, in a pool of worker processes.
+# Each cell of the grid overrides variables of the configuration module (see simulation_runner.configuration_overrides),
+# e.g.: {'num_campaigns': [50, 100], 'traffic_dc': [1000, 3000], 'pacing_algorithm': ['linear-soft', None]}.
+# The cells are scheduled by their estimated running time, longest first, so that long cells don't start last and
+# leave the other workers idle. The result of each completed cell is stored in a file of its own, keyed by the hash
+# of the cell's configuration, so an interrupted sweep can be resumed without running its completed cells again.
+# When all the cells are completed, a summary table with the overall statistics of each cell is written.
+# Usage (from the src directory): python sweep.py --grid grid.json [--store ../output/sweep] [--workers N]
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import src.configuration as config
+from src import constants, simulation_runner, system_generation_utils
+
+SWEEP_OUTPUT_FOLDER_PATH = f'{simulation_runner.OUTPUT_FOLDER_PATH}/sweep'
+SUMMARY_FILE_NAME = 'summary.csv'
+FIELD_KEY = 'key'
+FIELD_PARAMETERS = 'parameters'
+FIELD_GLOBAL_STATISTICS = 'global_statistics'
+
+
+def expand_grid(grid: dict[str, list]) -> list[dict[str, object]]:
+    """Returns the cells of the grid, i.e., all the combinations of the values of its parameters"""
+    names = list(grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def cell_key(parameters: dict[str, object]) -> str:
+    """A key that identifies the configuration of a cell, regardless of the order of its parameters"""
+    serialized = json.dumps(parameters, sort_keys=True, default=str)
+    return hashlib.sha1(serialized.encode()).hexdigest()[:16]
+
+
+def estimate_run_cost(parameters: dict[str, object]) -> float:
+    """Estimates the relative running time of a cell, by the number of bids generated during the simulation"""
+    traffic_dc = parameters.get(simulation_runner.TRAFFIC_DC, config.traffic_mean_cos_wave.dc)
+    num_campaigns = parameters.get('num_campaigns', config.num_campaigns)
+    factor_untracked_bids = parameters.get('factor_untracked_bids', config.factor_untracked_bids)
+    num_days_to_simulate = parameters.get('num_days_to_simulate', config.num_days_to_simulate)
+    return traffic_dc * num_campaigns * (1 + factor_untracked_bids) * num_days_to_simulate
+
+
+class SweepResultStore:
+    """Stores the result of each completed cell as a JSON file, named after the key of the cell"""
+
+    def __init__(self, folder_path: str):
+        self.folder_path = folder_path
+        os.makedirs(folder_path, exist_ok=True)
+
+    def _file_path(self, key: str) -> str:
+        return f'{self.folder_path}/{key}.json'
+
+    def contains(self, key: str) -> bool:
+        return os.path.exists(self._file_path(key))
+
+    def load(self, key: str) -> dict[str, object]:
+        with open(self._file_path(key)) as f:
+            return json.load(f)
+
+    def save(self, parameters: dict[str, object], global_statistics: list[dict[str, object]]):
+        key = cell_key(parameters)
+        result = {FIELD_KEY: key, FIELD_PARAMETERS: parameters, FIELD_GLOBAL_STATISTICS: global_statistics}
+        # write into a temporary file first, so that an interrupted write doesn't leave a partial result behind
+        temporary_file_path = f'{self._file_path(key)}.tmp'
+        with open(temporary_file_path, 'w') as f:
+            json.dump(result, f, default=_to_json_value)
+        os.replace(temporary_file_path, self._file_path(key))
+
+    def write_summary(self, cells: list[dict[str, object]]) -> str:
+        """Writes a table with the parameters and the overall statistics of each of the cells"""
+        rows = []
+        for parameters in cells:
+            global_statistics = self.load(cell_key(parameters))[FIELD_GLOBAL_STATISTICS]
+            overall_statistics = next(row for row in global_statistics
+                                      if row[constants.FIELD_DAY_ID] == constants.OVERALL_STATISTICS_ROW_NAME)
+            rows.append({**parameters,
+                         **{field: value for field, value in overall_statistics.items()
+                            if field != constants.FIELD_DAY_ID}})
+        field_names = list(dict.fromkeys(field for row in rows for field in row))
+        summary_file_path = f'{self.folder_path}/{SUMMARY_FILE_NAME}'
+        with open(summary_file_path, 'w') as f:
+            w = csv.DictWriter(f, fieldnames=field_names)
+            w.writeheader()
+            w.writerows(rows)
+        return summary_file_path
+
+
+def _to_json_value(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'cannot serialize {type(value)}')
+
+
+def run_cell(parameters: dict[str, object], num_iterations: int = None) -> list[dict[str, object]]:
+    """Runs the simulation with the configuration of the cell, and returns its global statistics"""
+    with simulation_runner.configuration_overrides(parameters):
+        campaign_configurations = system_generation_utils.generate_campaign_configurations(config.num_campaigns)
+        return simulation_runner.run_and_get_global_statistics(pacing_algorithm=config.pacing_algorithm,
+                                                               campaign_configurations=campaign_configurations,
+                                                               num_iterations=num_iterations)
+
+
+def run_sweep(grid: dict[str, list], store_folder_path: str = SWEEP_OUTPUT_FOLDER_PATH, max_workers: int = None,
+              num_iterations: int = None) -> str:
+    """Runs all the cells of the grid that are not completed yet, and returns the path of the summary table"""
+    cells = expand_grid(grid)
+    store = SweepResultStore(store_folder_path)
+    pending_cells = [parameters for parameters in cells if not store.contains(cell_key(parameters))]
+    print(f'{len(cells) - len(pending_cells)} of {len(cells)} cells are already completed')
+    # the pool starts the cells in the order of their submission
+    pending_cells.sort(key=estimate_run_cost, reverse=True)
+    if pending_cells:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run_cell, parameters, num_iterations): parameters
+                       for parameters in pending_cells}
+            for i, future in enumerate(as_completed(futures)):
+                store.save(futures[future], future.result())
+                print(f'Completed {i + 1} of {len(pending_cells)} cells: {futures[future]}')
+    return store.write_summary(cells)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the simulation over a grid of configurations')
+    parser.add_argument('--grid', required=True,
+                        help='a JSON file mapping configuration variables to lists of values')
+    parser.add_argument('--store', default=SWEEP_OUTPUT_FOLDER_PATH,
+                        help='the folder of the results of the sweep (an interrupted sweep resumes from it)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='the number of worker processes (by default, the number of cores)')
+    args = parser.parse_args()
+    with open(args.grid) as grid_file:
+        print(f'Summary: {run_sweep(json.load(grid_file), store_folder_path=args.store, max_workers=args.workers)}')
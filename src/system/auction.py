@@ -1,8 +1,11 @@
 # Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
 
 import abc
+from typing import Union
 
-from src.system.bid import Bid
+import numpy as np
+
+from src.system.bid import Bid, BidBatch, bid_amounts
 from dataclasses import dataclass
 import src.configuration as config
 
@@ -22,26 +25,85 @@ class AuctionInterface(metaclass=abc.ABCMeta):
                 callable(subclass.user_properties))
 
     @abc.abstractmethod
-    def run(self, bids: list[Bid]) -> list[AuctionWinner]:
+    def run(self, bids: Union[list[Bid], BidBatch]) -> list[AuctionWinner]:
+        """Runs the auction on the bids, given either as a list of bids or as a bid batch"""
         raise NotImplementedError
 
     @abc.abstractmethod
     def user_properties(self) -> dict[str, int]:
         raise NotImplementedError
 
+    @staticmethod
+    def run_batch(bids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Runs a batch of auctions, one per row of the bids matrix, in which missing bids are -inf.
+        Returns the column of the winning bid in each row (-1 if the auction has no winner) and the payments"""
+        raise NotImplementedError
+
 
 class AuctionFP(AuctionInterface):
     def __init__(self, user_properties: dict[str, int]):
         assert user_properties is not None
         self._user_properties = user_properties
 
-    def run(self, bids: list[Bid]) -> list[AuctionWinner]:
-        if not bids:
+    def run(self, bids: Union[list[Bid], BidBatch]) -> list[AuctionWinner]:
+        if not len(bids):
             return []
-        winning_bid = max(bids)
+        # the last of the highest bids wins (as with max() over bids, which are compared by their amounts)
+        amounts = bid_amounts(bids)
+        winning_bid = bids[amounts.size - 1 - int(np.argmax(amounts[::-1]))]
         if winning_bid.amount < config.campaign_minimal_bid:
             return []
         return [AuctionWinner(bid=winning_bid, payment=winning_bid.amount)]
 
     def user_properties(self) -> dict[str, int]:
         return self._user_properties
+
+    @staticmethod
+    def run_batch(bids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        winners, winning_bids = find_batch_winners(bids)
+        return winners, np.where(winners >= 0, winning_bids, 0)
+
+
+class AuctionGSP(AuctionInterface):
+    """Generalized second price auction with a single slot: the winner pays the runner-up bid,
+    but no less than the minimal bid"""
+
+    def __init__(self, user_properties: dict[str, int]):
+        assert user_properties is not None
+        self._user_properties = user_properties
+
+    def run(self, bids: Union[list[Bid], BidBatch]) -> list[AuctionWinner]:
+        if not len(bids):
+            return []
+        amounts = bid_amounts(bids)
+        winning_bid = bids[int(np.argmax(amounts))]
+        if winning_bid.amount < config.campaign_minimal_bid:
+            return []
+        # partial selection of the top two bids, instead of sorting all of them
+        runner_up_amount = np.partition(amounts, -2)[-2] if amounts.size > 1 else config.campaign_minimal_bid
+        return [AuctionWinner(bid=winning_bid, payment=max(runner_up_amount, config.campaign_minimal_bid))]
+
+    def user_properties(self) -> dict[str, int]:
+        return self._user_properties
+
+    @staticmethod
+    def run_batch(bids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        winners, _ = find_batch_winners(bids)
+        if bids.shape[1] > 1:
+            runner_up_bids = np.partition(bids, -2, axis=1)[:, -2]
+        else:
+            runner_up_bids = np.full(bids.shape[0], -np.inf)
+        return winners, np.where(winners >= 0, np.maximum(runner_up_bids, config.campaign_minimal_bid), 0)
+
+
+def find_batch_winners(bids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the column of the highest bid in each row of the bids matrix (-1 if there is no valid bid),
+    and the highest bids"""
+    num_auctions = bids.shape[0]
+    if bids.shape[1] == 0:
+        return np.full(num_auctions, -1), np.full(num_auctions, -np.inf)
+    winners = np.argmax(bids, axis=1)
+    winning_bids = bids[np.arange(num_auctions), winners]
+    # missing bids are -inf, so rows without any bid are also caught here
+    winners[~(winning_bids >= config.campaign_minimal_bid) | np.isneginf(winning_bids)] = -1
+    return winners, winning_bids
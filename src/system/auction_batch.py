@@ -0,0 +1,83 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import numpy as np
+
+from src.system.auction import AuctionInterface, AuctionFP
+
+
+@dataclass
+class BatchRandomNumbers:
+    """The random draws of the bids of a batch of auctions, which are recorded once and replayed in the common
+    random numbers mode"""
+    tracked_bids: np.ndarray  # the raw bids of the relevant (auction, campaign) pairs, in column-major order
+    untracked_bids: np.ndarray  # the two highest untracked bids of each auction
+
+
+class AuctionBatch:
+    """The auctions of a single iteration, stored as one array of values per user property.
+    AuctionInterface objects are only created when a single auction is accessed."""
+
+    def __init__(self, num_auctions: int, user_properties: dict[str, np.ndarray],
+                 auction_class: type[AuctionInterface] = AuctionFP,
+                 random_numbers: Optional[BatchRandomNumbers] = None, record_random_numbers: bool = False):
+        for feature, values in user_properties.items():
+            assert len(values) == num_auctions, f'expected {num_auctions} values for user property {feature}'
+        self.num_auctions = num_auctions
+        self.user_properties = user_properties
+        self.auction_class = auction_class
+        # when given, the bids are taken from the random numbers instead of being sampled
+        self.random_numbers = random_numbers
+        # when set, the serving system samples bids for all the relevant campaigns (regardless of their budgets and
+        # pacing), and keeps them in random_numbers
+        self.record_random_numbers = record_random_numbers
+
+    def __len__(self) -> int:
+        return self.num_auctions
+
+    def __iter__(self) -> Iterator[AuctionInterface]:
+        # convert the columns into lists once, instead of converting numpy scalars in each auction
+        values_per_feature = {feature: values.tolist() for feature, values in self.user_properties.items()}
+        for i in range(self.num_auctions):
+            yield self.auction_class(user_properties={feature: values[i]
+                                                      for feature, values in values_per_feature.items()})
+
+    def auction(self, index: int) -> AuctionInterface:
+        return self.auction_class(user_properties={feature: values[index].item()
+                                                   for feature, values in self.user_properties.items()})
+
+    def segments(self) -> tuple[list[dict[str, int]], np.ndarray]:
+        """Returns the distinct combinations of user properties in the batch, and the combination of each auction"""
+        features = list(self.user_properties.keys())
+        if not features:
+            return [{}], np.zeros(self.num_auctions, dtype=int)
+        values = np.stack([self.user_properties[feature] for feature in features], axis=1)
+        unique_values, segment_of_auction = np.unique(values, axis=0, return_inverse=True)
+        segments = [dict(zip(features, row)) for row in unique_values.tolist()]
+        return segments, segment_of_auction.reshape(-1)
+
+    @staticmethod
+    def sample_user_property_values(values: np.ndarray, probabilities: np.ndarray, size: int,
+                                    generator: np.random.Generator = None) -> np.ndarray:
+        """Samples {size} values with the given probabilities, using the inverse CDF of the discrete distribution"""
+        if generator is None:
+            generator = np.random.default_rng()
+        cdf = np.cumsum(probabilities)
+        cdf[-1] = 1  # protect against floating point errors in the sum of the probabilities
+        return values[np.searchsorted(cdf, generator.random(size), side='right')]
+
+
+@dataclass
+class BidsMatrix:
+    """The bids of all the auctions of a batch, with a row per auction.
+    Missing bids (e.g. of campaigns that are not eligible to participate in an auction) are -inf."""
+    campaigns: list  # the participating tracked campaigns, one per column of tracked_bids
+    eligible: np.ndarray  # whether each campaign is eligible to participate in each auction
+    tracked_bids: np.ndarray
+    untracked_bids: np.ndarray  # the two highest untracked bids of each auction
+
+    def as_matrix(self) -> np.ndarray:
+        """Returns all the bids as a single matrix, in which the untracked bids are placed after the tracked ones"""
+        return np.concatenate((self.tracked_bids, self.untracked_bids), axis=1)
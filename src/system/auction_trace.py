@@ -0,0 +1,197 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import json
+import os
+from typing import Iterable, Union
+
+import numpy as np
+
+from src.system.auction import AuctionInterface, AuctionFP
+from src.system.auction_batch import AuctionBatch
+
+METADATA_FILE_NAME = 'metadata.json'
+MINUTE_OFFSETS_FILE_NAME = 'minute_offsets.bin'
+OFFSET_DTYPE = np.int64
+USER_PROPERTY_DTYPE = np.int32
+# the value of user properties that are missing from the trace, or that can't be mapped onto the configuration
+MISSING_USER_PROPERTY_VALUE = -1
+DEFAULT_MINUTES_PER_CHUNK = 60
+
+
+# An auction trace is a stream of auctions, given as the user properties of the auctions of each minute. Traces are
+# either converted from external traffic logs, or recorded from synthetic simulations, and drive the marketplace
+# instead of its traffic schedule.
+# A trace is a folder of columnar binary files:
+# - the traffic is split into chunks of consecutive minutes (an hour by default), with a file per chunk and user
+#   property, holding the values of the property in all the auctions of the chunk
+# - the offset of the first auction of each minute in the whole trace (the number of minutes + 1 offsets)
+# - a metadata.json file, with the user properties, the number of minutes and the number of minutes per chunk
+# The reader memory-maps one chunk at a time, so the memory used by the replay is bounded by the size of a chunk,
+# regardless of the length of the trace.
+class AuctionTraceWriter:
+    def __init__(self, folder_path: str, features: list[str], minutes_per_chunk: int = DEFAULT_MINUTES_PER_CHUNK):
+        if minutes_per_chunk <= 0:
+            raise Exception('the number of minutes per chunk must be positive')
+        os.makedirs(folder_path, exist_ok=True)
+        self.folder_path = folder_path
+        self.features = list(features)
+        self.minutes_per_chunk = minutes_per_chunk
+        self.num_minutes = 0
+        self._minute_offsets = [0]
+        self._chunk_files = {}
+
+    def write_minute(self, user_properties: dict[str, np.ndarray]):
+        """Appends the auctions of the next minute, given as the values of each user property.
+        Values of user properties that are missing from the auctions are MISSING_USER_PROPERTY_VALUE"""
+        num_auctions = None
+        for feature in self.features:
+            values = user_properties.get(feature)
+            if values is None:
+                continue
+            if num_auctions is not None and len(values) != num_auctions:
+                raise Exception(f'expected {num_auctions} values for user property {feature}')
+            num_auctions = len(values)
+        if num_auctions is None:
+            raise Exception('expected the values of at least one of the user properties of the trace')
+        if self.num_minutes % self.minutes_per_chunk == 0:
+            self._start_chunk(self.num_minutes // self.minutes_per_chunk)
+        for feature in self.features:
+            values = user_properties.get(feature)
+            if values is None:
+                values = np.full(num_auctions, MISSING_USER_PROPERTY_VALUE)
+            self._chunk_files[feature].write(np.asarray(values, dtype=USER_PROPERTY_DTYPE).tobytes())
+        self._minute_offsets.append(self._minute_offsets[-1] + num_auctions)
+        self.num_minutes += 1
+
+    def write_auctions(self, auctions: Iterable[AuctionInterface]):
+        """Appends the auctions of the next minute"""
+        if isinstance(auctions, AuctionBatch):
+            self.write_minute(auctions.user_properties)
+            return
+        user_properties = [auction.user_properties() for auction in auctions]
+        self.write_minute({feature: np.array([properties.get(feature, MISSING_USER_PROPERTY_VALUE)
+                                              for properties in user_properties], dtype=USER_PROPERTY_DTYPE)
+                           for feature in self.features})
+
+    def close(self):
+        self._close_chunk()
+        np.array(self._minute_offsets, dtype=OFFSET_DTYPE).tofile(f'{self.folder_path}/{MINUTE_OFFSETS_FILE_NAME}')
+        with open(f'{self.folder_path}/{METADATA_FILE_NAME}', 'w') as f:
+            json.dump({'features': self.features, 'num_minutes': self.num_minutes,
+                       'minutes_per_chunk': self.minutes_per_chunk}, f)
+
+    def _start_chunk(self, chunk: int):
+        self._close_chunk()
+        self._chunk_files = {feature: open(_chunk_file_path(self.folder_path, chunk, feature), 'wb')
+                             for feature in self.features}
+
+    def _close_chunk(self):
+        for f in self._chunk_files.values():
+            f.close()
+        self._chunk_files = {}
+
+
+# Maps a user property of the trace onto a user property of the configuration: {configuration feature: (trace
+# feature, {trace value: configuration value})}. Trace values without a configuration value are mapped to
+# MISSING_USER_PROPERTY_VALUE. Features that are given without a dictionary of values keep the values of the trace.
+UserPropertiesMapping = dict[str, Union[str, tuple[str, dict[int, int]]]]
+
+
+class AuctionTraceReader:
+    def __init__(self, folder_path: str, features: list[str] = None,
+                 user_properties_mapping: UserPropertiesMapping = None):
+        """Reads the trace in the given folder. The auctions are returned with the given user properties (by default,
+        the user properties of the trace), which are taken from the trace according to the mapping (by default,
+        from the user properties of the trace with the same names). User properties without a trace feature are
+        missing from all the auctions"""
+        with open(f'{folder_path}/{METADATA_FILE_NAME}') as f:
+            metadata = json.load(f)
+        self.folder_path = folder_path
+        self.trace_features = metadata['features']
+        self.num_minutes = metadata['num_minutes']
+        self.minutes_per_chunk = metadata['minutes_per_chunk']
+        self.features = list(features) if features is not None else list(self.trace_features)
+        self._minute_offsets = np.fromfile(f'{folder_path}/{MINUTE_OFFSETS_FILE_NAME}', dtype=OFFSET_DTYPE)
+        if user_properties_mapping is None:
+            user_properties_mapping = {feature: feature for feature in self.features if feature in self.trace_features}
+        # the trace feature of each feature, and a lookup table of its values (None when the values are kept)
+        self._trace_features = {}
+        self._value_tables = {}
+        for feature in self.features:
+            mapping = user_properties_mapping.get(feature)
+            if isinstance(mapping, tuple):
+                trace_feature, values = mapping
+                self._value_tables[feature] = _lookup_table(values)
+            else:
+                trace_feature = mapping
+            if trace_feature is not None and trace_feature not in self.trace_features:
+                raise Exception(f'user property {trace_feature} is not in the trace')
+            self._trace_features[feature] = trace_feature
+        self._chunk = None
+        self._chunk_columns = {}
+
+    def __len__(self) -> int:
+        return self.num_minutes
+
+    def num_auctions(self, minute: int) -> int:
+        return int(self._minute_offsets[minute + 1] - self._minute_offsets[minute])
+
+    def auction_batch(self, minute: int, auction_class: type[AuctionInterface] = AuctionFP) -> AuctionBatch:
+        """Returns the auctions of the minute (counted from the beginning of the trace)"""
+        if minute >= self.num_minutes:
+            raise Exception(f'the trace contains only {self.num_minutes} minutes')
+        chunk = minute // self.minutes_per_chunk
+        if chunk != self._chunk:
+            self._map_chunk(chunk)
+        chunk_offset = self._minute_offsets[chunk * self.minutes_per_chunk]
+        start = self._minute_offsets[minute] - chunk_offset
+        end = self._minute_offsets[minute + 1] - chunk_offset
+        user_properties = {}
+        for feature in self.features:
+            trace_feature = self._trace_features[feature]
+            if trace_feature is None:
+                user_properties[feature] = np.full(end - start, MISSING_USER_PROPERTY_VALUE, dtype=USER_PROPERTY_DTYPE)
+                continue
+            values = self._chunk_columns[trace_feature][start:end]
+            table = self._value_tables.get(feature)
+            if table is None:
+                user_properties[feature] = np.array(values)
+            else:
+                user_properties[feature] = _map_values(values, table)
+        return AuctionBatch(num_auctions=int(end - start), user_properties=user_properties,
+                            auction_class=auction_class)
+
+    def _map_chunk(self, chunk: int):
+        # release the memory maps of the previous chunk before mapping the next one
+        self._chunk_columns = {}
+        self._chunk_columns = {feature: _memory_map(_chunk_file_path(self.folder_path, chunk, feature))
+                               for feature in set(self._trace_features.values()) if feature is not None}
+        self._chunk = chunk
+
+
+def _chunk_file_path(folder_path: str, chunk: int, feature: str) -> str:
+    return f'{folder_path}/chunk_{chunk:06d}_{feature}.bin'
+
+
+def _memory_map(file_path: str) -> np.ndarray:
+    if os.path.getsize(file_path) == 0:
+        # empty files can't be memory-mapped
+        return np.empty(0, dtype=USER_PROPERTY_DTYPE)
+    return np.memmap(file_path, dtype=USER_PROPERTY_DTYPE, mode='r')
+
+
+def _lookup_table(values: dict[int, int]) -> np.ndarray:
+    """Returns an array mapping each non-negative trace value to its configuration value"""
+    if any(value < 0 for value in values):
+        raise Exception('trace values must be non-negative')
+    table = np.full(max(values, default=-1) + 1, MISSING_USER_PROPERTY_VALUE, dtype=USER_PROPERTY_DTYPE)
+    for trace_value, value in values.items():
+        table[trace_value] = value
+    return table
+
+
+def _map_values(values: np.ndarray, table: np.ndarray) -> np.ndarray:
+    mapped = np.full(len(values), MISSING_USER_PROPERTY_VALUE, dtype=USER_PROPERTY_DTYPE)
+    known = (values >= 0) & (values < table.size)
+    mapped[known] = table[values[known]]
+    return mapped
@@ -0,0 +1,86 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import numpy as np
+
+from src.system.auction import AuctionInterface, AuctionFP
+from src.system.auction_batch import AuctionBatch
+from src.system.serving_system import ServingSystem
+
+
+# The batched engine resolves all the auctions of an iteration at once, instead of running them one by one:
+# 1. The serving system returns a matrix of bids (auctions x tracked campaigns, plus the top untracked bids).
+# 2. The winners of all the auctions are found with a single vectorized argmax.
+# 3. Campaigns reaching their daily budget in the middle of the iteration are excluded from the following auctions,
+#    by re-resolving only the auctions after the one in which the budget was depleted.
+# 4. The payments are scatter-added into the campaigns.
+class BatchedAuctionEngine:
+    def __init__(self, serving_system: ServingSystem, auction_class: type[AuctionInterface] = AuctionFP):
+        self.serving_system = serving_system
+        self.auction_class = auction_class
+
+    def run(self, auction_batch: AuctionBatch):
+        if len(auction_batch) == 0:
+            return
+        bids = self.serving_system.get_bids_batch(auction_batch)
+        num_tracked_campaigns = len(bids.campaigns)
+        bids_matrix = bids.as_matrix()
+        winners, payments = self.auction_class.run_batch(bids_matrix)
+        spent_today = np.array([campaign.spent_today() for campaign in bids.campaigns], dtype=float)
+        daily_budgets = np.array([campaign.daily_budget for campaign in bids.campaigns], dtype=float)
+        first_unresolved_auction = 0
+        while True:
+            depletion_auction = self._find_first_budget_depletion(winners=winners, payments=payments,
+                                                                  first_auction=first_unresolved_auction,
+                                                                  num_tracked_campaigns=num_tracked_campaigns,
+                                                                  spent_today=spent_today,
+                                                                  daily_budgets=daily_budgets)
+            if depletion_auction is None:
+                break
+            # the auctions up to (and including) the depleting one are final
+            self._accumulate_spend(spent_today=spent_today,
+                                   winners=winners[first_unresolved_auction:depletion_auction + 1],
+                                   payments=payments[first_unresolved_auction:depletion_auction + 1],
+                                   num_tracked_campaigns=num_tracked_campaigns)
+            # exclude the depleted campaign from the following auctions, and resolve them again
+            first_unresolved_auction = depletion_auction + 1
+            bids_matrix[first_unresolved_auction:, winners[depletion_auction]] = -np.inf
+            winners[first_unresolved_auction:], payments[first_unresolved_auction:] = self.auction_class.run_batch(
+                bids_matrix[first_unresolved_auction:])
+        # scatter-add the payments and the wins of the tracked campaigns
+        tracked_wins = (winners >= 0) & (winners < num_tracked_campaigns)
+        payments_per_campaign = np.bincount(winners[tracked_wins], weights=payments[tracked_wins],
+                                            minlength=num_tracked_campaigns)
+        num_wins_per_campaign = np.bincount(winners[tracked_wins], minlength=num_tracked_campaigns)
+        self.serving_system.update_winners_batch(campaigns=bids.campaigns, payments=payments_per_campaign,
+                                                 num_wins=num_wins_per_campaign)
+
+    @staticmethod
+    def _find_first_budget_depletion(winners: np.ndarray, payments: np.ndarray, first_auction: int,
+                                     num_tracked_campaigns: int, spent_today: np.ndarray, daily_budgets: np.ndarray):
+        """Returns the index of the first auction (starting from first_auction) after which a winning campaign has
+        reached its daily budget, or None if no campaign reaches its daily budget"""
+        winners = winners[first_auction:]
+        auctions = np.flatnonzero((winners >= 0) & (winners < num_tracked_campaigns))
+        if auctions.size == 0:
+            return None
+        campaigns = winners[auctions]
+        # cumulative spend of each campaign, in the order of the auctions
+        order = np.argsort(campaigns, kind='stable')
+        sorted_campaigns = campaigns[order]
+        sorted_payments = payments[first_auction:][auctions][order]
+        cumulative_payments = np.cumsum(sorted_payments)
+        is_first_of_campaign = np.concatenate(([True], sorted_campaigns[1:] != sorted_campaigns[:-1]))
+        first_of_campaign = np.maximum.accumulate(np.where(is_first_of_campaign, np.arange(order.size), 0))
+        cumulative_payments -= cumulative_payments[first_of_campaign] - sorted_payments[first_of_campaign]
+        depleted = np.empty(order.size, dtype=bool)
+        depleted[order] = spent_today[sorted_campaigns] + cumulative_payments >= daily_budgets[sorted_campaigns]
+        if not depleted.any():
+            return None
+        return first_auction + auctions[np.argmax(depleted)]
+
+    @staticmethod
+    def _accumulate_spend(spent_today: np.ndarray, winners: np.ndarray, payments: np.ndarray,
+                          num_tracked_campaigns: int):
+        tracked_wins = (winners >= 0) & (winners < num_tracked_campaigns)
+        spent_today += np.bincount(winners[tracked_wins], weights=payments[tracked_wins],
+                                   minlength=num_tracked_campaigns)
@@ -1,6 +1,11 @@
 # Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
 
 import functools
+from typing import Union
+
+import numpy as np
+
+UNTRACKED_CAMPAIGN_ID_PREFIX = 'untracked_campaign_'
 
 
 @functools.total_ordering  # this adds implementations of __le__, __gt__, __ge__, etc.
@@ -20,3 +25,48 @@ class Bid:
         return self.amount < other.amount
 
 
+# The bids of a single auction, kept as parallel arrays of the index of the bidding campaign and the amount of the bid,
+# so that collecting the bids and running the auction don't allocate an object per bid.
+# Tracked campaigns are referred to by their index in the targeting index (indices into the given list of campaigns),
+# and untracked bidders by negative indices: the i-th untracked bid has the index -(i + 1).
+# Bid objects are created only on demand, when a bid is accessed by its position (e.g. for the winner of the auction).
+class BidBatch:
+    def __init__(self, campaign_indices: np.ndarray, amounts: np.ndarray, campaigns: list = None):
+        assert campaign_indices.size == amounts.size
+        self.campaign_indices = campaign_indices
+        self.amounts = amounts
+        self.campaigns = campaigns if campaigns is not None else []
+
+    def campaign_id(self, position: int) -> str:
+        campaign_index = self.campaign_indices[position]
+        if campaign_index < 0:
+            return UNTRACKED_CAMPAIGN_ID_PREFIX + str(-campaign_index - 1)
+        return self.campaigns[campaign_index].id
+
+    def __len__(self):
+        return self.amounts.size
+
+    def __getitem__(self, position: int) -> Bid:
+        if not -len(self) <= position < len(self):
+            raise IndexError('bid position out of range')
+        return Bid(campaign_id=self.campaign_id(position), amount=self.amounts[position].item())
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+    def __eq__(self, other):
+        if isinstance(other, BidBatch):
+            return list(self) == list(other)
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+
+def untracked_campaign_indices(num_bids: int) -> np.ndarray:
+    return -1 - np.arange(num_bids)
+
+
+def bid_amounts(bids: Union[list[Bid], BidBatch]) -> np.ndarray:
+    if isinstance(bids, BidBatch):
+        return bids.amounts
+    return np.fromiter((bid.amount for bid in bids), dtype=float, count=len(bids))
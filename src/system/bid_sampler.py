@@ -0,0 +1,98 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import numpy as np
+from scipy import stats
+
+
+class _BidsPool:
+    """The sampled bids of the campaigns of a single bids distribution, with a row (and a cursor) per campaign"""
+
+    def __init__(self, block_size: int):
+        self.rows: dict[str, int] = {}
+        self.generators: list[np.random.Generator] = []
+        self.bids = np.empty((0, block_size))
+        # the bids of each row before its position were already handed out
+        self.positions = np.zeros(0, dtype=int)
+
+    def add_row(self, campaign_id: str, generator: np.random.Generator) -> int:
+        row = len(self.generators)
+        if row == self.bids.shape[0]:
+            capacity = max(1, 2 * row)
+            bids = np.empty((capacity, self.bids.shape[1]))
+            bids[:row] = self.bids
+            self.bids = bids
+            self.positions = np.concatenate((self.positions, np.zeros(capacity - row, dtype=int)))
+        self.rows[campaign_id] = row
+        self.generators.append(generator)
+        # an empty row, which is filled on the first draw
+        self.positions[row] = self.bids.shape[1]
+        return row
+
+
+# The bid sampler keeps the sampled bids of all the campaigns that bid according to the same distribution in a single
+# pool (an array with a row per campaign), instead of a large cache of sampled bids per campaign. Each row is a small
+# block of bids that is refilled (with bid_sampling_block_size bids) once all of them were handed out, so the memory
+# used for sampled bids is a block per campaign.
+# Each campaign has a cursor into its own row, and its bids are drawn from a random generator of its own (keyed by the
+# campaign id). So the bids of a campaign don't depend on the draws of the other campaigns, nor on whether its bids are
+# sampled one by one or in batches.
+class BidSampler:
+    def __init__(self, context):
+        self.context = context
+        self._pools: dict[tuple, _BidsPool] = {}
+
+    def sample(self, distribution: stats.rv_continuous, size: int, campaign_id: str,
+               max_bid: float = None) -> np.ndarray:
+        """Returns the next {size} bids of the campaign, sampled from the distribution and capped by the max bid
+        (if given)"""
+        pool, row = self._pool_row(distribution, campaign_id)
+        block_size = pool.bids.shape[1]
+        bids = np.empty(size)
+        num_sampled = 0
+        while num_sampled < size:
+            if pool.positions[row] == block_size:
+                self._refill(pool, row, distribution)
+            position = pool.positions[row]
+            num_bids = min(size - num_sampled, block_size - position)
+            bids[num_sampled:num_sampled + num_bids] = pool.bids[row, position:position + num_bids]
+            pool.positions[row] += num_bids
+            num_sampled += num_bids
+        if max_bid:
+            np.minimum(bids, max_bid, out=bids)
+        return bids
+
+    def sample_one(self, distribution: stats.rv_continuous, campaign_id: str) -> float:
+        """Returns the next bid of the campaign, sampled from the distribution"""
+        pool, row = self._pool_row(distribution, campaign_id)
+        if pool.positions[row] == pool.bids.shape[1]:
+            self._refill(pool, row, distribution)
+        bid = pool.bids[row, pool.positions[row]]
+        pool.positions[row] += 1
+        return bid
+
+    def _pool_row(self, distribution: stats.rv_continuous, campaign_id: str) -> tuple[_BidsPool, int]:
+        key = distribution_key(distribution)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = _BidsPool(self.context.config.bid_sampling_block_size)
+            self._pools[key] = pool
+        row = pool.rows.get(campaign_id)
+        if row is None:
+            row = pool.add_row(campaign_id, self.context.generator('bids', campaign_id))
+        return pool, row
+
+    @staticmethod
+    def _refill(pool: _BidsPool, row: int, distribution: stats.rv_continuous):
+        pool.bids[row] = distribution.rvs(size=pool.bids.shape[1], random_state=pool.generators[row])
+        pool.positions[row] = 0
+
+
+def distribution_key(distribution: stats.rv_continuous) -> tuple:
+    """Returns the key of the pool of the distribution. Frozen scipy distributions of the same family with the same
+    parameters share a pool, and other distributions have pools of their own"""
+    try:
+        key = (distribution.dist.name, distribution.args, tuple(sorted(distribution.kwds.items())))
+        hash(key)
+    except (AttributeError, TypeError):
+        key = ('distribution', id(distribution))
+    return key
@@ -1,34 +1,50 @@
 # Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
 
-import random
 import math
-import statistics
 
 import numpy as np
 
 import src.system.budget_pacing.mystique.mystique_constants as mystique_constants
 import src.system.budget_pacing.mystique.target_slope as target_slope
+from src.system.budget_pacing.mystique.mystique_state import MystiqueState
 from src.system.budget_pacing.mystique.mystique_tracked_campaign import MystiqueTrackedCampaign
 from src.system.budget_pacing.mystique.target_slope import TargetSpendStrategyType
 from src.system.budget_pacing.pacing_system_interface import PacingSystemInterface
 from src.system.campaign import Campaign
-from src.system.clock import Clock
+from src.system.simulation_context import SimulationContext, default_context
 
 
 class MystiquePacingSystem(PacingSystemInterface):
-    def __init__(self, target_slope_type: TargetSpendStrategyType):
+    def __init__(self, target_slope_type: TargetSpendStrategyType, context: SimulationContext = None):
+        self.context = context if context is not None else default_context()
         self.mystique_tracked_campaigns = {}    # a dict containing campaign id as key and MystiqueTrackedCampaigns instance as val
+        # the values of all the tracked campaigns, as aligned arrays with a row per campaign
+        self.state = MystiqueState()
+        # the row in the state of each registered campaign index (-1 for indices that weren't registered), and the
+        # tracked campaign of each row
+        self.state_rows = np.full(0, -1, dtype=int)
+        self.mystique_tracked_campaigns_by_row = []
         if target_slope_type == TargetSpendStrategyType.LINEAR:
-            self.target_spend_slope_calculator = target_slope.LinearTargetSpendStrategy()
+            self.target_spend_slope_calculator = target_slope.LinearTargetSpendStrategy(clock=self.context.clock)
         elif target_slope_type == TargetSpendStrategyType.NON_LINEAR:
-            self.target_spend_slope_calculator = target_slope.NonLinearTargetSpendStrategy()
+            self.target_spend_slope_calculator = target_slope.NonLinearTargetSpendStrategy(clock=self.context.clock)
 
     def add_campaign(self, campaign: Campaign):
         campaign_id = campaign.id
         daily_budget = campaign.daily_budget
         if campaign_id not in self.mystique_tracked_campaigns:
-            self.mystique_tracked_campaigns[campaign_id] = MystiqueTrackedCampaign(daily_budget)
+            self.mystique_tracked_campaigns[campaign_id] = MystiqueTrackedCampaign(
+                daily_budget, day_started=self.context.clock.days(), state=self.state)
             self.target_spend_slope_calculator.initialize_slope(self.mystique_tracked_campaigns[campaign_id])
+            self.mystique_tracked_campaigns_by_row.append(self.mystique_tracked_campaigns[campaign_id])
+
+    def register_campaign(self, campaign: Campaign, campaign_index: int):
+        self.add_campaign(campaign)
+        if campaign_index >= self.state_rows.size:
+            state_rows = np.full(max(campaign_index + 1, 2 * self.state_rows.size), -1, dtype=int)
+            state_rows[:self.state_rows.size] = self.state_rows
+            self.state_rows = state_rows
+        self.state_rows[campaign_index] = self.mystique_tracked_campaigns[campaign.id].index
 
     def end_iteration(self, campaign_id: str, spend_since_last_iteration: float):
         if campaign_id in self.mystique_tracked_campaigns:
@@ -36,12 +52,33 @@ class MystiquePacingSystem(PacingSystemInterface):
             mystique_tracked_campaign.update_spend(spend_since_last_iteration)
             self.update_pacing_signal(mystique_tracked_campaign)
             # check if this was the last iteration of the day
-            if Clock.minute_in_day() == mystique_constants.num_iterations_per_day - 1:
+            if self.context.clock.minute_in_day() == mystique_constants.num_iterations_per_day - 1:
                 # update target slope and spend
                 self.target_spend_slope_calculator.update_target_slope_and_spend(mystique_tracked_campaign)
                 # push campaign's statistics of the day into history
                 mystique_tracked_campaign.new_day_init(is_new_campaign=False)
 
+    def end_iteration_batch(self, spends: np.ndarray, campaign_indices: np.ndarray = None):
+        """Updates the pacing signals of all the given campaigns in a single vectorized pass, with the same results as
+        calling end_iteration for each of them"""
+        if campaign_indices is None:
+            campaign_indices = np.flatnonzero(self.state_rows >= 0)
+        rows = self.state_rows[campaign_indices]
+        tracked = rows >= 0
+        rows = rows[tracked]
+        if not rows.size:
+            return
+        self.state.update_spends(rows, np.asarray(spends, dtype=float)[tracked])
+        self.state.update_pacing_signals(rows, self.calculate_new_pacing_signals(rows))
+        # check if this was the last iteration of the day
+        if self.context.clock.minute_in_day() == mystique_constants.num_iterations_per_day - 1:
+            mystique_tracked_campaigns = [self.mystique_tracked_campaigns_by_row[row] for row in rows]
+            # update the target slopes and spends of all the campaigns at once
+            self.target_spend_slope_calculator.update_target_slopes_and_spends(self.state, mystique_tracked_campaigns)
+            for mystique_tracked_campaign in mystique_tracked_campaigns:
+                # push campaign's statistics of the day into history
+                mystique_tracked_campaign.new_day_init(is_new_campaign=False)
+
     def get_pacing_signal(self, campaign_id: str):
         ps = mystique_constants.default_ps_value
         if campaign_id in self.mystique_tracked_campaigns:
@@ -49,13 +86,17 @@ class MystiquePacingSystem(PacingSystemInterface):
         assert mystique_constants.min_ps <= ps <= mystique_constants.max_ps
         return ps
 
+    def get_pacing_signals(self, campaign_indices: np.ndarray) -> np.ndarray:
+        rows = self.state_rows[campaign_indices]
+        return np.where(rows >= 0, self.state.ps[rows], mystique_constants.default_ps_value)
+
     def update_pacing_signal(self, mystique_tracked_campaign: MystiqueTrackedCampaign):
         new_ps = self.calculate_new_pacing_signal(mystique_tracked_campaign)
         mystique_tracked_campaign.update_pacing_signal(new_ps)
 
     def calculate_new_pacing_signal(self, mystique_tracked_campaign: MystiqueTrackedCampaign):
         # Edge case: minutes_for_end_day_edge_case minutes before budget reset
-        if Clock.minute_in_day() > mystique_constants.num_iterations_per_day - mystique_constants.minutes_for_end_day_edge_case:
+        if self.context.clock.minute_in_day() > mystique_constants.num_iterations_per_day - mystique_constants.minutes_for_end_day_edge_case:
             avg_daily_ps_below_threshold = mystique_tracked_campaign.get_avg_daily_ps_below_threshold()
             if avg_daily_ps_below_threshold != mystique_constants.ps_invalid_value:
                 return min(mystique_constants.max_ps, avg_daily_ps_below_threshold)
@@ -88,21 +129,75 @@ class MystiquePacingSystem(PacingSystemInterface):
         previous_ps = mystique_tracked_campaign.last_positive_ps
         return self.get_new_pacing_signal(previous_ps, spend_error, gradient_error, w1, w2)
 
+    def calculate_new_pacing_signals(self, indices: np.ndarray) -> np.ndarray:
+        """Returns the new pacing signals of the campaigns in the given rows of the state, calculated as in
+        calculate_new_pacing_signal, with the edge cases applied as masks"""
+        ps = self.state.ps[indices]
+        today_spend = self.state.today_spend_total[indices]
+        daily_budget = self.state.daily_budget[indices]
+
+        percent_budget_depleted_today = today_spend / daily_budget
+        current_target_slope, current_target_spend = self.target_spend_slope_calculator.get_target_slopes_and_spends(
+            self.state, indices)
+        spend_error = percent_budget_depleted_today - current_target_spend
+
+        last_spend = self.state.last_spends(indices)
+        spend_derivative_in_latest_time_interval = np.where(
+            last_spend == 0, 0, last_spend / daily_budget / mystique_constants.percent_of_day_in_one_iteration)
+        gradient_error = spend_derivative_in_latest_time_interval - current_target_slope
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # the gradient error is close to 0 (as in math.isclose with abs_tol=1e-9) only if its magnitude is up to 1e-9
+            estimated_intervals_until_target_is_hit = np.where(
+                np.abs(gradient_error) <= 1e-9, mystique_constants.max_interval,
+                -1 * mystique_constants.num_iterations_per_day * spend_error / gradient_error)
+
+        w1 = np.where(estimated_intervals_until_target_is_hit < 0, 0.5,
+                      np.minimum(mystique_constants.max_ps_correction_weight,
+                                 mystique_constants.ps_correction_weight_factor * estimated_intervals_until_target_is_hit))
+        w2 = np.where(estimated_intervals_until_target_is_hit < 0, 0.5, 1.0 - w1)
+        new_ps = self.get_new_pacing_signals(self.state.last_positive_ps[indices], spend_error, gradient_error, w1, w2)
+
+        # Edge case: runaway train
+        runaway_train = (gradient_error > 12) & (estimated_intervals_until_target_is_hit < 3600) & (
+                percent_budget_depleted_today > np.minimum(current_target_spend, 1))
+        new_ps = np.where(runaway_train, 0, new_ps)
+
+        # Edge case: if a campaign depleted the budget we freeze the PS (math.isclose with the default rel_tol)
+        budget_depleted = (np.abs(today_spend - daily_budget) <= 1e-09 * np.maximum(np.abs(today_spend),
+                                                                                     np.abs(daily_budget))) | (
+                today_spend > daily_budget)
+        new_ps = np.where(budget_depleted, ps, new_ps)
+
+        # Edge case: minutes_for_end_day_edge_case minutes before budget reset
+        if self.context.clock.minute_in_day() > mystique_constants.num_iterations_per_day - mystique_constants.minutes_for_end_day_edge_case:
+            count_ps_below_threshold = self.state.count_ps_below_threshold[indices]
+            has_avg_daily_ps_below_threshold = count_ps_below_threshold > 0
+            avg_daily_ps_below_threshold = np.divide(self.state.sum_ps_below_threshold[indices],
+                                                     count_ps_below_threshold, out=np.zeros(indices.size),
+                                                     where=has_avg_daily_ps_below_threshold)
+            new_ps = np.where(has_avg_daily_ps_below_threshold,
+                              np.minimum(mystique_constants.max_ps, avg_daily_ps_below_threshold), new_ps)
+        return new_ps
+
     def get_pacing_statistics(self, campaign_id: str) -> dict[str, object]:
         campaign = self.mystique_tracked_campaigns[campaign_id]
         return {
-            mystique_constants.FIELD_SPEND_HISTORY: campaign.spend_history,
-            mystique_constants.FIELD_TARGET_SPEND_HISTORY: campaign.target_spend_history,
-            mystique_constants.FIELD_TARGET_SLOPE_HISTORY: campaign.target_slope_history,
-            mystique_constants.FIELD_PACING_SIGNAL_HISTORY: campaign.ps_history
+            mystique_constants.FIELD_SPEND_HISTORY: campaign.spend_history.tolist(),
+            mystique_constants.FIELD_TARGET_SPEND_HISTORY: campaign.target_spend_history.tolist(),
+            mystique_constants.FIELD_TARGET_SLOPE_HISTORY: campaign.target_slope_history.tolist(),
+            mystique_constants.FIELD_PACING_SIGNAL_HISTORY: campaign.ps_history.tolist()
         }
 
+    def release_last_day_statistics(self, campaign_id: str):
+        if campaign_id in self.mystique_tracked_campaigns:
+            self.mystique_tracked_campaigns[campaign_id].release_last_day_history()
+
     def get_global_pacing_statistics(self) -> dict[str, object]:
-        num_bc_campaigns_per_day = [0] * Clock.days()
-        num_nbc_campaigns_per_day = [0] * Clock.days()
+        num_bc_campaigns_per_day = [0] * self.context.clock.days()
+        num_nbc_campaigns_per_day = [0] * self.context.clock.days()
         for campaign in self.mystique_tracked_campaigns.values():
-            for day in range(len(campaign.ps_history)):
-                if statistics.mean(campaign.ps_history[day]) < mystique_constants.ps_threshold_for_bc_campaigns:
+            for day, avg_ps in enumerate(campaign.daily_avg_ps):
+                if avg_ps < mystique_constants.ps_threshold_for_bc_campaigns:
                     # we assume that a campaign with an average daily ps<0.95 is budget constrained (BC)
                     num_bc_campaigns_per_day[campaign.day_started + day] += 1
                 else:
@@ -187,12 +282,40 @@ class MystiquePacingSystem(PacingSystemInterface):
             return mystique_constants.max_ps
         return calculated_ps
 
+    @staticmethod
+    def get_new_pacing_signals(previous_ps: np.ndarray, spend_error: np.ndarray, gradient_error: np.ndarray,
+                               w1: np.ndarray, w2: np.ndarray) -> np.ndarray:
+        """The vectorized get_new_pacing_signal"""
+        spend_error_correction = mystique_constants.max_ps_correction * np.minimum(
+            1, np.abs(spend_error) / mystique_constants.error_corresponding_to_max_correction)
+        gradient_error_correction = np.maximum(
+            mystique_constants.minimal_non_zero_ps_correction,
+            mystique_constants.max_ps_correction * np.minimum(1.0, np.abs(gradient_error)) / mystique_constants.gradient_error_corresponding_to_max_correction)
+
+        calculated_ps = previous_ps - (w1 * spend_error_correction * np.sign(spend_error)) - (
+                    w2 * gradient_error_correction * np.sign(gradient_error))
+        calculated_ps = np.maximum(mystique_constants.minimal_ps_value, calculated_ps)
+        return np.minimum(calculated_ps, mystique_constants.max_ps)
+
 
 class MystiqueHardThrottlingPacingSystem(MystiquePacingSystem):
+    def __init__(self, target_slope_type: TargetSpendStrategyType, context: SimulationContext = None):
+        super().__init__(target_slope_type=target_slope_type, context=context)
+        self.throttling_generator = self.context.generator('throttling')
+
     def get_pacing_signal(self, campaign_id: str):
         ps = super().get_pacing_signal(campaign_id=campaign_id)
         # if ps is high (close to 1) we will return 1 with a high probability
         # if ps is low (close to 0) we will return 0 with a high probability
-        random_number = random.random()
+        random_number = self.throttling_generator.random()
         return 1 if random_number <= ps else 0
 
+    def get_pacing_signals(self, campaign_indices: np.ndarray) -> np.ndarray:
+        return np.where(self.get_throttled_bids(campaign_indices), 0.0, 1.0)
+
+    def get_throttled_bids(self, campaign_indices: np.ndarray) -> np.ndarray:
+        ps = super().get_pacing_signals(campaign_indices)
+        # a Bernoulli mask of the whole batch, drawn in the same order as by consecutive calls to get_pacing_signal
+        random_numbers = self.throttling_generator.random(ps.size)
+        return random_numbers > ps
+
@@ -1,5 +1,7 @@
 # Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
 
+import numpy as np
+
 import src.configuration
 
 default_unknown_value = -1
@@ -25,6 +27,7 @@ budget_spend_threshold = 0.95
 ps_invalid_value = -1
 minutes_for_end_day_edge_case = 3
 ps_threshold_for_bc_campaigns = 0.95  # average ps value above which a campaign is defined as budget constrained (BC)
+ps_history_dtype = np.float64  # np.float32 halves the memory of the pacing signal histories, at a reduced precision
 
 # field names for mystique's per-campaign statistics
 FIELD_SPEND_HISTORY = 'Spend History'
@@ -0,0 +1,140 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import numpy as np
+
+import src.system.budget_pacing.mystique.mystique_constants as mystique_constants
+
+
+def _num_hours(num_iterations: int) -> int:
+    return -(-num_iterations // mystique_constants.num_iterations_per_hour)
+
+
+def _resized(array: np.ndarray, num_rows: int, num_columns: int = None) -> np.ndarray:
+    """Returns a copy of the array with the given number of rows (and columns), padded with zeros"""
+    shape = (num_rows,) + ((num_columns,) if array.ndim == 2 else ())
+    resized = np.zeros(shape, dtype=array.dtype)
+    if array.ndim == 2:
+        resized[:array.shape[0], :array.shape[1]] = array
+    else:
+        resized[:array.shape[0]] = array
+    return resized
+
+
+# The state of the campaigns that are tracked by Mystique, kept as aligned arrays with a row per campaign (a
+# structure of arrays), so that the pacing signals of all the campaigns are updated in a single vectorized pass.
+# Each MystiqueTrackedCampaign is a view of its row. Rows are never removed, and the arrays double their capacity when
+# they are full.
+class MystiqueState:
+    # the names of the arrays with a value per campaign, and of the arrays with a row of values per campaign
+    campaign_fields = ('daily_budget', 'ps', 'previous_ps', 'last_positive_ps', 'today_spend_total',
+                       'sum_ps_below_threshold', 'count_ps_below_threshold', 'num_today_ps', 'num_today_spend',
+                       'has_target_slope', 'has_target_spend')
+    today_fields = ('today_ps', 'today_spend')
+    hourly_fields = ('today_hourly_ps_sums', 'today_hourly_ps_counts')
+    target_fields = ('target_slope', 'target_spend', 'target_spend_per_minute')
+
+    def __init__(self, capacity: int = 1):
+        self.num_campaigns = 0
+        self.daily_budget = np.zeros(capacity)
+        self.ps = np.zeros(capacity)
+        self.previous_ps = np.zeros(capacity)
+        self.last_positive_ps = np.zeros(capacity)
+        # running total of today's spend, which is read by every iteration of the pacing system
+        self.today_spend_total = np.zeros(capacity)
+        # the average PS value below threshold metrics
+        self.sum_ps_below_threshold = np.zeros(capacity)
+        self.count_ps_below_threshold = np.zeros(capacity, dtype=int)
+        # the number of today's entries of each campaign (campaigns may be added in the middle of the day)
+        self.num_today_ps = np.zeros(capacity, dtype=int)
+        self.num_today_spend = np.zeros(capacity, dtype=int)
+        # each entry is the calculated PS / the spend reported from the previous iteration, and the location in the row
+        # is the number of iteration
+        self.today_ps = np.zeros((capacity, mystique_constants.num_iterations_per_day))
+        self.today_spend = np.zeros((capacity, mystique_constants.num_iterations_per_day))
+        # running sums and counts of today's PS in each hour, for the average hourly PS
+        self.today_hourly_ps_sums = np.zeros((capacity, _num_hours(mystique_constants.num_iterations_per_day)))
+        self.today_hourly_ps_counts = np.zeros((capacity, _num_hours(mystique_constants.num_iterations_per_day)),
+                                               dtype=int)
+        # the current target slope and spend curves, with an entry per hour
+        self.has_target_slope = np.zeros(capacity, dtype=bool)
+        self.has_target_spend = np.zeros(capacity, dtype=bool)
+        self.target_slope = np.zeros((capacity, mystique_constants.num_hours_per_day))
+        self.target_spend = np.zeros((capacity, mystique_constants.num_hours_per_day))
+        # the target spend of each minute of the day, for target spend strategies that precompute it per campaign (it
+        # has no columns until it is first set)
+        self.target_spend_per_minute = np.zeros((capacity, 0))
+
+    def add_campaign(self, daily_budget: float) -> int:
+        """Adds a row for a campaign, and returns its index"""
+        if self.num_campaigns == self.ps.size:
+            self._grow(max(1, 2 * self.num_campaigns))
+        index = self.num_campaigns
+        self.num_campaigns += 1
+        self.daily_budget[index] = daily_budget
+        self.ps[index] = mystique_constants.pacing_signal_for_initialization
+        self.previous_ps[index] = mystique_constants.pacing_signal_for_initialization
+        self.last_positive_ps[index] = mystique_constants.pacing_signal_for_initialization
+        return index
+
+    def update_spends(self, indices: np.ndarray, spends: np.ndarray):
+        """Appends the spend of the last iteration to today's spend of each of the campaigns"""
+        if indices.size and self.num_today_spend[indices].max() == self.today_spend.shape[1]:
+            self._grow_today_entries()
+        self.today_spend[indices, self.num_today_spend[indices]] = spends
+        self.num_today_spend[indices] += 1
+        self.today_spend_total[indices] += spends
+
+    def append_today_ps(self, indices: np.ndarray, ps: np.ndarray):
+        if indices.size and self.num_today_ps[indices].max() == self.today_ps.shape[1]:
+            self._grow_today_entries()
+        self.today_ps[indices, self.num_today_ps[indices]] = ps
+        hours = self.num_today_ps[indices] // mystique_constants.num_iterations_per_hour
+        self.today_hourly_ps_sums[indices, hours] += ps
+        self.today_hourly_ps_counts[indices, hours] += 1
+        self.num_today_ps[indices] += 1
+
+    def update_pacing_signals(self, indices: np.ndarray, ps: np.ndarray):
+        """Sets the new pacing signals of the campaigns. Because of the update of the average daily PS below threshold
+        metrics, this must always be called after update_spends"""
+        self.previous_ps[indices] = self.ps[indices]
+        positive = self.ps[indices] > 0
+        self.last_positive_ps[indices[positive]] = self.ps[indices[positive]]
+        self.ps[indices] = ps
+        self.append_today_ps(indices, ps)
+
+        # updating the average daily PS below threshold metrics
+        below_threshold = (self.today_spend_total[indices] / self.daily_budget[indices]
+                           < mystique_constants.budget_spend_threshold)
+        self.sum_ps_below_threshold[indices[below_threshold]] += ps[below_threshold]
+        self.count_ps_below_threshold[indices[below_threshold]] += 1
+
+    def set_target_spends_per_minute(self, indices: np.ndarray, target_spends_per_minute: np.ndarray):
+        if self.target_spend_per_minute.shape[1] != target_spends_per_minute.shape[1]:
+            self.target_spend_per_minute = _resized(self.target_spend_per_minute, self.ps.size,
+                                                    target_spends_per_minute.shape[1])
+        self.target_spend_per_minute[indices] = target_spends_per_minute
+
+    def last_spends(self, indices: np.ndarray) -> np.ndarray:
+        return self.today_spend[indices, self.num_today_spend[indices] - 1]
+
+    def reset_today_ps(self, index: int):
+        self.num_today_ps[index] = 0
+        self.today_hourly_ps_sums[index] = 0
+        self.today_hourly_ps_counts[index] = 0
+
+    def reset_today_spend(self, index: int):
+        self.num_today_spend[index] = 0
+        self.today_spend_total[index] = 0
+
+    def _grow(self, capacity: int):
+        for field in self.campaign_fields + self.today_fields + self.hourly_fields + self.target_fields:
+            array = getattr(self, field)
+            setattr(self, field, _resized(array, capacity, array.shape[1] if array.ndim == 2 else None))
+
+    def _grow_today_entries(self):
+        """Doubles the number of today's entries (when there are more iterations in a day than expected)"""
+        num_entries = 2 * self.today_ps.shape[1]
+        for field in self.today_fields:
+            setattr(self, field, _resized(getattr(self, field), self.ps.size, num_entries))
+        for field in self.hourly_fields:
+            setattr(self, field, _resized(getattr(self, field), self.ps.size, _num_hours(num_entries)))
@@ -1,29 +1,146 @@
 # Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
 
+import statistics
+
+import numpy as np
+
 import src.system.budget_pacing.mystique.mystique_constants as mystique_constants
-import src.system.budget_pacing.mystique.mystique_utils as utils
-from src.system.clock import Clock
+from src.system.budget_pacing.mystique.mystique_state import MystiqueState
+
+
+class DailyHistory:
+    """The values of each day (e.g. a value per iteration), kept as the rows of a preallocated array, which doubles its
+    capacity when it is full. Days may have fewer values than the row size (e.g. the first day of a campaign that was
+    added in the middle of the day), so each day is returned with its own values only"""
+    __slots__ = ('_values', '_num_values_per_day', '_num_days')
+
+    def __init__(self, num_values_per_day: int, dtype: type = np.float64):
+        self._values = np.empty((0, num_values_per_day), dtype=dtype)
+        self._num_values_per_day = np.empty(0, dtype=int)
+        self._num_days = 0
+
+    def __len__(self) -> int:
+        return self._num_days
+
+    def __getitem__(self, day: int) -> np.ndarray:
+        day = range(self._num_days)[day]
+        return self._values[day, :self._num_values_per_day[day]]
+
+    def append(self, day_values: np.ndarray):
+        if self._num_days == self._values.shape[0]:
+            capacity = max(1, 2 * self._num_days)
+            num_values = max(self._values.shape[1], len(day_values))
+            values = np.empty((capacity, num_values), dtype=self._values.dtype)
+            values[:self._num_days, :self._values.shape[1]] = self._values[:self._num_days]
+            self._values = values
+            self._num_values_per_day = np.resize(self._num_values_per_day, capacity)
+        elif len(day_values) > self._values.shape[1]:
+            values = np.empty((self._values.shape[0], len(day_values)), dtype=self._values.dtype)
+            values[:self._num_days, :self._values.shape[1]] = self._values[:self._num_days]
+            self._values = values
+        self._values[self._num_days, :len(day_values)] = day_values
+        self._num_values_per_day[self._num_days] = len(day_values)
+        self._num_days += 1
+
+    def pop(self):
+        """Removes the values of the last day"""
+        if self._num_days > 0:
+            self._num_days -= 1
+
+    def tolist(self) -> list[list[float]]:
+        return [self[day].tolist() for day in range(self._num_days)]
 
 
 class MystiqueTrackedCampaign:
-    def __init__(self, daily_budget: float):
-        self.daily_budget = daily_budget
-        self.ps = mystique_constants.pacing_signal_for_initialization
-        self.previous_ps = mystique_constants.pacing_signal_for_initialization
-        self.last_positive_ps = mystique_constants.pacing_signal_for_initialization
-        self.ps_history = []  # list of lists for each day, each entry in arr is the calculated ps and the location is number of iteration
-        self.today_ps = []    # each entry is the calculated PS, the location in the arr is the number of iteration
-        self.spend_history = []   # list of lists for each day, each entry in arr is the spend and the location is number of iteration
-        self.today_spend = []   # each entry is the spend reported from the previous iteration, the location in the arr is the number of iteration
-        self.current_target_slope = []
-        self.target_slope_history = []
-        self.current_target_spend_curve = []
-        self.target_spend_history = []
-        self.sum_ps_below_threshold = 0
-        self.count_ps_below_threshold = 0
-        self.day_started = Clock.days()
+    # The values of the campaign that are updated in every iteration are kept in its row of a MystiqueState, which may
+    # be shared by all the campaigns of a pacing system, and the histories of the past days in DailyHistory arrays.
+    __slots__ = ('state', 'index', 'ps_history', 'spend_history', 'target_slope_history', 'target_spend_history',
+                 'daily_avg_ps', 'day_started')
+
+    def __init__(self, daily_budget: float, day_started: int, state: MystiqueState = None):
+        self.state = state if state is not None else MystiqueState()
+        self.index = self.state.add_campaign(daily_budget)
+        # a row for each day, each entry in the row is the calculated ps and the location is number of iteration
+        self.ps_history = DailyHistory(mystique_constants.num_iterations_per_day,
+                                       dtype=mystique_constants.ps_history_dtype)
+        # a row for each day, each entry in the row is the spend and the location is number of iteration
+        self.spend_history = DailyHistory(mystique_constants.num_iterations_per_day)
+        self.target_slope_history = DailyHistory(mystique_constants.num_hours_per_day)
+        self.target_spend_history = DailyHistory(mystique_constants.num_hours_per_day)
+        # the average PS of each day, which is kept even when the histories of the day are released
+        self.daily_avg_ps = []
+        self.day_started = day_started
         self.new_day_init(is_new_campaign=True)
 
+    @property
+    def daily_budget(self) -> float:
+        return self.state.daily_budget[self.index]
+
+    @property
+    def ps(self) -> float:
+        return self.state.ps[self.index]
+
+    @ps.setter
+    def ps(self, ps: float):
+        self.state.ps[self.index] = ps
+
+    @property
+    def previous_ps(self) -> float:
+        return self.state.previous_ps[self.index]
+
+    @previous_ps.setter
+    def previous_ps(self, previous_ps: float):
+        self.state.previous_ps[self.index] = previous_ps
+
+    @property
+    def last_positive_ps(self) -> float:
+        return self.state.last_positive_ps[self.index]
+
+    @last_positive_ps.setter
+    def last_positive_ps(self, last_positive_ps: float):
+        self.state.last_positive_ps[self.index] = last_positive_ps
+
+    @property
+    def sum_ps_below_threshold(self) -> float:
+        return self.state.sum_ps_below_threshold[self.index]
+
+    @sum_ps_below_threshold.setter
+    def sum_ps_below_threshold(self, sum_ps_below_threshold: float):
+        self.state.sum_ps_below_threshold[self.index] = sum_ps_below_threshold
+
+    @property
+    def count_ps_below_threshold(self) -> int:
+        return self.state.count_ps_below_threshold[self.index]
+
+    @count_ps_below_threshold.setter
+    def count_ps_below_threshold(self, count_ps_below_threshold: int):
+        self.state.count_ps_below_threshold[self.index] = count_ps_below_threshold
+
+    @property
+    def today_ps(self) -> np.ndarray:
+        """Each entry is the calculated PS, the location in the arr is the number of iteration"""
+        return self.state.today_ps[self.index, :self.state.num_today_ps[self.index]]
+
+    @today_ps.setter
+    def today_ps(self, today_ps: list[float]):
+        self.state.reset_today_ps(self.index)
+        for ps in today_ps:
+            self.state.append_today_ps(np.array([self.index]), np.array([ps]))
+
+    @property
+    def today_spend(self) -> np.ndarray:
+        """Each entry is the spend reported from the previous iteration, the location in the arr is the number of
+        iteration"""
+        return self.state.today_spend[self.index, :self.state.num_today_spend[self.index]]
+
+    @property
+    def current_target_slope(self) -> list[float]:
+        return self.state.target_slope[self.index].tolist() if self.state.has_target_slope[self.index] else []
+
+    @property
+    def current_target_spend_curve(self) -> list[float]:
+        return self.state.target_spend[self.index].tolist() if self.state.has_target_spend[self.index] else []
+
     def new_day_init(self, is_new_campaign=False):
         # updating the PS values
         if is_new_campaign:
@@ -38,51 +155,55 @@ class MystiqueTrackedCampaign:
             self.last_positive_ps = avg_ps_below_threshold
         self.previous_ps = min(self.previous_ps, mystique_constants.max_ps)
 
-        # updating the PS history arr and initializing today's PS arr
-        if len(self.today_ps) > 0:
-            self.ps_history.append(self.today_ps)
-        self.today_ps = []
+        # updating the PS history and initializing today's PS
+        today_ps = self.today_ps
+        if today_ps.size > 0:
+            self.ps_history.append(today_ps)
+            self.daily_avg_ps.append(statistics.mean(today_ps.tolist()))
+        self.state.reset_today_ps(self.index)
 
-        # updating the spend history arr and initializing today's spend arr
-        if len(self.today_spend) > 0:
-            self.spend_history.append(self.today_spend)
-        self.today_spend = []
+        # updating the spend history and initializing today's spend
+        today_spend = self.today_spend
+        if today_spend.size > 0:
+            self.spend_history.append(today_spend)
+        self.state.reset_today_spend(self.index)
 
         # initializing the average PS value below threshold metrics
         self.sum_ps_below_threshold = 0
         self.count_ps_below_threshold = 0
 
     def update_spend(self, spend: float):
-        self.today_spend.append(spend)
+        self.state.update_spends(np.array([self.index]), np.array([spend]))
 
     def update_pacing_signal(self, ps: float):
         """Because of the update of the average daily PS below threshold metrics, this must always be called after update_spend"""
-        self.previous_ps = self.ps
-        if self.ps > 0:
-            self.last_positive_ps = self.ps
-        self.ps = ps
-        self.today_ps.append(ps)
+        self.state.update_pacing_signals(np.array([self.index]), np.array([ps], dtype=float))
 
-        # updating the average daily PS below threshold metrics
-        if self.get_today_spend() / self.daily_budget < mystique_constants.budget_spend_threshold:
-            self.sum_ps_below_threshold += self.ps
-            self.count_ps_below_threshold += 1
+    def release_last_day_history(self):
+        """Releases the histories of the last day, after they were written into a statistics sink. The average daily
+        PS, which is needed by the global statistics, is kept"""
+        self.spend_history.pop()
+        self.ps_history.pop()
+        self.target_slope_history.pop()
+        self.target_spend_history.pop()
 
     def update_target_slope_curve(self, target_slope_curve: list[float]):
-        if len(self.current_target_slope) > 0:
-            self.target_slope_history.append(self.current_target_slope)
-        self.current_target_slope = target_slope_curve
+        if self.state.has_target_slope[self.index]:
+            self.target_slope_history.append(self.state.target_slope[self.index])
+        self.state.target_slope[self.index] = target_slope_curve
+        self.state.has_target_slope[self.index] = True
 
     def update_target_spend_curve(self, target_spend_curve: list[float]):
-        if len(self.current_target_spend_curve) > 0:
-            self.target_spend_history.append(self.current_target_spend_curve)
-        self.current_target_spend_curve = target_spend_curve
+        if self.state.has_target_spend[self.index]:
+            self.target_spend_history.append(self.state.target_spend[self.index])
+        self.state.target_spend[self.index] = target_spend_curve
+        self.state.has_target_spend[self.index] = True
 
     def get_spend_in_last_time_interval(self):
-        return self.today_spend[-1]
+        return self.state.today_spend[self.index, self.state.num_today_spend[self.index] - 1].item()
 
     def get_today_spend(self):
-        return sum(self.today_spend)
+        return self.state.today_spend_total[self.index].item()
 
     def get_avg_daily_ps_below_threshold(self):
         """average PS value for all iterations where spend-to-budget ratio < mystique_constants.budget_spend_threshold"""
@@ -94,4 +215,7 @@ class MystiqueTrackedCampaign:
         return self.get_avg_daily_ps_below_threshold()
 
     def get_avg_hourly_ps(self):
-        return utils.get_average_per_size(self.today_ps, mystique_constants.num_iterations_per_hour)
+        """The average PS of each hour of the day so far (the last hour may be partial)"""
+        num_hours = -(-self.state.num_today_ps[self.index] // mystique_constants.num_iterations_per_hour)
+        return (self.state.today_hourly_ps_sums[self.index, :num_hours]
+                / self.state.today_hourly_ps_counts[self.index, :num_hours]).tolist()
@@ -2,9 +2,13 @@
 
 import abc
 from enum import Enum
-from src.system.clock import Clock
+from src.system.clock import SimulationClock, default_clock
 
+import numpy as np
+
+import src.constants as constants
 import src.system.budget_pacing.mystique.mystique_constants as mystique_constants
+from src.system.budget_pacing.mystique.mystique_state import MystiqueState
 from src.system.budget_pacing.mystique.mystique_tracked_campaign import MystiqueTrackedCampaign
 
 
@@ -21,7 +25,9 @@ class TargetSpendStrategyInterface(metaclass=abc.ABCMeta):
                 hasattr(subclass, 'update_slope') and
                 callable(subclass.update_campaign_spend) and
                 hasattr(subclass, 'get_target_slope_and_spend') and
-                callable(subclass.get_target_slope_and_spend))
+                callable(subclass.get_target_slope_and_spend) and
+                hasattr(subclass, 'get_target_slopes_and_spends') and
+                callable(subclass.get_target_slopes_and_spends))
 
     @abc.abstractmethod
     def initialize_slope(self, mystique_tracked_campaign):
@@ -33,15 +39,36 @@ class TargetSpendStrategyInterface(metaclass=abc.ABCMeta):
         """updating the slope of the campaign according to last day behavior"""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def update_target_slopes_and_spends(self, state: MystiqueState,
+                                        mystique_tracked_campaigns: list[MystiqueTrackedCampaign]):
+        """updating the slopes of the given campaigns (whose values are in the given state) at once"""
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_target_slope_and_spend(self, mystique_tracked_campaign):
         """getting the target slope and spend for the current iteration"""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_target_slopes_and_spends(self, state: MystiqueState, indices: np.ndarray):
+        """getting the target slopes and spends of the campaigns in the given rows of the state for the current
+        iteration"""
+        raise NotImplementedError
+
 
 class LinearTargetSpendStrategy(TargetSpendStrategyInterface):
+    # the slope of the target spend curve, which is constant throughout the day
+    target_slope = 1
+
+    def __init__(self, clock: SimulationClock = None):
+        self.clock = clock if clock is not None else default_clock
+        # the target spend of each minute of the day, which is the same for all the campaigns
+        percent_of_day_passed = (np.arange(constants.num_minutes_in_day) + 1) / mystique_constants.num_iterations_per_day
+        self.target_spend_per_minute = percent_of_day_passed * self.target_slope
+
     def initialize_slope(self, mystique_tracked_campaign: MystiqueTrackedCampaign):
-        target_slope_array = [1] * mystique_constants.num_hours_per_day
+        target_slope_array = [self.target_slope] * mystique_constants.num_hours_per_day
         target_spend_array = self.get_target_spend_array(target_slope_array)
         mystique_tracked_campaign.update_target_slope_curve(target_slope_array)
         mystique_tracked_campaign.update_target_spend_curve(target_spend_array)
@@ -52,12 +79,20 @@ class LinearTargetSpendStrategy(TargetSpendStrategyInterface):
         mystique_tracked_campaign.update_target_slope_curve(target_slope_array)
         mystique_tracked_campaign.update_target_spend_curve(target_spend_array)
 
+    def update_target_slopes_and_spends(self, _: MystiqueState,
+                                        mystique_tracked_campaigns: list[MystiqueTrackedCampaign]):
+        for mystique_tracked_campaign in mystique_tracked_campaigns:
+            self.update_target_slope_and_spend(mystique_tracked_campaign)
+
     def get_target_slope_and_spend(self, _: MystiqueTrackedCampaign):
-        percent_of_day_passed = (Clock.minute_in_day() + 1) / mystique_constants.num_iterations_per_day
-        target_slope = 1
-        target_spend = percent_of_day_passed * target_slope
+        target_slope = self.target_slope
+        target_spend = self.target_spend_per_minute[self.clock.minute_in_day()]
         return target_slope, target_spend
 
+    def get_target_slopes_and_spends(self, _: MystiqueState, indices: np.ndarray):
+        target_slope, target_spend = self.get_target_slope_and_spend(None)
+        return np.full(indices.size, target_slope, dtype=float), np.full(indices.size, target_spend)
+
     @staticmethod
     def get_target_spend_array(target_slope_array: list[float]):
         target_spend_array = [0] * mystique_constants.num_hours_per_day
@@ -75,6 +110,10 @@ class NonLinearTargetSpendStrategy(LinearTargetSpendStrategy):
     smoothing_factor = 0.5
     epsilon = 0.0002
 
+    def initialize_slope(self, mystique_tracked_campaign: MystiqueTrackedCampaign):
+        super().initialize_slope(mystique_tracked_campaign)
+        self.update_target_spends_per_minute(mystique_tracked_campaign.state, np.array([mystique_tracked_campaign.index]))
+
     def update_target_slope_and_spend(self, mystique_tracked_campaign: MystiqueTrackedCampaign):
         avg_daily_ps = mystique_tracked_campaign.get_avg_daily_ps()
         avg_hourly_ps = mystique_tracked_campaign.get_avg_hourly_ps()
@@ -113,25 +152,71 @@ class NonLinearTargetSpendStrategy(LinearTargetSpendStrategy):
         mystique_tracked_campaign.update_target_slope_curve(updated_target_slope)
         target_spend_array = self.get_target_spend_array(updated_target_slope)
         mystique_tracked_campaign.update_target_spend_curve(target_spend_array)
+        self.update_target_spends_per_minute(mystique_tracked_campaign.state, np.array([mystique_tracked_campaign.index]))
+
+    def update_target_slopes_and_spends(self, state: MystiqueState,
+                                        mystique_tracked_campaigns: list[MystiqueTrackedCampaign]):
+        """The batched update_target_slope_and_spend, over a matrix of the target slopes of the campaigns, with a row
+        per campaign and a column per hour"""
+        indices = np.fromiter((campaign.index for campaign in mystique_tracked_campaigns), dtype=int,
+                              count=len(mystique_tracked_campaigns))
+        length = state.target_slope.shape[1]
+        # if a campaign was added in the middle of the current day, don't update its target slope and spend
+        num_hours = -(-state.num_today_ps[indices] // mystique_constants.num_iterations_per_hour)
+        updated = num_hours >= length
+        indices = indices[updated]
+
+        count_ps_below_threshold = state.count_ps_below_threshold[indices]
+        avg_daily_ps = np.full(indices.size, float(mystique_constants.ps_invalid_value))
+        np.divide(state.sum_ps_below_threshold[indices], count_ps_below_threshold, out=avg_daily_ps,
+                  where=count_ps_below_threshold > 0)
+        avg_daily_ps = avg_daily_ps[:, np.newaxis]
+        avg_hourly_ps = state.today_hourly_ps_sums[indices, :length] / state.today_hourly_ps_counts[indices, :length]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            daily_to_hourly_ps_ratio = avg_daily_ps / avg_hourly_ps
+        update_factor = np.where((avg_daily_ps < self.epsilon) | (avg_hourly_ps < self.epsilon), 1.0,
+                                 np.minimum(daily_to_hourly_ps_ratio, self.max_update_factor))
+        current_target_slope = np.clip(state.target_slope[indices] * update_factor, self.min_slope, self.max_slope)
+
+        # smoothing, with the neighbours of each hour taken circularly
+        updated_target_slope = self.smoothing_factor / 2 * \
+            (np.roll(current_target_slope, 1, axis=1) + np.roll(current_target_slope, -1, axis=1)) + \
+            (1 - self.smoothing_factor) * current_target_slope
+        # the cumulative sum adds the slopes in order, as the sequential sum of update_target_slope_and_spend
+        sum_slopes = np.cumsum(updated_target_slope, axis=1)[:, -1:]
 
-    def get_target_slope_and_spend(self, mystique_tracked_campaign: MystiqueTrackedCampaign):
-        hour = Clock.hour_in_day()
-        minute_in_hour = Clock.minute_in_hour() + 1
-
-        # target slope
-        target_slope = mystique_tracked_campaign.current_target_slope[hour]
-
-        # target spend
-        current_target_spend_curve = mystique_tracked_campaign.current_target_spend_curve
+        # normalization
+        updated_target_slope = mystique_constants.num_hours_per_day * updated_target_slope / sum_slopes
+        target_spend = np.cumsum(updated_target_slope / mystique_constants.num_hours_per_day, axis=1)
 
-        if hour == 0:
-            target_spend = \
-                current_target_spend_curve[hour] * minute_in_hour / mystique_constants.num_iterations_per_hour
-        else:
-            target_spend = current_target_spend_curve[hour-1] + \
-                           (current_target_spend_curve[hour] - current_target_spend_curve[hour-1]) * minute_in_hour / \
-                           mystique_constants.num_iterations_per_hour
+        # updating spend and slop history
+        updated_campaigns = [campaign for campaign, is_updated in zip(mystique_tracked_campaigns, updated) if is_updated]
+        for i, mystique_tracked_campaign in enumerate(updated_campaigns):
+            mystique_tracked_campaign.update_target_slope_curve(updated_target_slope[i])
+            mystique_tracked_campaign.update_target_spend_curve(target_spend[i])
+        self.update_target_spends_per_minute(state, indices)
 
+    def get_target_slope_and_spend(self, mystique_tracked_campaign: MystiqueTrackedCampaign):
+        state, index = mystique_tracked_campaign.state, mystique_tracked_campaign.index
+        target_slope = state.target_slope[index, self.clock.hour_in_day()]
+        target_spend = state.target_spend_per_minute[index, self.clock.minute_in_day()]
         return target_slope, target_spend
 
+    def get_target_slopes_and_spends(self, state: MystiqueState, indices: np.ndarray):
+        target_slope = state.target_slope[indices, self.clock.hour_in_day()]
+        target_spend = state.target_spend_per_minute[indices, self.clock.minute_in_day()]
+        return target_slope, target_spend
 
+    @staticmethod
+    def update_target_spends_per_minute(state: MystiqueState, indices: np.ndarray):
+        """Interpolates the hourly target spend curves of the campaigns into the target spend of each minute of the
+        day, which is looked up by every iteration until the curves are updated"""
+        target_spend_curves = state.target_spend[indices]
+        hours, minutes_in_hour = np.divmod(np.arange(constants.num_minutes_in_day), constants.num_minutes_in_hour)
+        # the target spend at the beginning of each hour (0 before the first hour)
+        previous_target_spend = np.concatenate((np.zeros((indices.size, 1)), target_spend_curves[:, :-1]), axis=1)
+        target_spends_per_minute = previous_target_spend[:, hours] + \
+            (target_spend_curves[:, hours] - previous_target_spend[:, hours]) * (minutes_in_hour + 1) / \
+            mystique_constants.num_iterations_per_hour
+        state.set_target_spends_per_minute(indices, target_spends_per_minute)
@@ -1,6 +1,9 @@
 # Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
 
 import abc
+from typing import Optional
+
+import numpy as np
 
 
 class PacingSystemInterface(metaclass=abc.ABCMeta):
@@ -23,6 +26,41 @@ class PacingSystemInterface(metaclass=abc.ABCMeta):
         """updates the current spend of the campaign"""
         raise NotImplementedError
 
+    def register_campaign(self, campaign, campaign_index: int):
+        """Adds a tracked campaign, which is referred to by the given index in the batch methods (the index of the
+        campaign in the serving system)"""
+        self.add_campaign(campaign)
+        self._registered_campaign_ids()[campaign_index] = campaign.id
+
+    def end_iteration_batch(self, spends: np.ndarray, campaign_indices: np.ndarray = None):
+        """Updates the current spends of the campaigns with the given indices (by default, all the registered
+        campaigns, in the order of their indices) at once. Pacing systems that can update all of their campaigns in a
+        single pass override this"""
+        campaign_ids = self._registered_campaign_ids()
+        if campaign_indices is None:
+            campaign_indices = sorted(campaign_ids)
+        for campaign_index, spend in zip(campaign_indices, spends):
+            self.end_iteration(campaign_ids[campaign_index], spend)
+
+    def get_pacing_signals(self, campaign_indices: np.ndarray) -> np.ndarray:
+        """Returns the pacing signals of the campaigns with the given indices (which may repeat), e.g. of all the
+        bids of a batch of auctions. Pacing systems that can look up all of the pacing signals at once override this"""
+        campaign_ids = self._registered_campaign_ids()
+        return np.fromiter((self.get_pacing_signal(campaign_ids[campaign_index]) for campaign_index in campaign_indices),
+                           dtype=float, count=len(campaign_indices))
+
+    def get_throttled_bids(self, campaign_indices: np.ndarray) -> Optional[np.ndarray]:
+        """Pacing systems that throttle bids (with pacing signals that are either 0 or 1) return whether each of the
+        bids of the campaigns with the given indices (which may repeat) is dropped, so that throttled bids don't have
+        to be sampled. The bids that aren't dropped participate with a pacing signal of 1. Other pacing systems return
+        None, and their pacing signals are applied to the sampled bids"""
+        return None
+
+    def _registered_campaign_ids(self) -> dict[int, str]:
+        if not hasattr(self, '_campaign_ids_by_index'):
+            self._campaign_ids_by_index = {}
+        return self._campaign_ids_by_index
+
     @abc.abstractmethod
     def get_pacing_signal(self, campaign_id):
         """Returns the current pacing signal of the campaign"""
@@ -38,3 +76,8 @@ class PacingSystemInterface(metaclass=abc.ABCMeta):
         """Returns the global pacing statistics"""
         raise NotImplementedError
 
+    def release_last_day_statistics(self, campaign_id: str):
+        """Releases the detailed pacing statistics of the campaign in the last day, after they were written into a
+        statistics sink. The totals that are needed for the global pacing statistics are kept"""
+        pass
+
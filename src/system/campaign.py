@@ -8,18 +8,19 @@ from scipy import stats
 import src.configuration as config
 from src.system.auction import AuctionInterface
 from src.system.bid import Bid
-from src.system.clock import Clock
+from src.system.clock import Clock, SimulationClock, default_clock
+from src.system.simulation_context import SimulationContext, default_context
 
 
 class CampaignStatistics:
     num_iterations_per_spend_entry = config.num_iterations_per_day // config.num_spend_entries_per_day
     num_iterations_per_win_entry = config.num_iterations_per_day // config.num_win_entries_per_day
 
-    def __init__(self, run_period: int):
+    def __init__(self, run_period: int, clock: SimulationClock = None):
+        self.clock = clock if clock is not None else default_context().clock
         self.spend_history = []
         self.today_spend = []
         self.total_spent_today = 0
-        self.minutes_alive_today = 1  # starts from 1 to count the first minute of the day, when all campaigns are alive
         self.minutes_alive_history = []
         self.auctions_won_history = []
         self.auctions_won_today = []
@@ -27,77 +28,110 @@ class CampaignStatistics:
         self.day_started = None
         self.day_ended = None
         self._reset_today_stats()
+        # a campaign that is created in the middle of the day is alive from the current minute
+        self.alive_since_minute = self.clock.minute_in_day()
 
     def prepare_for_new_day(self):
         # set start day if not already set
         if self.day_started is None:
-            self.day_started = Clock.days()
+            self.day_started = self.clock.days()
         # decrement the number of days left for the campaign to run
         self.days_left_to_run -= 1
         if self.days_left_to_run == 0:
-            self.day_ended = Clock.days()
+            self.day_ended = self.clock.days()
         # update history
         self.spend_history.append(self.today_spend)
         self.auctions_won_history.append(self.auctions_won_today)
         self.minutes_alive_history.append(self.minutes_alive_today)
         self._reset_today_stats()
 
-    def update(self, payment: float):
-        self.today_spend[self._calculate_spend_index_in_day()] += payment
+    def release_last_day_history(self):
+        """Replaces the entries of the last day in the histories with their daily totals, which are all that the
+        global statistics need. Releasing a day more than once has no effect"""
+        if self.spend_history:
+            self.spend_history[-1] = [sum(self.spend_history[-1])]
+            self.auctions_won_history[-1] = [sum(self.auctions_won_history[-1])]
+
+    def update(self, payment: float, num_wins: int = 1):
+        self.today_spend[self._calculate_spend_index_in_day(self.clock)] += payment
         self.total_spent_today += payment
-        self.auctions_won_today[self._calculate_win_index_in_day()] += 1
+        self.auctions_won_today[self._calculate_win_index_in_day(self.clock)] += num_wins
+
+    @property
+    def minutes_alive_today(self) -> int:
+        """The number of minutes of the day in which the campaign is alive, from the minute in which it became alive
+        up to the minute in which it depleted its daily budget (or the current minute), inclusive"""
+        last_minute = self.depletion_minute if self.depletion_minute is not None else self.clock.minute_in_day()
+        return 1 + max(last_minute - self.alive_since_minute, 0)
 
     def _reset_today_stats(self):
         self.today_spend = [0] * config.num_spend_entries_per_day
         self.auctions_won_today = [0] * config.num_win_entries_per_day
         self.total_spent_today = 0
-        self.minutes_alive_today = 1
+        # the minute of the day from which the campaign is alive, and the minute in which it depleted its daily budget
+        # (None while it hasn't)
+        self.alive_since_minute = 0
+        self.depletion_minute = None
 
     @staticmethod
-    def _calculate_spend_index_in_day():
-        return Clock.minute_in_day() // CampaignStatistics.num_iterations_per_spend_entry
+    def _calculate_spend_index_in_day(clock: SimulationClock = default_clock):
+        return clock.minute_in_day() // CampaignStatistics.num_iterations_per_spend_entry
 
     @staticmethod
-    def _calculate_win_index_in_day():
-        return Clock.minute_in_day() // CampaignStatistics.num_iterations_per_win_entry
+    def _calculate_win_index_in_day(clock: SimulationClock = default_clock):
+        return clock.minute_in_day() // CampaignStatistics.num_iterations_per_win_entry
 
 
 class Campaign:
     def __init__(self, campaign_id: str, total_budget: float, run_period: int,
                  targeting_groups: dict[str, set[int]] = None, bids_distribution: stats.rv_continuous = None,
-                 max_bid: float = None):
+                 max_bid: float = None, context: SimulationContext = None):
         self.id = campaign_id
-        if max_bid and max_bid < config.campaign_minimal_bid:
+        self.context = context if context is not None else default_context()
+        if max_bid and max_bid < self.context.config.campaign_minimal_bid:
             raise Exception('Invalid max_bid parameter.')
         self.max_bid = max_bid
         self.total_budget = total_budget
         self.daily_budget = total_budget / run_period
         self.bids_distribution = bids_distribution
         if self.bids_distribution is None:
-            self.bids_distribution = config.bids_distribution_medium_budget
-        assert self.daily_budget >= config.campaign_minimal_bid
+            self.bids_distribution = self.context.config.bids_distribution_medium_budget
+        assert self.daily_budget >= self.context.config.campaign_minimal_bid
         if targeting_groups is None:
             targeting_groups = {}
         self._targeting_groups = targeting_groups
-        self.stats = CampaignStatistics(run_period=run_period)
-        self.bids_cache = np.array([])
+        self.stats = CampaignStatistics(run_period=run_period, clock=self.context.clock)
 
     def bid(self) -> Optional[Bid]:
-        if not self.bids_cache.size:
-            self.bids_cache = self.bids_distribution.rvs(size=config.bid_sampling_batch_size)
-        bid_amount, self.bids_cache = self.bids_cache[-1], self.bids_cache[:-1]
+        bid_amount = self.bid_amount()
+        if bid_amount is None:
+            return None
+        return Bid(campaign_id=self.id, amount=bid_amount)
+
+    def bid_amount(self) -> Optional[float]:
+        """Samples the amount of a single bid, without creating a bid object. Returns None below the minimal bid"""
+        bid_amount = self.context.bid_sampler.sample_one(self.bids_distribution, campaign_id=self.id)
         if self.max_bid:
             bid_amount = min(bid_amount, self.max_bid)
-        if bid_amount < config.campaign_minimal_bid:
+        if bid_amount < self.context.config.campaign_minimal_bid:
             return None
-        return Bid(campaign_id=self.id, amount=bid_amount)
+        return bid_amount
 
-    def pay(self, amount: float):
-        self.stats.update(amount)
+    def sample_bids(self, size: int) -> np.ndarray:
+        """Samples the amounts of {size} bids at once. Bids below the minimal bid are returned as -inf"""
+        bid_amounts = self.context.bid_sampler.sample(self.bids_distribution, size, campaign_id=self.id,
+                                                      max_bid=self.max_bid)
+        return np.where(bid_amounts < self.context.config.campaign_minimal_bid, -np.inf, bid_amounts)
+
+    def pay(self, amount: float, num_wins: int = 1):
+        self.stats.update(amount, num_wins)
 
     def prepare_for_new_day(self):
         self.stats.prepare_for_new_day()
 
+    def release_last_day_history(self):
+        self.stats.release_last_day_history()
+
     def days_left_to_run(self):
         return self.stats.days_left_to_run
 
@@ -130,10 +164,14 @@ class Campaign:
                 if (spent_in_day := sum(self.spend_history()[day])) > self.daily_budget else 0
                 for day in range(len(self.num_auctions_won_history()))]
 
+    def targeting_groups(self) -> dict[str, set[int]]:
+        return self._targeting_groups
+
     def is_relevant_auction(self, auction: AuctionInterface) -> bool:
-        user_properties = auction.user_properties()
+        return self.is_relevant_user_properties(auction.user_properties())
+
+    def is_relevant_user_properties(self, user_properties: dict[str, int]) -> bool:
         for (feature, desired_values) in self._targeting_groups.items():
             if user_properties.get(feature) not in desired_values:
                 return False
         return True
-
@@ -3,34 +3,82 @@
 import src.constants as constants
 
 
+# The clock of a single simulation.
+# The time fields are calculated once per tick (when the clock advances or is set), instead of on every access.
+class SimulationClock:
+    def __init__(self, iterations: int = 0):
+        self.iterations = iterations
+
+    @property
+    def iterations(self) -> int:
+        return self._iterations
+
+    @iterations.setter
+    def iterations(self, iterations: int):
+        self._iterations = iterations
+        self._days, self._minute_in_day = divmod(iterations, constants.num_minutes_in_day)
+        self._hour_in_day, self._minute_in_hour = divmod(self._minute_in_day, constants.num_minutes_in_hour)
+
+    def advance(self):
+        self.iterations = self._iterations + 1
+
+    def minute_in_day(self) -> int:
+        return self._minute_in_day
+
+    def minute_in_hour(self) -> int:
+        return self._minute_in_hour
+
+    def hour_in_day(self) -> int:
+        return self._hour_in_day
+
+    def days(self) -> int:
+        return self._days
+
+    def reset(self):
+        self.iterations = 0
+
+
+# the clock of the default simulation context
+default_clock = SimulationClock()
+
+
+class _ClockMeta(type):
+    # keeps Clock._iterations readable and assignable, as it was when the clock was kept in a class attribute
+    @property
+    def _iterations(cls) -> int:
+        return default_clock.iterations
+
+    @_iterations.setter
+    def _iterations(cls, iterations: int):
+        default_clock.iterations = iterations
+
+
 # This class will serve as a global clock.
 # The class will be imported by different modules which need access to the clock.
 # The (static) methods can be called through the class itself, so the class does not need to be instantiated.
-class Clock:
-    _iterations = 0
-
+# The global clock is the clock of the default simulation context. Simulations that run with their own context
+# (see SimulationContext) use the clock of that context instead.
+class Clock(metaclass=_ClockMeta):
     @classmethod
     def advance(cls):
-        cls._iterations += 1
+        default_clock.advance()
 
     @classmethod
     def minute_in_day(cls):
-        return cls._iterations % constants.num_minutes_in_day
+        return default_clock.minute_in_day()
 
     @classmethod
     def minute_in_hour(cls):
-        return cls.minute_in_day() % constants.num_minutes_in_hour
+        return default_clock.minute_in_hour()
 
     @classmethod
     def hour_in_day(cls):
-        return cls.minute_in_day() // constants.num_minutes_in_hour
+        return default_clock.hour_in_day()
 
     @classmethod
     def days(cls):
-        return cls._iterations // constants.num_minutes_in_day
+        return default_clock.days()
 
     @classmethod
     def reset(cls):
-        cls._iterations = 0
-
-
+        default_clock.reset()
@@ -0,0 +1,110 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import json
+import os
+
+import numpy as np
+
+from src.system.auction import AuctionInterface, AuctionFP
+from src.system.auction_batch import AuctionBatch, BatchRandomNumbers
+
+METADATA_FILE_NAME = 'metadata.json'
+NUM_AUCTIONS_FILE_NAME = 'num_auctions.bin'
+NUM_TRACKED_BIDS_FILE_NAME = 'num_tracked_bids.bin'
+TRACKED_BIDS_FILE_NAME = 'tracked_bids.bin'
+UNTRACKED_BIDS_FILE_NAME = 'untracked_bids.bin'
+COUNT_DTYPE = np.int64
+USER_PROPERTY_DTYPE = np.int64
+BID_DTYPE = np.float64
+
+
+# In the common random numbers mode, the random inputs of a simulation (the auctions of each minute, the raw bids of
+# the tracked campaigns and the top untracked bids) are recorded once, and replayed by the simulations of all the
+# pacing algorithms. Pacing only scales the bids, and budgets only exclude campaigns from auctions, so the same inputs
+# are valid for all the algorithms, and their results can be compared pairwise.
+# The recording is a folder of flat binary files, which are appended to minute by minute and memory-mapped on replay:
+# - the number of auctions and the number of recorded tracked bids of each minute
+# - the values of each user property, one per auction
+# - the raw tracked bids of the relevant (auction, campaign) pairs of each minute, in column-major order
+# - the two highest untracked bids of each auction
+# Only the batched auction engine supports this mode.
+class CommonRandomNumbersRecorder:
+    def __init__(self, folder_path: str, features: list[str]):
+        os.makedirs(folder_path, exist_ok=True)
+        self.folder_path = folder_path
+        self.features = list(features)
+        self.num_minutes = 0
+        self._files = {file_name: open(f'{folder_path}/{file_name}', 'wb')
+                       for file_name in [NUM_AUCTIONS_FILE_NAME, NUM_TRACKED_BIDS_FILE_NAME, TRACKED_BIDS_FILE_NAME,
+                                         UNTRACKED_BIDS_FILE_NAME] + [_user_property_file_name(feature)
+                                                                      for feature in self.features]}
+
+    def record(self, auction_batch: AuctionBatch):
+        """Appends the auctions of a minute and their random numbers (the batch must have been resolved with
+        record_random_numbers set)"""
+        random_numbers = auction_batch.random_numbers
+        if random_numbers is None:
+            # no bids were requested (e.g. a minute without auctions)
+            random_numbers = BatchRandomNumbers(tracked_bids=np.empty(0),
+                                                untracked_bids=np.full((len(auction_batch), 2), -np.inf))
+        self._write(NUM_AUCTIONS_FILE_NAME, np.array([len(auction_batch)], dtype=COUNT_DTYPE))
+        self._write(NUM_TRACKED_BIDS_FILE_NAME, np.array([random_numbers.tracked_bids.size], dtype=COUNT_DTYPE))
+        for feature in self.features:
+            self._write(_user_property_file_name(feature),
+                        np.asarray(auction_batch.user_properties[feature], dtype=USER_PROPERTY_DTYPE))
+        self._write(TRACKED_BIDS_FILE_NAME, np.asarray(random_numbers.tracked_bids, dtype=BID_DTYPE))
+        self._write(UNTRACKED_BIDS_FILE_NAME, np.asarray(random_numbers.untracked_bids, dtype=BID_DTYPE))
+        self.num_minutes += 1
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        with open(f'{self.folder_path}/{METADATA_FILE_NAME}', 'w') as f:
+            json.dump({'features': self.features, 'num_minutes': self.num_minutes}, f)
+
+    def _write(self, file_name: str, values: np.ndarray):
+        self._files[file_name].write(values.tobytes())
+
+
+class CommonRandomNumbersReplayer:
+    def __init__(self, folder_path: str):
+        with open(f'{folder_path}/{METADATA_FILE_NAME}') as f:
+            metadata = json.load(f)
+        self.features = metadata['features']
+        self.num_minutes = metadata['num_minutes']
+        # the offsets of each minute in the per-auction and in the per-bid files
+        self._auction_offsets = np.concatenate(([0], np.cumsum(
+            np.fromfile(f'{folder_path}/{NUM_AUCTIONS_FILE_NAME}', dtype=COUNT_DTYPE))))
+        self._tracked_bid_offsets = np.concatenate(([0], np.cumsum(
+            np.fromfile(f'{folder_path}/{NUM_TRACKED_BIDS_FILE_NAME}', dtype=COUNT_DTYPE))))
+        self._user_properties = {feature: _memory_map(f'{folder_path}/{_user_property_file_name(feature)}',
+                                                      USER_PROPERTY_DTYPE)
+                                 for feature in self.features}
+        self._tracked_bids = _memory_map(f'{folder_path}/{TRACKED_BIDS_FILE_NAME}', BID_DTYPE)
+        self._untracked_bids = _memory_map(f'{folder_path}/{UNTRACKED_BIDS_FILE_NAME}', BID_DTYPE).reshape(-1, 2)
+
+    def auction_batch(self, minute: int, auction_class: type[AuctionInterface] = AuctionFP) -> AuctionBatch:
+        """Returns the recorded auctions of the minute (counted from the beginning of the simulation), with their
+        random numbers"""
+        if minute >= self.num_minutes:
+            raise Exception(f'the recording contains only {self.num_minutes} minutes')
+        start, end = self._auction_offsets[minute], self._auction_offsets[minute + 1]
+        bids_start, bids_end = self._tracked_bid_offsets[minute], self._tracked_bid_offsets[minute + 1]
+        return AuctionBatch(num_auctions=int(end - start),
+                            user_properties={feature: np.array(values[start:end])
+                                             for feature, values in self._user_properties.items()},
+                            auction_class=auction_class,
+                            random_numbers=BatchRandomNumbers(
+                                tracked_bids=np.array(self._tracked_bids[bids_start:bids_end]),
+                                untracked_bids=np.array(self._untracked_bids[start:end])))
+
+
+def _user_property_file_name(feature: str) -> str:
+    return f'user_property_{feature}.bin'
+
+
+def _memory_map(file_path: str, dtype: type) -> np.ndarray:
+    if os.path.getsize(file_path) == 0:
+        # empty files can't be memory-mapped
+        return np.empty(0, dtype=dtype)
+    return np.memmap(file_path, dtype=dtype, mode='r')
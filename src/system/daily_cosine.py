@@ -2,8 +2,9 @@
 
 import math
 
+import numpy as np
+
 from src import constants
-from src.system.clock import Clock
 
 # We calculate the value of the cosine wave in each minute (m) of the day as:
 # a * (1 + b * math.cos((2*math.pi)*(m/num_iterations_per_day + c))),
@@ -22,6 +23,12 @@ class DailyCosineWave:
         self.amplitude = amplitude
         self.phase = phase
 
-    def calculate_current_value(self) -> float:
-        current_fraction_of_day = Clock.minute_in_day() / constants.num_minutes_in_day
+    def calculate_value(self, minute_in_day: int) -> float:
+        """Calculates the value of the wave in the given minute of the day"""
+        current_fraction_of_day = minute_in_day / constants.num_minutes_in_day
         return self.dc * (1 + self.amplitude * math.cos((2 * math.pi) * (current_fraction_of_day + self.phase)))
+
+    def calculate_values(self, minutes_in_day: np.ndarray) -> np.ndarray:
+        """Calculates the values of the wave in the given minutes of the day, at once"""
+        fractions_of_day = np.asarray(minutes_in_day) / constants.num_minutes_in_day
+        return self.dc * (1 + self.amplitude * np.cos((2 * np.pi) * (fractions_of_day + self.phase)))
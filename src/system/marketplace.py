@@ -1,34 +1,113 @@
 # Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
 
+from typing import Iterable
+
 import numpy as np
 
-from src.constants import AuctionType
+from src.constants import AuctionType, AuctionEngine
 from src.system.auction import *
-from src.system.clock import Clock
+from src.system.auction_batch import AuctionBatch
+from src.system.auction_trace import AuctionTraceReader, AuctionTraceWriter
+from src.system.batched_auction_engine import BatchedAuctionEngine
+from src.system.common_random_numbers import CommonRandomNumbersRecorder, CommonRandomNumbersReplayer
 from src.system.daily_cosine import DailyCosineWave
 from src.system.serving_system import ServingSystem
-from scipy import stats
-from scipy.special import softmax
+from src.system.simulation_context import SimulationContext
+from src.system.traffic_schedule import TrafficSchedule
 
 
 class Marketplace:
     def __init__(self, serving_system: ServingSystem, auction_type: AuctionType = AuctionType.FP,
-                 traffic_mean_cos_wave: DailyCosineWave = config.traffic_mean_cos_wave):
+                 traffic_mean_cos_wave: DailyCosineWave = config.traffic_mean_cos_wave,
+                 batch_auction_generation: bool = config.batch_auction_generation,
+                 auction_engine: AuctionEngine = config.auction_engine,
+                 traffic_schedule: TrafficSchedule = None, context: SimulationContext = None,
+                 random_numbers_recorder: CommonRandomNumbersRecorder = None,
+                 random_numbers_replayer: CommonRandomNumbersReplayer = None,
+                 auction_trace: AuctionTraceReader = None, auction_trace_writer: AuctionTraceWriter = None):
         if serving_system is None:
             raise Exception('invalid serving_system parameter')
+        if (random_numbers_recorder or random_numbers_replayer) and auction_engine != AuctionEngine.BATCHED:
+            raise Exception('common random numbers are supported only by the batched auction engine')
+        if random_numbers_recorder and random_numbers_replayer:
+            raise Exception('cannot record and replay random numbers at the same time')
+        if auction_trace and random_numbers_replayer:
+            raise Exception('the auctions are replayed from the common random numbers, not from the auction trace')
+        # by default, the marketplace runs in the context of its serving system
+        self.context = context if context is not None else serving_system.context
         self.serving_system = serving_system
         self.auction_type = auction_type
         self.traffic_mean_cos_wave = traffic_mean_cos_wave
+        self.batch_auction_generation = batch_auction_generation
+        self.auction_engine = auction_engine
+        self.batched_auction_engine = None
+        if self.auction_engine == AuctionEngine.BATCHED:
+            self.batched_auction_engine = BatchedAuctionEngine(serving_system=serving_system,
+                                                               auction_class=self._auction_class())
+        if traffic_schedule is None:
+            traffic_schedule = TrafficSchedule.from_cosine_waves(traffic_mean_cos_wave=traffic_mean_cos_wave,
+                                                                 user_properties=self.context.config.user_properties,
+                                                                 generator=self.context.generator('traffic'))
+        self.traffic_schedule = traffic_schedule
+        # the generator of the user properties of the auctions
+        self.generator = self.context.generator('auctions')
+        self.random_numbers_recorder = random_numbers_recorder
+        self.random_numbers_replayer = random_numbers_replayer
+        # when given, the auctions are read from the trace instead of being generated from the traffic schedule
+        self.auction_trace = auction_trace
+        # when given, the auctions of each iteration are appended to the trace writer
+        self.auction_trace_writer = auction_trace_writer
 
     def run_iteration(self):
         # generate and run auctions
-        auctions = self._generate_auctions()
-        self._run_auctions(auctions)
+        if self.auction_engine == AuctionEngine.BATCHED:
+            self._run_auction_batch()
+        else:
+            auctions = self._generate_auctions()
+            if self.auction_trace_writer is not None:
+                self.auction_trace_writer.write_auctions(auctions)
+            self._run_auctions(auctions)
         # end the iteration
         self.serving_system.end_iteration()
-        Clock.advance()
+        self.context.clock.advance()
+
+    def record_iteration(self):
+        """Records the random inputs of the iteration (its auctions, the raw bids of all the relevant campaigns and
+        the top untracked bids) without running its auctions. The recorded inputs don't depend on the outcomes of the
+        auctions, nor on the pacing system, so this records the same inputs as running the iteration, for a fraction
+        of the cost"""
+        if self.random_numbers_recorder is None:
+            raise Exception('recording an iteration requires a random numbers recorder')
+        auction_batch = self._next_auction_batch()
+        if len(auction_batch):
+            self.serving_system.get_bids_batch(auction_batch)
+        self.random_numbers_recorder.record(auction_batch)
+        # the campaigns that end are removed at the end of the day, as when the auctions are run
+        self.serving_system.end_iteration()
+        self.context.clock.advance()
 
-    def _run_auctions(self, auctions: list[AuctionInterface]):
+    def _next_auction_batch(self) -> AuctionBatch:
+        if self.random_numbers_replayer is not None:
+            return self.random_numbers_replayer.auction_batch(minute=self.context.clock.iterations,
+                                                              auction_class=self._auction_class())
+        if self.auction_trace is not None:
+            auction_batch = self._read_auction_batch()
+        else:
+            auction_batch = self._generate_auction_batch(
+                num_auctions=self._sample_current_num_of_auctions(),
+                user_properties_probabilities=self._calculate_current_user_properties_probabilities())
+        auction_batch.record_random_numbers = self.random_numbers_recorder is not None
+        return auction_batch
+
+    def _run_auction_batch(self):
+        auction_batch = self._next_auction_batch()
+        if self.auction_trace_writer is not None:
+            self.auction_trace_writer.write_auctions(auction_batch)
+        self.batched_auction_engine.run(auction_batch)
+        if self.random_numbers_recorder is not None:
+            self.random_numbers_recorder.record(auction_batch)
+
+    def _run_auctions(self, auctions: Iterable[AuctionInterface]):
         for auction in auctions:
             self._run_single_auction(auction)
 
@@ -39,38 +118,65 @@ class Marketplace:
         winners = auction.run(bids)
         self.serving_system.update_winners(winners)
 
-    def _generate_auctions(self) -> list[AuctionInterface]:
+    def _generate_auctions(self) -> Iterable[AuctionInterface]:
+        if self.auction_trace is not None:
+            return self._read_auction_batch()
         num_auctions = self._sample_current_num_of_auctions()
         # generate a probability array for each user property
-        probabilities_per_property = {
-            feature: softmax([cos_wave.calculate_current_value()
-                              for cos_wave in config.user_properties[feature].values()])
-            for feature in config.user_properties
-        }
+        probabilities_per_property = self._calculate_current_user_properties_probabilities()
+        if self.batch_auction_generation:
+            return self._generate_auction_batch(num_auctions=num_auctions,
+                                                user_properties_probabilities=probabilities_per_property)
         return [self._generate_auction(user_properties_probabilities=probabilities_per_property)
                 for _ in range(num_auctions)]
 
+    def _read_auction_batch(self) -> AuctionBatch:
+        # the trace is replayed from its first minute
+        return self.auction_trace.auction_batch(minute=self.context.clock.iterations,
+                                                auction_class=self._auction_class())
+
+    def _calculate_current_user_properties_probabilities(self) -> dict[str, np.ndarray]:
+        return self.traffic_schedule.user_properties_probabilities_at(self.context.clock.minute_in_day())
+
+    def _generate_auction_batch(self, num_auctions: int,
+                                user_properties_probabilities: dict[str, np.ndarray]) -> AuctionBatch:
+        auction_class = self._auction_class()
+        # a single vectorized draw for each user property, instead of a draw per auction and user property
+        user_property_values = self.traffic_schedule.user_property_values
+        user_properties = {
+            feature: AuctionBatch.sample_user_property_values(values=user_property_values[feature],
+                                                              probabilities=user_properties_probabilities[feature],
+                                                              size=num_auctions,
+                                                              generator=self.generator)
+            for feature in user_properties_probabilities
+        }
+        return AuctionBatch(num_auctions=num_auctions, user_properties=user_properties, auction_class=auction_class)
+
     def _generate_auction(self, user_properties_probabilities: dict[str, list[float]]) -> AuctionInterface:
+        auction_class = self._auction_class()
+        user_properties = {
+            feature: self.generator.choice(self.traffic_schedule.user_property_values[feature],
+                                           p=user_properties_probabilities[feature])
+            for feature in user_properties_probabilities
+        }
+        return auction_class(user_properties=user_properties)
+
+    def _auction_class(self) -> type[AuctionInterface]:
         if self.auction_type == AuctionType.FP:
-            user_properties = {
-                feature: np.random.choice(list(config.user_properties[feature].keys()),
-                                          p=user_properties_probabilities[feature])
-                for feature in user_properties_probabilities
-            }
-            return AuctionFP(user_properties=user_properties)
+            return AuctionFP
         elif self.auction_type == AuctionType.GSP:
-            raise NotImplementedError
+            return AuctionGSP
         else:
             raise NotImplementedError
 
     def _sample_current_num_of_auctions(self) -> int:
-        # Calculate the mean of the Poisson distribution:
-        mu = self._calculate_current_mean_num_of_auctions()
-        # Sample from the Poisson distribution:
-        return stats.poisson.rvs(mu)
+        # The numbers of auctions are sampled from Poisson distributions, whose means are given by the traffic schedule.
+        # The schedule samples the numbers of auctions of all the minutes of the day at once.
+        clock = self.context.clock
+        return self.traffic_schedule.num_of_auctions_at(day=clock.days(), minute_in_day=clock.minute_in_day())
 
     def _calculate_current_mean_num_of_auctions(self) -> float:
-        # Calculate the mean of the Poisson distribution from which we sample the number of auctions for each minute.
-        # The calculation depends on the current value of the Clock (minute_in_day).
-        return self.traffic_mean_cos_wave.calculate_current_value()
+        # The mean of the Poisson distribution from which we sample the number of auctions for each minute.
+        # The calculation depends on the current value of the clock (minute_in_day).
+        return self.traffic_schedule.mean_num_of_auctions_at(self.context.clock.minute_in_day())
 
@@ -0,0 +1,27 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import numpy as np
+from scipy import stats
+
+
+# The maximum of k i.i.d. uniform draws is distributed as U^(1/k), and given the maximum V1, the runner-up is the
+# maximum of k-1 i.i.d. uniform draws in [0, V1], i.e., V1 * U'^(1/(k-1)).
+# Mapping these through the inverse CDF of a distribution gives the two highest of k draws from that distribution.
+# To keep the precision when k is large (and V1 is very close to 1), we work with the survival function:
+# 1 - V1 = -expm1(log(U) / k).
+def sample_top_two(distribution: stats.rv_continuous, num_draws: np.ndarray,
+                   generator: np.random.Generator = None) -> np.ndarray:
+    """For each entry k of num_draws, samples the highest and the second highest of k i.i.d. draws from the
+    distribution, in O(1) regardless of k. Returns an array of shape (len(num_draws), 2), where missing draws are -inf"""
+    if generator is None:
+        generator = np.random.default_rng()
+    num_draws = np.asarray(num_draws)
+    top_two = np.full((num_draws.size, 2), -np.inf)
+    has_first = num_draws > 0
+    log_first = np.log(generator.random(np.count_nonzero(has_first))) / num_draws[has_first]
+    top_two[has_first, 0] = distribution.isf(-np.expm1(log_first))
+    has_second = num_draws[has_first] > 1
+    log_second = log_first[has_second] + np.log(generator.random(np.count_nonzero(has_second))) / (
+            num_draws[has_first][has_second] - 1)
+    top_two[np.flatnonzero(has_first)[has_second], 1] = distribution.isf(-np.expm1(log_second))
+    return top_two
@@ -4,22 +4,33 @@ import numpy as np
 
 import src.constants as constants
 from src.system.auction import *
+from src.system.auction_batch import AuctionBatch, BatchRandomNumbers, BidsMatrix
+from src.system.bid import BidBatch, untracked_campaign_indices
 from src.system.budget_pacing.pacing_system_interface import PacingSystemInterface
 from src.system.campaign import Campaign
-from src.system.clock import Clock
+from src.system.order_statistics import sample_top_two
+from src.system.simulation_context import SimulationContext, default_context
+from src.system.statistics_sink import StatisticsSink
+from src.system.targeting_index import TargetingIndex
 
 
 class ServingSystem:
     tracked_campaigns: dict[str, Campaign]
     old_campaigns: dict[str, Campaign]
 
-    def __init__(self, pacing_system: PacingSystemInterface = None, tracked_campaigns: list[Campaign] = None):
+    def __init__(self, pacing_system: PacingSystemInterface = None, tracked_campaigns: list[Campaign] = None,
+                 context: SimulationContext = None, statistics_sink: StatisticsSink = None):
+        self.context = context if context is not None else default_context()
+        # when given, the statistics of each finished day are written into the sink, and released from memory
+        self.statistics_sink = statistics_sink
         if tracked_campaigns is None:
             tracked_campaigns = []
         self.tracked_campaigns = {}
         self.old_campaigns = {}
         self.pacing_system = pacing_system
         self.pending_pacing_spend_updates = {}
+        self.targeting_index = TargetingIndex()
+        self.untracked_bids_generator = self.context.generator('untracked_bids')
         for campaign in tracked_campaigns:
             self.add_campaign(campaign)
         self.untracked_bids_cache = np.array([])
@@ -30,108 +41,246 @@ class ServingSystem:
         if campaign.id in self.tracked_campaigns or campaign.id in self.old_campaigns:
             raise Exception('campaign id already exists')
         self.tracked_campaigns[campaign.id] = campaign
+        campaign_index = self.targeting_index.add_campaign(campaign)
+        # the minutes in which the campaign is alive today are counted from the minute in which it's added
+        campaign.stats.alive_since_minute = self.context.clock.minute_in_day()
+        self._deplete_if_out_of_budget(campaign)
         if self.pacing_system is not None:
-            self.pacing_system.add_campaign(campaign)
+            # the pacing system refers to the campaign by its index in the batch methods
+            self.pacing_system.register_campaign(campaign, campaign_index=campaign_index)
 
-    def get_bids(self, auction: AuctionInterface) -> list[Bid]:
-        num_relevant_campaigns = 0
-        bids = []
-        # get "real" bids
-        for campaign in self.tracked_campaigns.values():
-            # check if the auction is relevant (matches campaign's target group) to the campaign
-            if not campaign.is_relevant_auction(auction):
-                continue
-            num_relevant_campaigns += 1  # counting the number of campaigns for which the auction is relevant
-            # make sure the campaign hasn't reached its daily budget
-            if campaign.spent_today() >= campaign.daily_budget:
-                continue
-            bid = campaign.bid()
-            if bid is None:
+    def get_bids(self, auction: AuctionInterface) -> BidBatch:
+        # the campaigns for which the auction is relevant (matches campaign's target group)
+        segment = self.targeting_index.get_segment(auction.user_properties())
+        num_relevant_campaigns = segment.num_relevant_campaigns()
+        untracked_amounts = self._generate_untracked_bids(num_relevant_campaigns=num_relevant_campaigns)
+        # the raw bids are collected into preallocated arrays
+        campaign_indices = np.empty(len(segment.active_campaigns), dtype=int)
+        amounts = np.empty(campaign_indices.size)
+        num_tracked_bids = 0
+        # get "real" bids, from the relevant campaigns that haven't reached their daily budget
+        for campaign_index, campaign in zip(segment.active_campaign_indices, segment.active_campaigns):
+            bid_amount = campaign.bid_amount()
+            if bid_amount is None:
                 continue
-            if self.pacing_system is not None:
-                pacing_signal = self.pacing_system.get_pacing_signal(campaign_id=campaign.id)
-                bid.amount *= pacing_signal
-            if bid.amount > 0:
-                bids.append(bid)
-        bids += self._generate_untracked_bids(num_relevant_campaigns=num_relevant_campaigns)
-        return bids
+            campaign_indices[num_tracked_bids] = campaign_index
+            amounts[num_tracked_bids] = bid_amount
+            num_tracked_bids += 1
+        campaign_indices, amounts = campaign_indices[:num_tracked_bids], amounts[:num_tracked_bids]
+        if self.pacing_system is not None:
+            # the pacing signals of all the bidding campaigns at once, in the order of the campaigns
+            amounts *= self.pacing_system.get_pacing_signals(campaign_indices)
+        # only positive bids participate, followed by the untracked bids
+        positive = amounts > 0
+        return BidBatch(campaign_indices=np.concatenate((campaign_indices[positive],
+                                                         untracked_campaign_indices(untracked_amounts.size))),
+                        amounts=np.concatenate((amounts[positive], untracked_amounts)),
+                        campaigns=self.targeting_index.campaigns)
+
+    def get_bids_batch(self, auction_batch: AuctionBatch) -> BidsMatrix:
+        """Returns the bids of all the auctions in the batch, as a matrix with a column per tracked campaign"""
+        campaign_indices = self.targeting_index.tracked_campaign_indices()
+        campaigns = [self.targeting_index.campaigns[i] for i in campaign_indices]
+        # find the relevant campaigns of each distinct combination of user properties only once
+        segments, segment_of_auction = auction_batch.segments()
+        relevant_per_segment = np.zeros((len(segments), len(campaigns)), dtype=bool)
+        for i, user_properties in enumerate(segments):
+            segment = self.targeting_index.get_segment(user_properties)
+            relevant_per_segment[i, np.searchsorted(campaign_indices, segment.campaign_indices)] = True
+        relevant = relevant_per_segment[segment_of_auction]
+        # counting the number of campaigns for which each auction is relevant
+        num_relevant_campaigns = relevant.sum(axis=1)
+        # campaigns that have reached their daily budget don't participate
+        has_budget = ~np.isin(campaign_indices, self.targeting_index.depleted_campaign_indices())
+        eligible = relevant & has_budget
+        # pacing systems that throttle bids decide which bids participate before they are sampled, so the bids of the
+        # throttled campaigns aren't sampled at all
+        pacing_signals_applied = False
+        if self.pacing_system is not None:
+            eligible_campaigns, eligible_auctions = np.nonzero(eligible.T)
+            throttled = self.pacing_system.get_throttled_bids(campaign_indices[eligible_campaigns])
+            if throttled is not None:
+                eligible[eligible_auctions[throttled], eligible_campaigns[throttled]] = False
+                pacing_signals_applied = True
+        random_numbers = auction_batch.random_numbers
+        if random_numbers is not None:
+            # replay the recorded bids (the transposed masks are iterated in column-major order)
+            if random_numbers.tracked_bids.size != np.count_nonzero(relevant):
+                raise Exception('the recorded random numbers do not match the campaigns of the simulation')
+            raw_bids = np.full(relevant.shape, -np.inf)
+            raw_bids.T[relevant.T] = random_numbers.tracked_bids
+            untracked_bids = random_numbers.untracked_bids
+        else:
+            # when recording, the bids of all the relevant campaigns are sampled, since the campaigns that have
+            # reached their daily budget may be different when the bids are replayed
+            sampled = relevant if auction_batch.record_random_numbers else eligible
+            raw_bids = self._sample_tracked_bids(campaigns, sampled)
+            untracked_bids = self._generate_untracked_top_bids(num_relevant_campaigns)
+            if auction_batch.record_random_numbers:
+                auction_batch.random_numbers = BatchRandomNumbers(tracked_bids=raw_bids.T[relevant.T],
+                                                                  untracked_bids=untracked_bids)
+        tracked_bids = np.full(eligible.shape, -np.inf)
+        # the eligible bids, campaign by campaign (the order in which pacing signals that are random are drawn)
+        eligible_campaigns, eligible_auctions = np.nonzero(eligible.T)
+        bids = raw_bids[eligible_auctions, eligible_campaigns]
+        if self.pacing_system is not None and not pacing_signals_applied:
+            bids *= self.pacing_system.get_pacing_signals(campaign_indices[eligible_campaigns])
+        tracked_bids[eligible_auctions, eligible_campaigns] = bids
+        # only positive bids participate (a missing bid multiplied by a zero pacing signal results in nan)
+        tracked_bids[~(tracked_bids > 0)] = -np.inf
+        return BidsMatrix(campaigns=campaigns, eligible=eligible, tracked_bids=tracked_bids,
+                          untracked_bids=untracked_bids)
+
+    @staticmethod
+    def _sample_tracked_bids(campaigns: list[Campaign], sampled: np.ndarray) -> np.ndarray:
+        """Samples the raw bids of each campaign in the auctions marked in its column of the sampled mask"""
+        raw_bids = np.full(sampled.shape, -np.inf)
+        for i in np.flatnonzero(sampled.any(axis=0)):
+            auctions_mask = sampled[:, i]
+            raw_bids[auctions_mask, i] = campaigns[i].sample_bids(size=np.count_nonzero(auctions_mask))
+        return raw_bids
 
     def update_winners(self, winners: list[AuctionWinner]):
         for winner in winners:
             if winner.bid.campaign_id in self.tracked_campaigns:
                 # update campaign
-                self.tracked_campaigns[winner.bid.campaign_id].pay(winner.payment)
+                campaign = self.tracked_campaigns[winner.bid.campaign_id]
+                campaign.pay(winner.payment)
+                self._deplete_if_out_of_budget(campaign)
 
                 if self.pacing_system is not None:
                     # add payment to the pending updates which will be sent to the budget pacing system
                     self.pending_pacing_spend_updates[winner.bid.campaign_id] = self.pending_pacing_spend_updates.get(
                         winner.bid.campaign_id, 0) + winner.payment
 
+    def update_winners_batch(self, campaigns: list[Campaign], payments: np.ndarray, num_wins: np.ndarray):
+        """Updates each campaign with its total payment and number of wins in a batch of auctions"""
+        for i in np.flatnonzero(num_wins):
+            campaign = campaigns[i]
+            payment = payments[i].item()
+            campaign.pay(payment, num_wins=int(num_wins[i]))
+            self._deplete_if_out_of_budget(campaign)
+            if self.pacing_system is not None:
+                # add payment to the pending updates which will be sent to the budget pacing system
+                self.pending_pacing_spend_updates[campaign.id] = self.pending_pacing_spend_updates.get(
+                    campaign.id, 0) + payment
+
     def end_iteration(self):
-        self._end_of_minute_campaign_updates()  # updates campaigns' lifetime statistic
         # Budget Pacing periodic (every minute) spend updates
         self._update_pacing_system()
         # Check if this is the last iteration of the day
-        if Clock.minute_in_day() == constants.num_minutes_in_day - 1:
+        if self.context.clock.minute_in_day() == constants.num_minutes_in_day - 1:
             # Perform daily campaign updates
             self._end_of_day_campaign_updates()
 
     def _update_pacing_system(self):
         if self.pacing_system is None:
             return
-        for campaign in self.tracked_campaigns.values():
-            # get the spend amount of each campaign during the last minute, and send it to the budget pacing system
-            spend = self.pending_pacing_spend_updates.pop(campaign.id, 0)
-            self.pacing_system.end_iteration(campaign_id=campaign.id, spend_since_last_iteration=spend)
+        campaign_indices = self.targeting_index.tracked_campaign_indices()
+        # get the spend amount of each campaign during the last minute, and send them to the budget pacing system
+        spends = np.fromiter((self.pending_pacing_spend_updates.pop(self.targeting_index.campaigns[i].id, 0)
+                              for i in campaign_indices), dtype=float, count=campaign_indices.size)
+        self.pacing_system.end_iteration_batch(spends, campaign_indices=campaign_indices)
 
-    def _end_of_minute_campaign_updates(self):
-        # update the number of minutes alive statistic for each campaign
-        for campaign in self.tracked_campaigns.values():
-            if campaign.spent_today() < campaign.daily_budget \
-                    and Clock.minute_in_day() < constants.num_minutes_in_day - 1:
-                # we increment campaigns' minutes_alive counter at the end of each minute of the day
-                # - except the last minute of the day, since a campaign that hasn't depleted its budget by the end of
-                # the current minute will be participating in auctions in the following minute of the same day.
-                campaign.stats.minutes_alive_today += 1
+    def _deplete_if_out_of_budget(self, campaign: Campaign, minute: int = None):
+        """Moves a campaign that has reached its daily budget out of the active campaigns, and records the minute in
+        which it did (the current minute by default), from which its minutes alive today are calculated"""
+        if campaign.stats.depletion_minute is None and campaign.spent_today() >= campaign.daily_budget:
+            campaign.stats.depletion_minute = minute if minute is not None else self.context.clock.minute_in_day()
+            self.targeting_index.deplete_campaign(campaign)
 
     def _end_of_day_campaign_updates(self):
-        for campaign in list(self.tracked_campaigns.values()):
+        campaigns = list(self.tracked_campaigns.values())
+        for campaign in campaigns:
             campaign.prepare_for_new_day()
+        if self.statistics_sink is not None:
+            self._write_day_statistics(campaigns)
+        for campaign in campaigns:
             assert campaign.days_left_to_run() >= 0
             if campaign.days_left_to_run() == 0:
                 # add campaign to the structure of campaigns that are done
                 self.old_campaigns[campaign.id] = campaign
                 # remove campaign from the structure of active campaigns
                 self.tracked_campaigns.pop(campaign.id)
+                self.targeting_index.remove_campaign(campaign)
+        # the campaigns that depleted their daily budget are restored for the new day
+        self.targeting_index.restore_depleted_campaigns()
+        for campaign in self.tracked_campaigns.values():
+            self._deplete_if_out_of_budget(campaign, minute=0)
 
-    def _generate_untracked_bids(self, num_relevant_campaigns: int) -> list[Bid]:
+    def _write_day_statistics(self, campaigns: list[Campaign]):
+        # the statistics of the day that just ended are the last entries of the per-day statistics
+        statistics_per_campaign = [{field: value[-1] if value else None
+                                    for field, value in self._get_campaign_statistics(campaign).items()
+                                    if isinstance(value, list)}
+                                   for campaign in campaigns]
+        self.statistics_sink.write_day(day=self.context.clock.days(), campaign_ids=[c.id for c in campaigns],
+                                       statistics_per_campaign=statistics_per_campaign)
+        for campaign in campaigns:
+            campaign.release_last_day_history()
+            if self.pacing_system is not None:
+                self.pacing_system.release_last_day_statistics(campaign.id)
+
+    def _generate_untracked_bids(self, num_relevant_campaigns: int) -> np.ndarray:
+        """Returns the amounts of the untracked bids of an auction"""
         num_untracked_bids = self._calculate_number_of_untracked_bids(num_relevant_campaigns)
-        if self.untracked_bids_cache.size < num_untracked_bids:
-            sampled_batch_size = max(num_untracked_bids, config.bid_sampling_batch_size)
-            self.untracked_bids_cache = config.untracked_bids_distribution.rvs(size=sampled_batch_size)
-        sampled_bids, self.untracked_bids_cache = self.untracked_bids_cache[-num_untracked_bids:], self.untracked_bids_cache[:-num_untracked_bids]
-        return [Bid(campaign_id='untracked_campaign_' + str(i), amount=sampled_bids[i]) for i in range(sampled_bids.size)]
+        if self.context.config.untracked_bids_order_statistics:
+            top_bids = sample_top_two(self.context.config.untracked_bids_distribution, np.array([num_untracked_bids]),
+                                      generator=self.untracked_bids_generator)[0]
+            return top_bids[:min(num_untracked_bids, top_bids.size)]
+        return self._sample_untracked_bids(num_untracked_bids)
+
+    def _generate_untracked_top_bids(self, num_relevant_campaigns: np.ndarray) -> np.ndarray:
+        """Returns the two highest untracked bids of each auction (-inf if missing)"""
+        num_untracked_bids = np.round(self.context.config.factor_untracked_bids * num_relevant_campaigns).astype(int)
+        if self.context.config.untracked_bids_order_statistics:
+            return sample_top_two(self.context.config.untracked_bids_distribution, num_untracked_bids,
+                                  generator=self.untracked_bids_generator)
+        top_bids = np.full((num_untracked_bids.size, 2), -np.inf)
+        has_untracked_bids = num_untracked_bids > 0
+        if not has_untracked_bids.any():
+            return top_bids
+        counts = num_untracked_bids[has_untracked_bids]
+        sampled_bids = self._sample_untracked_bids(counts.sum()).copy()
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        highest_bids = np.maximum.reduceat(sampled_bids, starts)
+        # remove the highest bid of each auction, so that the maximum of the remaining bids is the runner-up
+        sampled_bids[sampled_bids == np.repeat(highest_bids, counts)] = -np.inf
+        top_bids[has_untracked_bids, 0] = highest_bids
+        top_bids[has_untracked_bids, 1] = np.maximum.reduceat(sampled_bids, starts)
+        return top_bids
+
+    def _sample_untracked_bids(self, num_bids: int) -> np.ndarray:
+        if self.untracked_bids_cache.size < num_bids:
+            sampled_batch_size = max(num_bids, self.context.config.bid_sampling_batch_size)
+            self.untracked_bids_cache = self.context.config.untracked_bids_distribution.rvs(
+                size=sampled_batch_size, random_state=self.untracked_bids_generator)
+        # slicing with an explicit index, since [-0:] would return the whole cache when no bids are needed
+        split_index = self.untracked_bids_cache.size - num_bids
+        sampled_bids, self.untracked_bids_cache = self.untracked_bids_cache[split_index:], self.untracked_bids_cache[:split_index]
+        return sampled_bids
 
     def get_statistics_per_campaign_csv_rows(self) -> list[dict[str, object]]:
-        campaigns_statistics_as_rows = []
-        for campaign in self._all_campaigns():
-            campaign_statistics = {
-                constants.FIELD_CAMPAIGN_ID: campaign.id,
-                constants.FIELD_DAY_STARTED: campaign.stats.day_started,
-                constants.FIELD_DAY_ENDED: campaign.stats.day_ended,
-                constants.FIELD_DAILY_BUDGET: campaign.daily_budget,
-                constants.FIELD_NUM_WINS: campaign.num_auctions_won_history(),
-                constants.FIELD_CPM: campaign.cpm_daily_history(),
-                constants.FIELD_BUDGET_UTILIZATION: campaign.budget_utilization_daily_history(),
-                constants.FIELD_OVERSPEND: campaign.overspend_value_daily_history(),
-                constants.FIELD_MINUTES_ALIVE: campaign.minutes_alive_history()
-            }
-            if self.pacing_system:
-                # merge campaign's pacing statistics the basic statistics
-                campaign_statistics |= self.pacing_system.get_pacing_statistics(campaign.id)
-            # add the combined statistics of the campaign to the output list
-            campaigns_statistics_as_rows.append(campaign_statistics)
-        return campaigns_statistics_as_rows
+        """Returns the statistics of each campaign. With a statistics sink, the histories of the days that were written
+        into the sink hold only daily totals, and the pacing histories of these days are dropped"""
+        return [self._get_campaign_statistics(campaign) for campaign in self._all_campaigns()]
+
+    def _get_campaign_statistics(self, campaign: Campaign) -> dict[str, object]:
+        campaign_statistics = {
+            constants.FIELD_CAMPAIGN_ID: campaign.id,
+            constants.FIELD_DAY_STARTED: campaign.stats.day_started,
+            constants.FIELD_DAY_ENDED: campaign.stats.day_ended,
+            constants.FIELD_DAILY_BUDGET: campaign.daily_budget,
+            constants.FIELD_NUM_WINS: campaign.num_auctions_won_history(),
+            constants.FIELD_CPM: campaign.cpm_daily_history(),
+            constants.FIELD_BUDGET_UTILIZATION: campaign.budget_utilization_daily_history(),
+            constants.FIELD_OVERSPEND: campaign.overspend_value_daily_history(),
+            constants.FIELD_MINUTES_ALIVE: campaign.minutes_alive_history()
+        }
+        if self.pacing_system:
+            # merge campaign's pacing statistics the basic statistics
+            campaign_statistics |= self.pacing_system.get_pacing_statistics(campaign.id)
+        return campaign_statistics
 
     def get_global_statistics_csv_rows(self) -> list[dict[str, object]]:
         cpm_per_day = self._calculate_cpm_per_day()
@@ -142,7 +291,7 @@ class ServingSystem:
         total_minutes_alive_per_day = self._calculate_total_minutes_alive_per_day()
         pacing_statistics = self.pacing_system.get_global_pacing_statistics() if self.pacing_system else None
         day_statistics_rows = []
-        for day in range(Clock.days()):
+        for day in range(self.context.clock.days()):
             # Add row for day
             day_row = {
                 constants.FIELD_DAY_ID: day,
@@ -174,7 +323,7 @@ class ServingSystem:
         return 1000 * sum(self._calculate_total_spend_per_day()) / sum(self._calculate_total_wins_per_day())
 
     def _calculate_total_minutes_alive_per_day(self) -> list[int]:
-        total_minutes_alive_per_day = [0] * Clock.days()
+        total_minutes_alive_per_day = [0] * self.context.clock.days()
         for campaign in self._all_campaigns():
             campaign_minutes_alive_history = campaign.minutes_alive_history()
             for day in range(len(campaign_minutes_alive_history)):
@@ -189,7 +338,7 @@ class ServingSystem:
                 for day in range(len(spend_per_day))]
 
     def _calculate_total_spend_per_day(self) -> list[float]:
-        total_spend_per_day = [0] * Clock.days()
+        total_spend_per_day = [0] * self.context.clock.days()
         for campaign in self._all_campaigns():
             campaign_spend_history = campaign.spend_history()
             for day in range(len(campaign.overspend_value_daily_history())):
@@ -198,7 +347,7 @@ class ServingSystem:
         return total_spend_per_day
 
     def _calculate_total_wins_per_day(self) -> list[int]:
-        total_num_wins_per_day = [0] * Clock.days()
+        total_num_wins_per_day = [0] * self.context.clock.days()
         for campaign in self._all_campaigns():
             campaign_num_wins_history = campaign.num_auctions_won_history()
             for day in range(len(campaign.overspend_value_daily_history())):
@@ -207,7 +356,7 @@ class ServingSystem:
         return total_num_wins_per_day
 
     def _calculate_num_over_budget_campaigns_per_day(self) -> list[int]:
-        num_over_budget_campaigns_per_day = [0] * Clock.days()
+        num_over_budget_campaigns_per_day = [0] * self.context.clock.days()
         for campaign in self._all_campaigns():
             campaign_overspend_history = campaign.overspend_value_daily_history()
             for day in range(len(campaign.overspend_value_daily_history())):
@@ -217,7 +366,7 @@ class ServingSystem:
         return num_over_budget_campaigns_per_day
 
     def _calculate_total_overspend_per_day(self) -> list[float]:
-        total_overspend_per_day = [0] * Clock.days()
+        total_overspend_per_day = [0] * self.context.clock.days()
         for campaign in self._all_campaigns():
             campaign_overspend_history = campaign.overspend_value_daily_history()
             for day in range(len(campaign.overspend_value_daily_history())):
@@ -225,9 +374,8 @@ class ServingSystem:
                 total_overspend_per_day[adjusted_day_index] += campaign_overspend_history[day]
         return total_overspend_per_day
 
-    @staticmethod
-    def _calculate_number_of_untracked_bids(num_relevant_campaigns: int) -> int:
-        return round(config.factor_untracked_bids * num_relevant_campaigns)
+    def _calculate_number_of_untracked_bids(self, num_relevant_campaigns: int) -> int:
+        return round(self.context.config.factor_untracked_bids * num_relevant_campaigns)
 
     def _all_campaigns(self) -> list[Campaign]:
         return list(self.tracked_campaigns.values()) + list(self.old_campaigns.values())
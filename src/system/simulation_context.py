@@ -0,0 +1,52 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import hashlib
+from types import ModuleType
+from typing import Union
+
+import numpy as np
+
+import src.configuration as config
+from src.system.bid_sampler import BidSampler
+from src.system.clock import SimulationClock, default_clock
+
+
+# The state that is shared by the components of a single simulation: its clock, its random streams and its
+# configuration. The components of a simulation (marketplace, serving system, campaigns and pacing systems) receive
+# the context explicitly, so independent simulations can run side by side in the same process.
+# Components that are not given a context use the default context, which is backed by the global Clock and the
+# configuration module.
+#
+# Each component draws from a random generator of its own, derived from the seed of the simulation and the component's
+# key. So the draws of a component don't depend on the order in which the components draw, nor on how many draws the
+# other components make, and simulations with the same seed are reproducible regardless of the process they run in.
+# The bids of the campaigns are sampled by the context's bid sampler, which keeps them in a pool per bids distribution,
+# but draws the bids of each campaign from a generator of its own.
+# Independent simulations (e.g. replicates) are given seed sequences that are spawned from a common seed sequence,
+# whose streams don't overlap.
+class SimulationContext:
+    def __init__(self, clock: SimulationClock = None, seed: Union[int, np.random.SeedSequence] = None,
+                 configuration: ModuleType = config):
+        self.clock = clock if clock is not None else SimulationClock()
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.config = configuration
+        self.bid_sampler = BidSampler(self)
+
+    def generator(self, *keys) -> np.random.Generator:
+        """Returns a new random generator for the component identified by the keys, e.g. ('campaign', campaign_id).
+        The same keys always result in the same stream of draws."""
+        spawn_key = self.seed_sequence.spawn_key + tuple(_key_to_int(key) for key in keys)
+        return np.random.Generator(np.random.PCG64(np.random.SeedSequence(entropy=self.seed_sequence.entropy,
+                                                                          spawn_key=spawn_key)))
+
+
+def _key_to_int(key) -> int:
+    # a stable hash (unlike hash(), which is salted per process for strings)
+    return int.from_bytes(hashlib.sha256(str(key).encode()).digest()[:8], 'little')
+
+
+_default_context = SimulationContext(clock=default_clock)
+
+
+def default_context() -> SimulationContext:
+    return _default_context
@@ -0,0 +1,76 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import json
+import math
+import os
+import re
+import shutil
+
+import numpy as np
+
+DAY_METADATA_FILE_NAME = 'day.json'
+
+
+def metric_file_name(field: str) -> str:
+    """Returns the name of the .npy file of a statistics field (e.g. '# Impressions' -> 'num_impressions.npy')"""
+    return re.sub(r'[^a-z0-9]+', '_', field.lower().replace('#', 'num')).strip('_') + '.npy'
+
+
+# The sink streams the statistics of the campaigns to disk at the end of each day, so that the per-minute histories
+# of finished days don't have to be kept in memory until the end of the simulation.
+# The statistics of each day are written into a folder of their own, with an .npy file per field (an entry per
+# campaign, or a row of the entries of the day per campaign, padded with NaN), and a day.json file with the ids of the
+# campaigns and the files of the fields. The folder of a day is written under a temporary name and renamed once it is
+# complete, so the written days can be read while the simulation is still running, or after it crashed.
+class StatisticsSink:
+    def __init__(self, folder_path: str):
+        os.makedirs(folder_path, exist_ok=True)
+        self.folder_path = folder_path
+
+    def write_day(self, day: int, campaign_ids: list[str], statistics_per_campaign: list[dict[str, object]]):
+        """Writes the statistics of each campaign in the given day, as {field: value or list of the day's entries}"""
+        day_folder_path = day_folder(self.folder_path, day)
+        temporary_folder_path = f'{day_folder_path}.tmp'
+        shutil.rmtree(temporary_folder_path, ignore_errors=True)
+        os.makedirs(temporary_folder_path)
+        fields = {}
+        for field in dict.fromkeys(field for statistics in statistics_per_campaign for field in statistics):
+            values = [statistics.get(field) for statistics in statistics_per_campaign]
+            fields[field] = metric_file_name(field)
+            np.save(f'{temporary_folder_path}/{fields[field]}', _as_array(values))
+        with open(f'{temporary_folder_path}/{DAY_METADATA_FILE_NAME}', 'w') as f:
+            json.dump({'day': day, 'campaign_ids': campaign_ids, 'fields': fields}, f)
+        shutil.rmtree(day_folder_path, ignore_errors=True)
+        os.replace(temporary_folder_path, day_folder_path)
+
+
+def day_folder(folder_path: str, day: int) -> str:
+    return f'{folder_path}/day_{day:05d}'
+
+
+def written_days(folder_path: str) -> list[int]:
+    """Returns the days whose statistics were completely written into the sink's folder"""
+    if not os.path.isdir(folder_path):
+        return []
+    return sorted(int(name.removeprefix('day_')) for name in os.listdir(folder_path)
+                  if re.fullmatch(r'day_\d+', name))
+
+
+def load_day_statistics(folder_path: str, day: int) -> tuple[list[str], dict[str, np.ndarray]]:
+    """Returns the ids of the campaigns and the (memory-mapped) statistics of a day that was written by the sink"""
+    day_folder_path = day_folder(folder_path, day)
+    with open(f'{day_folder_path}/{DAY_METADATA_FILE_NAME}') as f:
+        metadata = json.load(f)
+    return metadata['campaign_ids'], {field: np.load(f'{day_folder_path}/{file_name}', mmap_mode='r')
+                                      for field, file_name in metadata['fields'].items()}
+
+
+def _as_array(values: list[object]) -> np.ndarray:
+    if not any(isinstance(value, list) for value in values):
+        return np.array([math.nan if value is None else value for value in values], dtype=np.float64)
+    num_entries = max(len(value) for value in values if isinstance(value, list))
+    array = np.full((len(values), num_entries), np.nan)
+    for i, value in enumerate(values):
+        if isinstance(value, list):
+            array[i, :len(value)] = [math.nan if entry is None else entry for entry in value]
+    return array
@@ -0,0 +1,145 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.system.campaign import Campaign
+
+
+@dataclass
+class Segment:
+    """The campaigns for which auctions with a specific combination of user properties are relevant"""
+    campaign_bits: int  # bitset of the indices of the relevant campaigns
+    campaign_indices: np.ndarray
+    campaigns: list[Campaign]
+    # the relevant campaigns that haven't depleted their daily budget
+    active_campaign_indices: np.ndarray
+    active_campaigns: list[Campaign]
+
+    def num_relevant_campaigns(self) -> int:
+        return len(self.campaigns)
+
+
+# The index keeps inverted lists in the form of bitsets (python ints), in which bit i represents the campaign with
+# index i. For each targeted feature, we keep a bitset of the campaigns targeting each of its values, and a bitset of
+# the campaigns that don't target the feature at all.
+# The relevant campaigns of a segment are found by intersecting, for each targeted feature, the campaigns that target
+# the segment's value with the campaigns that don't target the feature. The results are cached per segment, and cache
+# entries are invalidated only when a campaign that is relevant to them is added or removed.
+# Campaigns that depleted their daily budget remain relevant, but are moved out of the active campaigns of the cached
+# segments, until they are restored at the start of the next day.
+class TargetingIndex:
+    def __init__(self):
+        self.campaigns: list[Campaign] = []  # indexed by campaign index; None for campaigns that were removed
+        self._campaign_indices: dict[str, int] = {}
+        self._tracked_campaigns_bits = 0
+        self._depleted_campaigns_bits = 0
+        self._untargeted_feature_bits: dict[str, int] = {}
+        self._value_bits: dict[str, dict[int, int]] = {}
+        self._segments: dict[tuple, Segment] = {}
+        self._tracked_campaign_indices = None
+
+    def add_campaign(self, campaign: Campaign) -> int:
+        index = len(self.campaigns)
+        bit = 1 << index
+        targeting_groups = campaign.targeting_groups()
+        for feature in targeting_groups:
+            if feature not in self._untargeted_feature_bits:
+                # all the campaigns that were added so far don't target the new feature
+                self._untargeted_feature_bits[feature] = self._tracked_campaigns_bits
+                self._value_bits[feature] = {}
+        for feature in self._untargeted_feature_bits:
+            if feature in targeting_groups:
+                for value in targeting_groups[feature]:
+                    self._value_bits[feature][value] = self._value_bits[feature].get(value, 0) | bit
+            else:
+                self._untargeted_feature_bits[feature] |= bit
+        self.campaigns.append(campaign)
+        self._campaign_indices[campaign.id] = index
+        self._tracked_campaigns_bits |= bit
+        self._tracked_campaign_indices = None
+        # invalidate the cached segments for which the new campaign is relevant
+        for key in [key for key in self._segments if campaign.is_relevant_user_properties(dict(key))]:
+            self._segments.pop(key)
+        return index
+
+    def remove_campaign(self, campaign: Campaign):
+        index = self._campaign_indices.pop(campaign.id)
+        bit = 1 << index
+        self._tracked_campaigns_bits &= ~bit
+        self._depleted_campaigns_bits &= ~bit
+        for feature in self._untargeted_feature_bits:
+            self._untargeted_feature_bits[feature] &= ~bit
+            for value in self._value_bits[feature]:
+                self._value_bits[feature][value] &= ~bit
+        self.campaigns[index] = None
+        self._tracked_campaign_indices = None
+        # invalidate the cached segments for which the removed campaign was relevant
+        for key in [key for key, segment in self._segments.items() if segment.campaign_bits & bit]:
+            self._segments.pop(key)
+
+    def deplete_campaign(self, campaign: Campaign):
+        """Moves the campaign out of the active campaigns of the segments, until the depleted campaigns are restored"""
+        bit = 1 << self._campaign_indices[campaign.id]
+        if self._depleted_campaigns_bits & bit:
+            return
+        self._depleted_campaigns_bits |= bit
+        self._update_active_campaigns(bit)
+
+    def restore_depleted_campaigns(self):
+        depleted_campaigns_bits = self._depleted_campaigns_bits
+        self._depleted_campaigns_bits = 0
+        self._update_active_campaigns(depleted_campaigns_bits)
+
+    def depleted_campaign_indices(self) -> np.ndarray:
+        return self._bits_to_indices(self._depleted_campaigns_bits)
+
+    def campaign_index(self, campaign_id: str) -> int:
+        return self._campaign_indices[campaign_id]
+
+    def tracked_campaign_indices(self) -> np.ndarray:
+        """Returns the (sorted) indices of all the campaigns in the index, including the campaigns that depleted their
+        daily budget (unlike the active campaigns of a segment)"""
+        if self._tracked_campaign_indices is None:
+            self._tracked_campaign_indices = self._bits_to_indices(self._tracked_campaigns_bits)
+        return self._tracked_campaign_indices
+
+    def get_segment(self, user_properties: dict[str, int]) -> Segment:
+        key = tuple(user_properties.items())
+        segment = self._segments.get(key)
+        if segment is None:
+            segment = self._build_segment(user_properties)
+            self._segments[key] = segment
+        return segment
+
+    def _build_segment(self, user_properties: dict[str, int]) -> Segment:
+        campaign_bits = self._tracked_campaigns_bits
+        for feature, untargeted_bits in self._untargeted_feature_bits.items():
+            campaign_bits &= untargeted_bits | self._value_bits[feature].get(user_properties.get(feature), 0)
+        campaign_indices = self._bits_to_indices(campaign_bits)
+        segment = Segment(campaign_bits=campaign_bits, campaign_indices=campaign_indices,
+                          campaigns=[self.campaigns[i] for i in campaign_indices],
+                          active_campaign_indices=campaign_indices, active_campaigns=[])
+        self._set_active_campaigns(segment)
+        return segment
+
+    def _update_active_campaigns(self, changed_campaigns_bits: int):
+        """Updates the active campaigns of the cached segments to which the changed campaigns are relevant"""
+        for segment in self._segments.values():
+            if segment.campaign_bits & changed_campaigns_bits:
+                self._set_active_campaigns(segment)
+
+    def _set_active_campaigns(self, segment: Segment):
+        if segment.campaign_bits & self._depleted_campaigns_bits:
+            segment.active_campaign_indices = self._bits_to_indices(segment.campaign_bits
+                                                                    & ~self._depleted_campaigns_bits)
+            segment.active_campaigns = [self.campaigns[i] for i in segment.active_campaign_indices]
+        else:
+            segment.active_campaign_indices = segment.campaign_indices
+            segment.active_campaigns = segment.campaigns
+
+    @staticmethod
+    def _bits_to_indices(bits: int) -> np.ndarray:
+        as_bytes = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(as_bytes, bitorder='little'))
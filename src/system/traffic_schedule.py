@@ -0,0 +1,72 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import numpy as np
+from scipy.special import softmax
+
+from src import constants
+from src.system.daily_cosine import DailyCosineWave
+
+
+# The traffic of the marketplace is periodic in the day, so instead of evaluating the traffic model in every iteration,
+# the schedule keeps per-minute tables for a whole day:
+# - the mean of the Poisson distribution of the number of auctions in each minute
+# - the probabilities of the values of each user property in each minute
+# The tables are either calculated once from the cosine waves of the configuration, or given directly
+# (e.g. recorded per-minute traffic profiles).
+# The numbers of auctions of all the minutes of a day are drawn at once, when the day starts.
+class TrafficSchedule:
+    def __init__(self, mean_num_of_auctions: np.ndarray, user_property_values: dict[str, np.ndarray],
+                 user_properties_probabilities: dict[str, np.ndarray],
+                 generator: np.random.Generator = None):
+        mean_num_of_auctions = np.asarray(mean_num_of_auctions, dtype=float)
+        if mean_num_of_auctions.shape != (constants.num_minutes_in_day,):
+            raise Exception(f'expected a mean number of auctions for each of the {constants.num_minutes_in_day} '
+                            f'minutes of the day')
+        if np.any(mean_num_of_auctions < 0):
+            raise Exception('the mean number of auctions must be non-negative')
+        if user_property_values.keys() != user_properties_probabilities.keys():
+            raise Exception('expected probabilities for the values of each user property')
+        for feature, probabilities in user_properties_probabilities.items():
+            if probabilities.shape != (constants.num_minutes_in_day, len(user_property_values[feature])):
+                raise Exception(f'expected the probabilities of the values of user property {feature} '
+                                f'in each minute of the day')
+            if not np.allclose(probabilities.sum(axis=1), 1):
+                raise Exception(f'the probabilities of the values of user property {feature} must sum to 1')
+        self.mean_num_of_auctions = mean_num_of_auctions
+        self.user_property_values = {feature: np.asarray(values) for feature, values in user_property_values.items()}
+        # a dictionary per minute, so that lookups don't build new dictionaries
+        self._probabilities_per_minute = [
+            {feature: probabilities[minute] for feature, probabilities in user_properties_probabilities.items()}
+            for minute in range(constants.num_minutes_in_day)
+        ]
+        self.generator = generator if generator is not None else np.random.default_rng()
+        self._num_of_auctions = None
+        self._num_of_auctions_day = None
+
+    @classmethod
+    def from_cosine_waves(cls, traffic_mean_cos_wave: DailyCosineWave,
+                          user_properties: dict[str, dict[int, DailyCosineWave]],
+                          generator: np.random.Generator = None):
+        minutes = np.arange(constants.num_minutes_in_day)
+        return cls(mean_num_of_auctions=traffic_mean_cos_wave.calculate_values(minutes),
+                   user_property_values={feature: np.array(list(cos_waves.keys()))
+                                         for feature, cos_waves in user_properties.items()},
+                   user_properties_probabilities={
+                       feature: softmax(np.stack([cos_wave.calculate_values(minutes)
+                                                  for cos_wave in cos_waves.values()], axis=1), axis=1)
+                       for feature, cos_waves in user_properties.items()
+                   },
+                   generator=generator)
+
+    def mean_num_of_auctions_at(self, minute_in_day: int) -> float:
+        return self.mean_num_of_auctions[minute_in_day].item()
+
+    def user_properties_probabilities_at(self, minute_in_day: int) -> dict[str, np.ndarray]:
+        return self._probabilities_per_minute[minute_in_day]
+
+    def num_of_auctions_at(self, day: int, minute_in_day: int) -> int:
+        if self._num_of_auctions_day != day:
+            # a single vectorized draw for all the minutes of the day
+            self._num_of_auctions = self.generator.poisson(self.mean_num_of_auctions).tolist()
+            self._num_of_auctions_day = day
+        return self._num_of_auctions[minute_in_day]
@@ -1,15 +1,16 @@
 # Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
 
 import math
-import random
 from typing import Optional
 
+import numpy as np
 from scipy import stats
 from dataclasses import dataclass
 
 import src.configuration as config
 from src import constants as constants
 from src.system.campaign import Campaign
+from src.system.simulation_context import SimulationContext
 from src.system.budget_pacing.pacing_system_interface import PacingSystemInterface
 from src.system.budget_pacing.mystique.mystique import MystiquePacingSystem, MystiqueHardThrottlingPacingSystem
 from src.system.budget_pacing.mystique.target_slope import TargetSpendStrategyType
@@ -24,10 +25,10 @@ class CampaignConfiguration:
     targeting_groups: dict
 
 
-def generate_campaign_configuration() -> CampaignConfiguration:
+def generate_campaign_configuration(generator: np.random.Generator) -> CampaignConfiguration:
     run_period = config.num_days_to_simulate
     # Sample daily budget for campaign
-    daily_budget = math.exp(config.daily_budgets_log_distribution.rvs())
+    daily_budget = math.exp(config.daily_budgets_log_distribution.rvs(random_state=generator))
     # Generate bid distribution according to the sampled budget
     bids_distribution = generate_bid_distribution_for_budget(daily_budget)
     return CampaignConfiguration(run_period=run_period,
@@ -36,43 +37,50 @@ def generate_campaign_configuration() -> CampaignConfiguration:
                                  max_bid=bids_distribution.mean() * config.max_bid_factor_of_bids_mean,
                                  targeting_groups={
                                      feature: set(
-                                         random.sample(list(config.user_properties[feature].keys()),
-                                                       k=num_target_values))
+                                         generator.choice(list(config.user_properties[feature].keys()),
+                                                          size=num_target_values, replace=False).tolist())
                                      for feature in config.user_properties
-                                     if (num_target_values := random.randint(0, len(
-                                         config.user_properties[feature].keys()))) > 0
+                                     if (num_target_values := generator.integers(0, len(
+                                         config.user_properties[feature].keys()), endpoint=True)) > 0
                                  })
 
 
-def generate_campaigns(n: int):
-    # set random seed to get consistent campaigns across experiments
-    config.daily_budgets_log_distribution.random_state = config.campaign_generation_seed_value
-    random.seed(config.campaign_generation_seed_value)
-    campaigns = []
-    for i in range(n):
-        campaign_config = generate_campaign_configuration()
-        campaigns.append(Campaign(campaign_id=f'campaign_{i}',
-                                  run_period=campaign_config.run_period,
-                                  total_budget=campaign_config.total_budget,
-                                  bids_distribution=campaign_config.bids_distribution,
-                                  max_bid=campaign_config.max_bid,
-                                  targeting_groups=campaign_config.targeting_groups))
-    return campaigns
+def generate_campaign_configurations(n: int) -> list[CampaignConfiguration]:
+    # a generator with a fixed seed, to get consistent campaigns across experiments
+    generator = np.random.default_rng(config.campaign_generation_seed_value)
+    return [generate_campaign_configuration(generator) for _ in range(n)]
 
 
-def generate_pacing_system(algorithm: constants.BudgetPacingAlgorithms) -> Optional[PacingSystemInterface]:
+def build_campaigns(campaign_configurations: list[CampaignConfiguration],
+                    context: SimulationContext = None) -> list[Campaign]:
+    return [Campaign(campaign_id=f'campaign_{i}',
+                     run_period=campaign_config.run_period,
+                     total_budget=campaign_config.total_budget,
+                     bids_distribution=campaign_config.bids_distribution,
+                     max_bid=campaign_config.max_bid,
+                     targeting_groups=campaign_config.targeting_groups,
+                     context=context)
+            for i, campaign_config in enumerate(campaign_configurations)]
+
+
+def generate_campaigns(n: int, context: SimulationContext = None) -> list[Campaign]:
+    return build_campaigns(generate_campaign_configurations(n), context=context)
+
+
+def generate_pacing_system(algorithm: constants.BudgetPacingAlgorithms,
+                           context: SimulationContext = None) -> Optional[PacingSystemInterface]:
     if algorithm == constants.BudgetPacingAlgorithms.MYSTIQUE_LINEAR:
         print('Running Mystique Linear')
-        return MystiquePacingSystem(TargetSpendStrategyType.LINEAR)
+        return MystiquePacingSystem(TargetSpendStrategyType.LINEAR, context=context)
     elif algorithm == constants.BudgetPacingAlgorithms.MYSTIQUE_NON_LINEAR:
         print('Running Mystique Non-Linear')
-        return MystiquePacingSystem(TargetSpendStrategyType.NON_LINEAR)
+        return MystiquePacingSystem(TargetSpendStrategyType.NON_LINEAR, context=context)
     elif algorithm == constants.BudgetPacingAlgorithms.MYSTIQUE_LINEAR_HARD_THROTTLING:
         print('Running Mystique Linear Hard Throttling')
-        return MystiqueHardThrottlingPacingSystem(TargetSpendStrategyType.LINEAR)
+        return MystiqueHardThrottlingPacingSystem(TargetSpendStrategyType.LINEAR, context=context)
     elif algorithm == constants.BudgetPacingAlgorithms.MYSTIQUE_NON_LINEAR_HARD_THROTTLING:
         print('Running Mystique Non-Linear Hard Throttling')
-        return MystiqueHardThrottlingPacingSystem(TargetSpendStrategyType.NON_LINEAR)
+        return MystiqueHardThrottlingPacingSystem(TargetSpendStrategyType.NON_LINEAR, context=context)
     elif algorithm is None:
         print('Running without budget pacing')
         return None
@@ -6,7 +6,7 @@ import src.system.budget_pacing.mystique.mystique_constants as mystique_constant
 
 
 def instance_for_target_slope_test():
-    return MystiqueTrackedCampaign(10)
+    return MystiqueTrackedCampaign(10, day_started=0)
 
 
 def instance_for_mystique_test_init(campaign_id: str):
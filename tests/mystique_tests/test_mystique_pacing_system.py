@@ -200,6 +200,52 @@ class TestMystiquePacingSystem(unittest.TestCase):
         self.assertEqual(prev_day_avg_ps, mystique_tracked_campaign.last_positive_ps, "last positive pacing signal on new day not correct")
 
 
+class TestVectorizedMystiquePacingSystem(unittest.TestCase):
+    def setUp(self):
+        Clock.reset()
+
+    def assert_same_pacing_signals(self, target_slope_type: TargetSpendStrategyType):
+        scalar_pacing_system = MystiquePacingSystem(target_slope_type)
+        vectorized_pacing_system = MystiquePacingSystem(target_slope_type)
+        generator = np.random.default_rng(1)
+        budgets = [1, 5, 20, mystique_constants.min_daily_budget_for_high_initialization + 1]
+        campaigns = [mystique_campaign_initialization.instance_for_mystique_test_init(str(i)) for i in range(3)] + \
+                    [mystique_campaign_initialization.instance_for_budget_above_threshold('3')]
+        for campaign, budget in zip(campaigns, budgets):
+            campaign.daily_budget = budget
+        # the last campaign is added in the middle of the first day
+        for i, campaign in enumerate(campaigns[:-1]):
+            scalar_pacing_system.add_campaign(campaign)
+            vectorized_pacing_system.register_campaign(campaign, campaign_index=i)
+        for iteration in range(2 * mystique_constants.num_iterations_per_day + 10):
+            if iteration == mystique_constants.num_iterations_per_day // 2:
+                scalar_pacing_system.add_campaign(campaigns[-1])
+                vectorized_pacing_system.register_campaign(campaigns[-1], campaign_index=len(campaigns) - 1)
+            campaign_ids = list(scalar_pacing_system.mystique_tracked_campaigns)
+            # spends that follow the pacing signals, and exhaust the budgets of some of the campaigns
+            spends = np.array([scalar_pacing_system.get_pacing_signal(campaign_id) for campaign_id in campaign_ids]) * \
+                generator.exponential(0.01, size=len(campaign_ids)) * (generator.random(len(campaign_ids)) < 0.8)
+            for campaign_id, spend in zip(campaign_ids, spends):
+                scalar_pacing_system.end_iteration(campaign_id, spend)
+            vectorized_pacing_system.end_iteration_batch(spends)
+            self.assertListEqual(
+                vectorized_pacing_system.get_pacing_signals(np.arange(len(campaign_ids))).tolist(),
+                [scalar_pacing_system.get_pacing_signal(campaign_id) for campaign_id in campaign_ids],
+                f'iteration {iteration}')
+            Clock.advance()
+        for campaign_id in scalar_pacing_system.mystique_tracked_campaigns:
+            self.assertDictEqual(vectorized_pacing_system.get_pacing_statistics(campaign_id),
+                                 scalar_pacing_system.get_pacing_statistics(campaign_id))
+        self.assertDictEqual(vectorized_pacing_system.get_global_pacing_statistics(),
+                             scalar_pacing_system.get_global_pacing_statistics())
+
+    def test_linear(self):
+        self.assert_same_pacing_signals(TargetSpendStrategyType.LINEAR)
+
+    def test_non_linear(self):
+        self.assert_same_pacing_signals(TargetSpendStrategyType.NON_LINEAR)
+
+
 class TestMystiqueHardThrottlingPacingSystem(unittest.TestCase):
     @classmethod
     def setUp(cls):
@@ -221,3 +267,17 @@ class TestMystiqueHardThrottlingPacingSystem(unittest.TestCase):
                                           "should return a value of ps that is either 0 or 1.")
             self.mystique_hard_throttling.end_iteration(campaign_id, actual_spend)
             Clock.advance()
+
+    def test_pacing_signals_batch(self):
+        campaign = mystique_campaign_initialization.instance_for_mystique_test_init("0")
+        self.mystique_hard_throttling.register_campaign(campaign, campaign_index=3)
+        self.mystique_hard_throttling.mystique_tracked_campaigns["0"].ps = 0.5
+        pacing_system = MystiqueHardThrottlingPacingSystem(TargetSpendStrategyType.LINEAR)
+        pacing_system.register_campaign(campaign, campaign_index=3)
+        pacing_system.mystique_tracked_campaigns["0"].ps = 0.5
+        # the same random numbers are drawn for a batch of pacing signals as for consecutive pacing signals
+        self.assertListEqual(self.mystique_hard_throttling.get_pacing_signals(np.full(100, 3)).tolist(),
+                             [pacing_system.get_pacing_signal("0") for _ in range(100)])
+        # campaign indices that weren't registered have the default pacing signal
+        self.assertListEqual(MystiquePacingSystem.get_pacing_signals(pacing_system, np.array([0, 3])).tolist(),
+                             [mystique_constants.default_ps_value, 0.5])
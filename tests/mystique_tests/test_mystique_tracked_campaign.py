@@ -0,0 +1,80 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import unittest
+
+import numpy as np
+
+from src.system.budget_pacing.mystique.mystique_tracked_campaign import DailyHistory, MystiqueTrackedCampaign
+import src.system.budget_pacing.mystique.mystique_constants as mystique_constants
+import src.system.budget_pacing.mystique.mystique_utils as utils
+from src.system.clock import Clock
+
+
+class TestDailyHistory(unittest.TestCase):
+    def test_days_of_different_lengths(self):
+        history = DailyHistory(4)
+        history.append([1, 2])
+        history.append([3, 4, 5, 6])
+        history.append([7, 8, 9, 10, 11])
+        self.assertEqual(len(history), 3)
+        self.assertListEqual(history[0].tolist(), [1, 2])
+        self.assertListEqual(history[-1].tolist(), [7, 8, 9, 10, 11])
+        self.assertListEqual(history.tolist(), [[1, 2], [3, 4, 5, 6], [7, 8, 9, 10, 11]])
+        with self.assertRaises(IndexError):
+            history[3]
+
+    def test_pop(self):
+        history = DailyHistory(2, dtype=np.float32)
+        history.append([1, 2])
+        history.append([3, 4])
+        history.pop()
+        self.assertListEqual(history.tolist(), [[1, 2]])
+        self.assertEqual(history[0].dtype, np.float32)
+
+
+class TestMystiqueTrackedCampaign(unittest.TestCase):
+    def setUp(self):
+        Clock.reset()
+        self.campaign = MystiqueTrackedCampaign(10, day_started=0)
+
+    def test_today_values(self):
+        spends = [0.1, 0.2, 0.3]
+        for spend in spends:
+            self.campaign.update_spend(spend)
+            self.campaign.update_pacing_signal(0.5)
+        self.assertListEqual(self.campaign.today_spend.tolist(), spends)
+        self.assertEqual(self.campaign.get_today_spend(), sum(spends))
+        self.assertEqual(self.campaign.get_spend_in_last_time_interval(), spends[-1])
+        self.assertListEqual(self.campaign.today_ps.tolist(), [0.5] * len(spends))
+
+        self.campaign.new_day_init()
+        self.assertEqual(len(self.campaign.today_spend), 0)
+        self.assertListEqual(self.campaign.spend_history.tolist(), [spends])
+        self.assertListEqual(self.campaign.daily_avg_ps, [0.5])
+
+    def test_today_values_grow_beyond_a_day(self):
+        ps = [i / mystique_constants.num_iterations_per_day for i in range(mystique_constants.num_iterations_per_day + 1)]
+        self.campaign.today_ps = ps
+        ps[0] = 1
+        self.assertEqual(self.campaign.today_ps[0], 0, "today's pacing signals should be copied")
+        self.assertListEqual(self.campaign.today_ps.tolist(), [i / mystique_constants.num_iterations_per_day
+                                                              for i in range(len(ps))])
+
+    def test_running_aggregates(self):
+        generator = np.random.default_rng(0)
+        spends = generator.uniform(0, 0.01, size=150).tolist()
+        ps = generator.uniform(0, 1, size=150).tolist()
+        for spend, pacing_signal in zip(spends, ps):
+            self.campaign.update_spend(spend)
+            self.campaign.update_pacing_signal(pacing_signal)
+        self.assertEqual(self.campaign.get_today_spend(), sum(spends))
+        self.assertListEqual(self.campaign.get_avg_hourly_ps(),
+                             utils.get_average_per_size(ps, mystique_constants.num_iterations_per_hour))
+        self.assertAlmostEqual(self.campaign.get_avg_daily_ps_below_threshold(), sum(ps) / len(ps))
+
+        self.campaign.new_day_init()
+        self.assertListEqual(self.campaign.get_avg_hourly_ps(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,8 +2,12 @@
 
 import unittest
 
+import numpy as np
+
 from src.system.budget_pacing.mystique.target_slope import LinearTargetSpendStrategy
 from src.system.budget_pacing.mystique.target_slope import NonLinearTargetSpendStrategy
+from src.system.budget_pacing.mystique.mystique_state import MystiqueState
+from src.system.budget_pacing.mystique.mystique_tracked_campaign import MystiqueTrackedCampaign
 import src.system.budget_pacing.mystique.mystique_constants as mystique_constants
 import mystique_campaign_initialization
 from src.system.clock import Clock
@@ -140,6 +144,45 @@ class TestNonLinearTargetSlope(TestLinearTargetSlope):
                              msg="incorrect initial target spend")
             Clock.advance()
 
+    def test_target_spend_per_minute(self):
+        self.mystique_tracked_campaign.today_ps = [0.4] * (mystique_constants.num_iterations_per_day // 2) + \
+            [0.6] * (mystique_constants.num_iterations_per_day // 2)
+        self.target_slope_strategy.update_target_slope_and_spend(self.mystique_tracked_campaign)
+        target_spend_curve = self.mystique_tracked_campaign.current_target_spend_curve
+        for minute in range(mystique_constants.num_iterations_per_day):
+            hour, minute_in_hour = divmod(minute, mystique_constants.num_iterations_per_hour)
+            previous_target_spend = target_spend_curve[hour - 1] if hour > 0 else 0
+            target_slope, target_spend = self.target_slope_strategy.get_target_slope_and_spend(
+                self.mystique_tracked_campaign)
+            self.assertEqual(target_slope, self.mystique_tracked_campaign.current_target_slope[hour])
+            self.assertEqual(target_spend, previous_target_spend + (target_spend_curve[hour] - previous_target_spend) *
+                             (minute_in_hour + 1) / mystique_constants.num_iterations_per_hour)
+            Clock.advance()
+
+    def test_update_slopes_batch(self):
+        generator = np.random.default_rng(0)
+        state = MystiqueState()
+        batched_campaigns = [MystiqueTrackedCampaign(10, day_started=0, state=state) for _ in range(4)]
+        campaigns = [MystiqueTrackedCampaign(10, day_started=0) for _ in range(4)]
+        # the last campaign was added in the middle of the day, and the third has no PS below the threshold
+        num_iterations = [mystique_constants.num_iterations_per_day] * 3 + [mystique_constants.num_iterations_per_day // 2]
+        for i, (batched_campaign, campaign) in enumerate(zip(batched_campaigns, campaigns)):
+            today_ps = generator.uniform(0, 1, size=num_iterations[i]).tolist()
+            for mystique_tracked_campaign in (batched_campaign, campaign):
+                self.target_slope_strategy.initialize_slope(mystique_tracked_campaign)
+                mystique_tracked_campaign.today_ps = today_ps
+                mystique_tracked_campaign.sum_ps_below_threshold = 0 if i == 2 else sum(today_ps)
+                mystique_tracked_campaign.count_ps_below_threshold = 0 if i == 2 else len(today_ps)
+        # a day with an updated target slope
+        for campaign in campaigns:
+            self.target_slope_strategy.update_target_slope_and_spend(campaign)
+        self.target_slope_strategy.update_target_slopes_and_spends(state, batched_campaigns)
+        for batched_campaign, campaign in zip(batched_campaigns, campaigns):
+            self.assertListEqual(batched_campaign.current_target_slope, campaign.current_target_slope)
+            self.assertListEqual(batched_campaign.current_target_spend_curve, campaign.current_target_spend_curve)
+            self.assertListEqual(batched_campaign.target_slope_history.tolist(), campaign.target_slope_history.tolist())
+        self.assertEqual(len(batched_campaigns[-1].target_slope_history), 0)
+
 
 # run the test
 if __name__ == '__main__':
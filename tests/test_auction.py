@@ -2,6 +2,10 @@
 
 import random
 import unittest
+
+import numpy as np
+
+import src.configuration as config
 from src.system.auction import *
 
 
@@ -31,6 +35,42 @@ class TestAuctions(unittest.TestCase):
         self.assertIsNotNone(winners, "auctions winners list is None")
         self.assertEqual(len(winners), 0, "auction winners list should be empty")
 
+    def test_fp_auction_batch(self):
+        bids = np.array([[1, 5, 3],
+                         [-np.inf, -np.inf, -np.inf],
+                         [2, -np.inf, 0.5]])
+        winners, payments = AuctionFP.run_batch(bids)
+        self.assertListEqual(winners.tolist(), [1, -1, 0])
+        self.assertListEqual(payments.tolist(), [5, 0, 2])
+
+    def test_gsp_auction(self):
+        auction = AuctionGSP(user_properties={})
+        bids = [Bid('campaign_0', 3), Bid('campaign_1', 7), Bid('campaign_2', 5)]
+        winners = auction.run(bids)
+        self.assertEqual(len(winners), 1, "auction winners list should contain a single entry")
+        self.assertEqual(winners[0].bid.campaign_id, 'campaign_1')
+        self.assertEqual(winners[0].payment, 5, "the winner should pay the runner-up bid")
+        # a single bid pays the minimal bid
+        winners = auction.run([Bid('campaign_0', 3)])
+        self.assertEqual(winners[0].payment, config.campaign_minimal_bid)
+        self.assertListEqual(auction.run([]), [])
+
+    def test_gsp_auction_batch(self):
+        bids = np.array([[1, 5, 3],
+                         [-np.inf, -np.inf, -np.inf],
+                         [2, -np.inf, -np.inf]])
+        winners, payments = AuctionGSP.run_batch(bids)
+        self.assertListEqual(winners.tolist(), [1, -1, 0])
+        self.assertListEqual(payments.tolist(), [3, 0, config.campaign_minimal_bid])
+        # the batch should agree with running the auctions one by one
+        bids = np.random.uniform(size=(100, 6))
+        winners, payments = AuctionGSP.run_batch(bids)
+        for row, winner, payment in zip(bids, winners, payments):
+            auction_winners = AuctionGSP(user_properties={}).run([Bid(f'campaign_{i}', amount)
+                                                                  for i, amount in enumerate(row)])
+            self.assertEqual(auction_winners[0].bid.campaign_id, f'campaign_{winner}')
+            self.assertAlmostEqual(auction_winners[0].payment, payment)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,41 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import unittest
+
+import numpy as np
+
+from src.system.auction_batch import AuctionBatch
+from src.system.auction import AuctionFP
+
+
+class TestAuctionBatch(unittest.TestCase):
+    def test_sampled_values_frequencies(self):
+        values = np.array([3, 5, 7])
+        probabilities = np.array([0.2, 0.5, 0.3])
+        num_samples = 100000
+        sampled_values = AuctionBatch.sample_user_property_values(values=values, probabilities=probabilities,
+                                                                  size=num_samples)
+        self.assertEqual(len(sampled_values), num_samples)
+        for value, probability in zip(values, probabilities):
+            self.assertAlmostEqual(np.mean(sampled_values == value), probability, delta=0.01,
+                                   msg=f'unexpected frequency of value {value}')
+
+    def test_auctions_are_created_from_columns(self):
+        batch = AuctionBatch(num_auctions=3, user_properties={'Gender': np.array([0, 1, 1]),
+                                                              'Location': np.array([2, 0, 1])})
+        self.assertEqual(len(batch), 3)
+        auctions = list(batch)
+        self.assertEqual(len(auctions), 3)
+        for i, auction in enumerate(auctions):
+            self.assertIsInstance(auction, AuctionFP)
+            self.assertEqual(auction.user_properties(), batch.auction(i).user_properties())
+        self.assertEqual(auctions[2].user_properties(), {'Gender': 1, 'Location': 1})
+
+    def test_empty_batch(self):
+        batch = AuctionBatch(num_auctions=0, user_properties={'Gender': np.array([], dtype=int)})
+        self.assertEqual(len(batch), 0)
+        self.assertEqual(list(batch), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import tempfile
+import unittest
+
+import numpy as np
+from scipy import stats
+
+import src.configuration as config
+from src.constants import AuctionEngine
+from src.system.auction import AuctionFP
+from src.system.auction_trace import AuctionTraceReader, AuctionTraceWriter, MISSING_USER_PROPERTY_VALUE
+from src.system.campaign import Campaign
+from src.system.daily_cosine import DailyCosineWave
+from src.system.marketplace import Marketplace
+from src.system.serving_system import ServingSystem
+from src.system.simulation_context import SimulationContext
+
+
+class TestAuctionTrace(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.original_factor_untracked_bids = config.factor_untracked_bids
+        config.factor_untracked_bids = 0
+
+    def tearDown(self):
+        config.factor_untracked_bids = self.original_factor_untracked_bids
+        self.folder.cleanup()
+
+    def _write_trace(self, minutes: list[dict[str, list[int]]], minutes_per_chunk: int = 2):
+        writer = AuctionTraceWriter(self.folder.name, features=['Gender', 'Device'],
+                                    minutes_per_chunk=minutes_per_chunk)
+        for user_properties in minutes:
+            writer.write_minute({feature: np.array(values) for feature, values in user_properties.items()})
+        writer.close()
+
+    def test_round_trip(self):
+        minutes = [{'Gender': [0, 1, 1], 'Device': [2, 0, 1]},
+                   {'Gender': [], 'Device': []},
+                   {'Gender': [1], 'Device': [3]},
+                   {'Gender': [0, 0]},
+                   {'Gender': [1, 0, 1, 1], 'Device': [0, 0, 0, 5]}]
+        self._write_trace(minutes)
+        reader = AuctionTraceReader(self.folder.name)
+        self.assertEqual(len(reader), len(minutes))
+        # read the minutes out of order, so that chunks are mapped again
+        for minute in [4, 0, 1, 3, 2]:
+            auction_batch = reader.auction_batch(minute)
+            self.assertEqual(len(auction_batch), len(minutes[minute]['Gender']))
+            self.assertEqual(reader.num_auctions(minute), len(auction_batch))
+            self.assertListEqual(auction_batch.user_properties['Gender'].tolist(), minutes[minute]['Gender'])
+            expected_devices = minutes[minute].get('Device', [MISSING_USER_PROPERTY_VALUE] * len(auction_batch))
+            self.assertListEqual(auction_batch.user_properties['Device'].tolist(), expected_devices)
+        with self.assertRaises(Exception):
+            reader.auction_batch(len(minutes))
+
+    def test_user_properties_mapping(self):
+        self._write_trace([{'Gender': [0, 1, 2, MISSING_USER_PROPERTY_VALUE], 'Device': [7, 8, 9, 7]}])
+        reader = AuctionTraceReader(self.folder.name, features=['Gender', 'Location', 'Platform'],
+                                    user_properties_mapping={'Gender': 'Gender',
+                                                             'Platform': ('Device', {7: 0, 8: 1})})
+        auction_batch = reader.auction_batch(0, auction_class=AuctionFP)
+        self.assertListEqual(auction_batch.user_properties['Gender'].tolist(), [0, 1, 2, MISSING_USER_PROPERTY_VALUE])
+        self.assertListEqual(auction_batch.user_properties['Platform'].tolist(),
+                             [0, 1, MISSING_USER_PROPERTY_VALUE, 0])
+        # features without a trace feature are missing from all the auctions
+        self.assertListEqual(auction_batch.user_properties['Location'].tolist(), [MISSING_USER_PROPERTY_VALUE] * 4)
+        with self.assertRaises(Exception):
+            AuctionTraceReader(self.folder.name, user_properties_mapping={'Gender': 'Location'})
+
+    def _run_marketplace(self, num_iterations: int, auction_engine: AuctionEngine, **kwargs) -> Marketplace:
+        context = SimulationContext(seed=1)
+        campaigns = [Campaign(campaign_id=f'campaign_{i}', total_budget=100000, run_period=7,
+                              bids_distribution=stats.uniform(loc=0, scale=0.05), context=context)
+                     for i in range(5)]
+        marketplace = Marketplace(serving_system=ServingSystem(tracked_campaigns=campaigns, context=context),
+                                  traffic_mean_cos_wave=DailyCosineWave(dc=20, amplitude=0.5, phase=0),
+                                  batch_auction_generation=False, auction_engine=auction_engine, **kwargs)
+        for _ in range(num_iterations):
+            marketplace.run_iteration()
+        return marketplace
+
+    def test_record_and_replay(self):
+        num_iterations = 30
+        for auction_engine in [AuctionEngine.REFERENCE, AuctionEngine.BATCHED]:
+            with self.subTest(auction_engine=auction_engine), tempfile.TemporaryDirectory() as folder:
+                writer = AuctionTraceWriter(folder, features=list(config.user_properties), minutes_per_chunk=7)
+                self._run_marketplace(num_iterations, auction_engine, auction_trace_writer=writer)
+                writer.close()
+                reader = AuctionTraceReader(folder, features=list(config.user_properties))
+                self.assertEqual(len(reader), num_iterations)
+                replayed = self._run_marketplace(num_iterations, auction_engine, auction_trace=reader)
+                # without untracked bids and targeting, a tracked campaign wins each auction of the trace
+                num_wins = sum(campaign.num_auctions_won_today()
+                               for campaign in replayed.serving_system.tracked_campaigns.values())
+                self.assertEqual(num_wins, sum(reader.num_auctions(minute) for minute in range(num_iterations)))
+                for minute in range(num_iterations):
+                    for values in reader.auction_batch(minute).user_properties.values():
+                        self.assertTrue(np.isin(values, [0, 1, 2]).all())
+
+
+if __name__ == '__main__':
+    unittest.main()
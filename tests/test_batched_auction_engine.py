@@ -0,0 +1,110 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import unittest
+
+import numpy as np
+from scipy import stats
+
+import src.configuration as config
+from src.system.auction_batch import AuctionBatch
+from src.system.batched_auction_engine import BatchedAuctionEngine
+from src.system.budget_pacing.mystique.mystique import MystiqueHardThrottlingPacingSystem
+from src.system.budget_pacing.mystique.target_slope import TargetSpendStrategyType
+from src.system.campaign import Campaign
+from src.system.clock import Clock
+from src.system.serving_system import ServingSystem
+from src.system.simulation_context import SimulationContext
+from tests.tests_utils import create_campaigns
+
+
+def create_auction_batch(num_auctions: int, user_properties: dict[str, int] = None) -> AuctionBatch:
+    if user_properties is None:
+        user_properties = {}
+    return AuctionBatch(num_auctions=num_auctions,
+                        user_properties={feature: np.full(num_auctions, value)
+                                         for feature, value in user_properties.items()})
+
+
+def create_campaigns_in_context(n: int, context: SimulationContext) -> list[Campaign]:
+    return [Campaign(campaign_id=f'campaign_{i}', total_budget=100000, run_period=7,
+                     bids_distribution=stats.uniform(loc=config.campaign_minimal_bid, scale=0.05), context=context)
+            for i in range(n)]
+
+
+class TestBatchedAuctionEngine(unittest.TestCase):
+    def setUp(self):
+        Clock.reset()
+        config.factor_untracked_bids = 0
+
+    def test_all_auctions_are_won(self):
+        num_auctions = 50
+        campaigns = create_campaigns(5)
+        engine = BatchedAuctionEngine(serving_system=ServingSystem(tracked_campaigns=campaigns))
+        engine.run(create_auction_batch(num_auctions))
+        self.assertEqual(sum(campaign.num_auctions_won_today() for campaign in campaigns), num_auctions,
+                         "expected each auction to be won by a tracked campaign")
+        for campaign in campaigns:
+            self.assertGreater(campaign.spent_today(), 0)
+
+    def test_budget_depletion_within_batch(self):
+        # the first campaign always outbids the second one, until it depletes its daily budget
+        high_bidder = Campaign(campaign_id='high', total_budget=2.5, run_period=1,
+                               bids_distribution=stats.uniform(loc=1, scale=0.01))
+        low_bidder = Campaign(campaign_id='low', total_budget=1000, run_period=1,
+                              bids_distribution=stats.uniform(loc=0.01, scale=0.01))
+        engine = BatchedAuctionEngine(serving_system=ServingSystem(tracked_campaigns=[high_bidder, low_bidder]))
+        num_auctions = 10
+        engine.run(create_auction_batch(num_auctions))
+        self.assertEqual(high_bidder.num_auctions_won_today(), 3,
+                         "expected the high bidder to stop participating after depleting its budget")
+        self.assertEqual(low_bidder.num_auctions_won_today(), num_auctions - 3)
+        self.assertGreaterEqual(high_bidder.spent_today(), high_bidder.daily_budget)
+        # the depleted campaign shouldn't participate in the following batches
+        engine.run(create_auction_batch(num_auctions))
+        self.assertEqual(high_bidder.num_auctions_won_today(), 3)
+        self.assertEqual(low_bidder.num_auctions_won_today(), 2 * num_auctions - 3)
+
+    def test_targeting_groups(self):
+        property_name = 'Property1'
+        campaign = create_campaigns(1)[0]
+        campaign._targeting_groups = {property_name: {4, 5}}
+        engine = BatchedAuctionEngine(serving_system=ServingSystem(tracked_campaigns=[campaign]))
+        engine.run(create_auction_batch(10, {property_name: 1}))
+        self.assertEqual(campaign.num_auctions_won_today(), 0, "expected the campaign not to participate")
+        engine.run(create_auction_batch(10, {property_name: 5}))
+        self.assertEqual(campaign.num_auctions_won_today(), 10)
+
+    def test_untracked_top_bids(self):
+        config.factor_untracked_bids = 2
+        campaigns = create_campaigns(3)
+        serving_system = ServingSystem(tracked_campaigns=campaigns)
+        bids = serving_system.get_bids_batch(create_auction_batch(20))
+        self.assertEqual(bids.tracked_bids.shape, (20, 3))
+        self.assertEqual(bids.untracked_bids.shape, (20, 2))
+        self.assertTrue(np.all(bids.untracked_bids[:, 0] >= bids.untracked_bids[:, 1]),
+                        "expected the highest untracked bid to be in the first column")
+        self.assertTrue(np.all(bids.untracked_bids > 0))
+
+    def test_throttled_bids_are_not_sampled(self):
+        context = SimulationContext(seed=0)
+        campaigns = create_campaigns_in_context(2, context)
+        pacing_system = MystiqueHardThrottlingPacingSystem(TargetSpendStrategyType.LINEAR, context=context)
+        serving_system = ServingSystem(pacing_system=pacing_system, tracked_campaigns=campaigns, context=context)
+        # the first campaign is always throttled, and the second one never is
+        pacing_system.mystique_tracked_campaigns[campaigns[0].id].ps = 0
+        pacing_system.mystique_tracked_campaigns[campaigns[1].id].ps = 1
+        num_auctions = 20
+        bids = serving_system.get_bids_batch(create_auction_batch(num_auctions))
+        self.assertFalse(bids.eligible[:, 0].any())
+        self.assertTrue(np.all(bids.tracked_bids[:, 0] == -np.inf))
+        self.assertTrue(bids.eligible[:, 1].all())
+        # compared with the bids of the same campaigns in a simulation with the same seed, the throttled campaign
+        # didn't sample any bid, and the other campaign sampled a bid per auction
+        reference_campaigns = create_campaigns_in_context(2, SimulationContext(seed=0))
+        np.testing.assert_array_equal(campaigns[0].sample_bids(5), reference_campaigns[0].sample_bids(5),
+                                      "expected the bids of the throttled campaign not to be sampled")
+        np.testing.assert_array_equal(bids.tracked_bids[:, 1], reference_campaigns[1].sample_bids(num_auctions))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,11 @@
 
 import random
 import unittest
+import numpy as np
+
+from src.system.auction import AuctionFP, AuctionGSP
 from src.system.bid import *
+from src.system.campaign import Campaign
 
 
 class TestBids(unittest.TestCase):
@@ -26,5 +30,34 @@ class TestBids(unittest.TestCase):
         self.assertEqual(bid1, bid2, "bids with same campaign_id and amount should be equal")
 
 
+class TestBidBatch(unittest.TestCase):
+    def test_bid_adapters(self):
+        campaigns = [Campaign(campaign_id=f'campaign_{i}', total_budget=100, run_period=7) for i in range(3)]
+        bids = BidBatch(campaign_indices=np.array([2, 0, -1, -2]), amounts=np.array([0.5, 0.2, 0.3, 0.1]),
+                        campaigns=campaigns)
+        self.assertEqual(len(bids), 4)
+        self.assertEqual(bids[0], Bid('campaign_2', 0.5))
+        self.assertEqual(bids[-1], Bid(UNTRACKED_CAMPAIGN_ID_PREFIX + '1', 0.1))
+        self.assertListEqual([bid.campaign_id for bid in bids],
+                             ['campaign_2', 'campaign_0', 'untracked_campaign_0', 'untracked_campaign_1'])
+        with self.assertRaises(IndexError):
+            bids[4]
+
+    def test_auctions_on_bid_batch(self):
+        bids = BidBatch(campaign_indices=untracked_campaign_indices(3), amounts=np.array([3., 7., 5.]))
+        winners = AuctionGSP(user_properties={}).run(bids)
+        self.assertEqual(winners[0].bid, Bid('untracked_campaign_1', 7))
+        self.assertEqual(winners[0].payment, 5)
+        self.assertEqual(AuctionFP(user_properties={}).run(bids)[0].bid, max(bids))
+        empty_bids = BidBatch(campaign_indices=np.array([], dtype=int), amounts=np.array([]))
+        self.assertEqual(empty_bids, [])
+        self.assertListEqual(AuctionFP(user_properties={}).run(empty_bids), [])
+
+    def test_fp_auction_ties(self):
+        # as with max() over bids, the last of the highest bids wins
+        bids = [Bid('campaign_0', 1), Bid('campaign_1', 1), Bid('campaign_2', 0.5)]
+        self.assertEqual(AuctionFP(user_properties={}).run(bids)[0].bid, max(bids))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,62 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import unittest
+
+import numpy as np
+from scipy import stats
+
+import src.configuration as config
+from src.system.campaign import Campaign
+from src.system.simulation_context import SimulationContext
+
+
+def create_campaign(campaign_id: str, context: SimulationContext, max_bid: float = None) -> Campaign:
+    return Campaign(campaign_id=campaign_id, total_budget=100, run_period=7, max_bid=max_bid,
+                    bids_distribution=stats.uniform(loc=0.01, scale=1), context=context)
+
+
+class TestBidSampler(unittest.TestCase):
+    def setUp(self):
+        self.block_size = config.bid_sampling_block_size
+        # a small block, so that the tests cross block boundaries
+        config.bid_sampling_block_size = 100
+
+    def tearDown(self):
+        config.bid_sampling_block_size = self.block_size
+
+    def test_bids_dont_depend_on_other_campaigns(self):
+        campaign = create_campaign('campaign_0', SimulationContext(seed=0))
+        expected_bids = campaign.sample_bids(250)
+        context = SimulationContext(seed=0)
+        campaign = create_campaign('campaign_0', context)
+        # a second campaign with the same distribution consumes bids in between the bids of the first one
+        other_campaign = create_campaign('campaign_1', context)
+        bids = []
+        for size in [30, 120, 100]:
+            bids.append(campaign.sample_bids(size))
+            other_campaign.sample_bids(70)
+            other_campaign.bid_amount()
+        np.testing.assert_array_equal(np.concatenate(bids), expected_bids)
+        self.assertFalse(np.array_equal(other_campaign.sample_bids(250), expected_bids),
+                         "expected campaigns to draw different bids")
+
+    def test_bids_are_sampled_in_order(self):
+        expected_bids = create_campaign('campaign', SimulationContext(seed=0)).sample_bids(250)
+        campaign = create_campaign('campaign', SimulationContext(seed=0))
+        # sampling one by one and in parts results in the same bids
+        bids = [campaign.sample_bids(30), [campaign.bid_amount()], campaign.sample_bids(219)]
+        np.testing.assert_array_equal(np.concatenate(bids), expected_bids)
+        np.testing.assert_array_equal(create_campaign('campaign', SimulationContext(seed=1)).sample_bids(250) !=
+                                      expected_bids, True, "expected different seeds to result in different bids")
+
+    def test_distribution_and_max_bid(self):
+        bids = create_campaign('campaign', SimulationContext(seed=0)).sample_bids(1000)
+        self.assertTrue(np.all((bids >= 0.01) & (bids <= 1.01)))
+        self.assertEqual(np.unique(bids).size, bids.size, "expected the bids not to be repeated")
+        self.assertAlmostEqual(bids.mean(), 0.51, delta=0.05)
+        capped_bids = create_campaign('campaign', SimulationContext(seed=0), max_bid=0.5).sample_bids(1000)
+        np.testing.assert_array_equal(capped_bids, np.minimum(bids, 0.5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from scipy import stats
+
+import src.configuration as config
+from src.constants import AuctionEngine
+from src.system.auction_batch import AuctionBatch, BatchRandomNumbers
+from src.system.budget_pacing.mystique.mystique import MystiquePacingSystem
+from src.system.budget_pacing.mystique.target_slope import TargetSpendStrategyType
+from src.system.campaign import Campaign
+from src.system.common_random_numbers import CommonRandomNumbersRecorder, CommonRandomNumbersReplayer
+from src.system.daily_cosine import DailyCosineWave
+from src.system.marketplace import Marketplace
+from src.system.serving_system import ServingSystem
+from src.system.simulation_context import SimulationContext
+
+_num_iterations = 60
+
+
+def build_marketplace(pacing: bool, seed: int, **kwargs) -> Marketplace:
+    context = SimulationContext(seed=seed)
+    # low budgets, so that some of the campaigns reach their daily budgets
+    campaigns = [Campaign(campaign_id=f'campaign_{i}', total_budget=7 * (i + 1), run_period=7,
+                          targeting_groups={'Gender': {i % 2}} if i % 3 == 0 else None,
+                          bids_distribution=stats.uniform(loc=0.001, scale=0.05), context=context)
+                 for i in range(6)]
+    pacing_system = MystiquePacingSystem(TargetSpendStrategyType.LINEAR, context=context) if pacing else None
+    serving_system = ServingSystem(pacing_system=pacing_system, tracked_campaigns=campaigns, context=context)
+    return Marketplace(serving_system=serving_system, auction_engine=AuctionEngine.BATCHED,
+                       traffic_mean_cos_wave=DailyCosineWave(dc=30, amplitude=0.5, phase=0), **kwargs)
+
+
+def campaign_results(marketplace: Marketplace) -> list[tuple[float, int]]:
+    return [(campaign.spent_today(), campaign.num_auctions_won_today())
+            for campaign in marketplace.serving_system.tracked_campaigns.values()]
+
+
+class TestCommonRandomNumbers(unittest.TestCase):
+    def setUp(self):
+        config.factor_untracked_bids = 2
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def _record(self, pacing: bool) -> Marketplace:
+        recorder = CommonRandomNumbersRecorder(self.folder.name, features=list(config.user_properties))
+        marketplace = build_marketplace(pacing=pacing, seed=1, random_numbers_recorder=recorder)
+        for _ in range(_num_iterations):
+            marketplace.run_iteration()
+        recorder.close()
+        return marketplace
+
+    def test_recording_round_trip(self):
+        recorder = CommonRandomNumbersRecorder(self.folder.name, features=['Gender'])
+        batches = [AuctionBatch(num_auctions=2, user_properties={'Gender': np.array([0, 1])},
+                                random_numbers=BatchRandomNumbers(tracked_bids=np.array([0.1, 0.2, 0.3]),
+                                                                  untracked_bids=np.array([[0.5, 0.4],
+                                                                                           [0.2, -np.inf]]))),
+                   AuctionBatch(num_auctions=0, user_properties={'Gender': np.array([], dtype=int)})]
+        for batch in batches:
+            recorder.record(batch)
+        recorder.close()
+        replayer = CommonRandomNumbersReplayer(self.folder.name)
+        self.assertEqual(replayer.num_minutes, 2)
+        replayed = replayer.auction_batch(0)
+        self.assertListEqual(replayed.user_properties['Gender'].tolist(), [0, 1])
+        self.assertListEqual(replayed.random_numbers.tracked_bids.tolist(), [0.1, 0.2, 0.3])
+        np.testing.assert_array_equal(replayed.random_numbers.untracked_bids, batches[0].random_numbers.untracked_bids)
+        self.assertEqual(len(replayer.auction_batch(1)), 0)
+        with self.assertRaises(Exception):
+            replayer.auction_batch(2)
+
+    def test_replay_reproduces_the_recorded_run(self):
+        recorded = self._record(pacing=False)
+        # a different seed, which would result in different auctions and bids if they were not replayed
+        replayed = build_marketplace(pacing=False, seed=2,
+                                     random_numbers_replayer=CommonRandomNumbersReplayer(self.folder.name))
+        for _ in range(_num_iterations):
+            replayed.run_iteration()
+        self.assertListEqual(campaign_results(replayed), campaign_results(recorded))
+
+    def test_replay_with_pacing(self):
+        self._record(pacing=False)
+        replayer = CommonRandomNumbersReplayer(self.folder.name)
+        replayed = build_marketplace(pacing=True, seed=2, random_numbers_replayer=replayer)
+        for _ in range(_num_iterations):
+            replayed.run_iteration()
+        total_wins = sum(num_wins for _, num_wins in campaign_results(replayed))
+        self.assertGreater(total_wins, 0)
+        self.assertLessEqual(total_wins, sum(len(replayer.auction_batch(minute)) for minute in range(_num_iterations)))
+
+    def test_recording_without_running_auctions(self):
+        self._record(pacing=True)
+        pre_pass_folder = tempfile.TemporaryDirectory()
+        recorder = CommonRandomNumbersRecorder(pre_pass_folder.name, features=list(config.user_properties))
+        marketplace = build_marketplace(pacing=False, seed=1, random_numbers_recorder=recorder)
+        for _ in range(_num_iterations):
+            marketplace.record_iteration()
+        recorder.close()
+        # the inputs don't depend on the auctions nor on the pacing, so the pre-pass records the same inputs
+        self.assertListEqual(campaign_results(marketplace), [(0, 0)] * 6)
+        for file_name in sorted(os.listdir(self.folder.name)):
+            with open(f'{self.folder.name}/{file_name}', 'rb') as recorded_file, \
+                    open(f'{pre_pass_folder.name}/{file_name}', 'rb') as pre_pass_file:
+                self.assertEqual(recorded_file.read(), pre_pass_file.read(), file_name)
+        pre_pass_folder.cleanup()
+
+    def test_requires_batched_engine(self):
+        with self.assertRaises(Exception):
+            Marketplace(serving_system=ServingSystem(), auction_engine=AuctionEngine.REFERENCE,
+                        random_numbers_recorder=CommonRandomNumbersRecorder(self.folder.name, features=[]))
+
+
+if __name__ == '__main__':
+    unittest.main()
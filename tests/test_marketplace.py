@@ -44,6 +44,22 @@ class TestMarketPlace(unittest.TestCase):
                              _mock_num_auctions_per_iteration * config.num_iterations_per_day,
                              "expected the total number of wins in a day to be equal to the number of auctions")
 
+    @mock.patch("src.system.marketplace.Marketplace._sample_current_num_of_auctions",
+                lambda _: _mock_num_auctions_per_iteration)
+    def test_marketplace_batch_auction_generation(self):
+        marketplace = Marketplace(serving_system=ServingSystem(tracked_campaigns=self.campaigns),
+                                  batch_auction_generation=True)
+        auctions = marketplace._generate_auctions()
+        self.assertEqual(len(auctions), _mock_num_auctions_per_iteration)
+        for auction in auctions:
+            for feature, value in auction.user_properties().items():
+                self.assertIn(value, config.user_properties[feature])
+        for _ in range(config.num_iterations_per_day):
+            marketplace.run_iteration()
+        num_auctions_won_last_day = sum([sum(c.stats.auctions_won_history[-1]) for c in self.campaigns])
+        self.assertEqual(num_auctions_won_last_day, _mock_num_auctions_per_iteration * config.num_iterations_per_day,
+                         "expected the total number of wins in a day to be equal to the number of auctions")
+
     def test_traffic_dist_mean_same_every_day(self):
         n_days = 7
         minutes_to_check = [0, config.num_iterations_per_day // 4, config.num_iterations_per_day // 2,
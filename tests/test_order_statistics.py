@@ -0,0 +1,44 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import math
+import unittest
+
+import numpy as np
+from scipy import stats
+
+from src.system.order_statistics import sample_top_two
+
+
+class TestOrderStatistics(unittest.TestCase):
+    def setUp(self):
+        self.generator = np.random.default_rng(11)
+        self.distribution = stats.lognorm(s=2.14, scale=math.exp(-8.19))
+
+    def test_matches_brute_force_sampling(self):
+        num_samples = 4000
+        for num_draws in [1, 2, 7, 60]:
+            brute_force = self.distribution.rvs(size=(num_samples, num_draws), random_state=self.generator)
+            brute_force = np.sort(brute_force, axis=1)[:, ::-1]
+            top_two = sample_top_two(self.distribution, np.full(num_samples, num_draws), self.generator)
+            self.assertGreater(stats.ks_2samp(top_two[:, 0], brute_force[:, 0]).pvalue, 0.001,
+                               f'unexpected distribution of the maximum of {num_draws} draws')
+            if num_draws > 1:
+                self.assertGreater(stats.ks_2samp(top_two[:, 1], brute_force[:, 1]).pvalue, 0.001,
+                                   f'unexpected distribution of the runner-up of {num_draws} draws')
+                self.assertTrue(np.all(top_two[:, 0] >= top_two[:, 1]))
+
+    def test_missing_draws(self):
+        top_two = sample_top_two(self.distribution, np.array([0, 1, 3]), self.generator)
+        self.assertTrue(np.all(np.isneginf(top_two[0])), 'expected no bids when there are no draws')
+        self.assertGreater(top_two[1, 0], 0)
+        self.assertTrue(np.isneginf(top_two[1, 1]), 'expected no runner-up when there is a single draw')
+        self.assertTrue(np.all(top_two[2] > 0))
+
+    def test_large_number_of_draws(self):
+        top_two = sample_top_two(self.distribution, np.full(1000, 10 ** 7), self.generator)
+        self.assertTrue(np.all(np.isfinite(top_two)))
+        self.assertTrue(np.all(top_two[:, 0] >= top_two[:, 1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
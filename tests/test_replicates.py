@@ -0,0 +1,63 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import math
+import statistics
+import unittest
+
+import numpy as np
+
+import src.configuration as config
+from src import constants
+from src.replicates import ReplicateStatistics, RunningStatistics, run_replicates
+from src.system.daily_cosine import DailyCosineWave
+
+
+class TestReplicates(unittest.TestCase):
+    def test_running_statistics(self):
+        values = np.random.normal(loc=5, scale=2, size=100).tolist()
+        running_statistics = RunningStatistics()
+        self.assertEqual(running_statistics.confidence_interval_half_width(0.95), math.inf)
+        for value in values:
+            running_statistics.update(value)
+        self.assertEqual(running_statistics.count, len(values))
+        self.assertAlmostEqual(running_statistics.mean, statistics.mean(values))
+        self.assertAlmostEqual(running_statistics.variance(), statistics.variance(values))
+        # for 100 values, the 95% t quantile is ~1.98
+        self.assertAlmostEqual(running_statistics.confidence_interval_half_width(0.95),
+                               1.984 * statistics.stdev(values) / 10, places=2)
+
+    def test_replicate_statistics(self):
+        replicate_statistics = ReplicateStatistics()
+        for spend in [10, 12]:
+            replicate_statistics.update([
+                {constants.FIELD_DAY_ID: 0, constants.FIELD_SPEND: spend, constants.FIELD_CPM: None},
+                {constants.FIELD_DAY_ID: constants.OVERALL_STATISTICS_ROW_NAME, constants.FIELD_SPEND: spend}
+            ])
+        self.assertEqual(replicate_statistics.num_replicates, 2)
+        self.assertEqual(replicate_statistics.overall(constants.FIELD_SPEND).mean, 11)
+        self.assertNotIn(constants.FIELD_CPM, replicate_statistics.statistics[0], "missing values should be skipped")
+        self.assertFalse(replicate_statistics.is_precise([constants.FIELD_SPEND], relative_precision=0.01,
+                                                         confidence=0.95))
+        self.assertTrue(replicate_statistics.is_precise([constants.FIELD_SPEND], relative_precision=10,
+                                                        confidence=0.95))
+
+    def test_sequential_stopping(self):
+        original_traffic_mean_cos_wave = config.traffic_mean_cos_wave
+        original_num_campaigns = config.num_campaigns
+        config.traffic_mean_cos_wave = DailyCosineWave(dc=5, amplitude=0.5, phase=0)
+        config.num_campaigns = 3
+        try:
+            # a very loose precision is reached as soon as the minimal number of replicates completes
+            replicate_statistics = run_replicates(pacing_algorithm=None, max_replicates=10, min_replicates=2,
+                                                  relative_precision=100, max_workers=2,
+                                                  num_iterations=config.num_iterations_per_day)
+        finally:
+            config.traffic_mean_cos_wave = original_traffic_mean_cos_wave
+            config.num_campaigns = original_num_campaigns
+        # replicates that were already running when the precision was reached are also aggregated
+        self.assertLessEqual(replicate_statistics.num_replicates, 3)
+        self.assertGreater(replicate_statistics.overall(constants.FIELD_SPEND).mean, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -46,6 +46,17 @@ class TestServingSystem(unittest.TestCase):
         self.assertEqual(serving_system.tracked_campaigns[campaign_id].num_auctions_won_today(), 1,
                          "the number of auctions won today by the campaign should reflect the auction won")
 
+    def test_untracked_bids_order_statistics(self):
+        config.factor_untracked_bids = 2
+        config.untracked_bids_order_statistics = True
+        num_campaigns = 5
+        serving_system = ServingSystem(tracked_campaigns=create_campaigns(num_campaigns))
+        bids = serving_system.get_bids(AuctionFP({}))
+        config.untracked_bids_order_statistics = False
+        untracked_bids = [bid for bid in bids if bid.campaign_id.startswith('untracked_campaign_')]
+        self.assertEqual(len(bids), num_campaigns + 2, "expected only the two highest untracked bids")
+        self.assertGreaterEqual(untracked_bids[0].amount, untracked_bids[1].amount)
+
     def test_with_mock_budget_pacing_always_zero_ps(self):
         config.factor_untracked_bids = 0
         num_campaigns = 5
@@ -78,6 +89,25 @@ class TestServingSystem(unittest.TestCase):
         self.assertEqual(bids_after_depletion, [],
                          "expected list of bids to be empty after depleting campaign's budget")
 
+    def test_minutes_alive_after_depletion(self):
+        config.factor_untracked_bids = 0
+        campaigns = [Campaign(campaign_id=f'campaign_{i}', total_budget=2, run_period=2,
+                              bids_distribution=stats.uniform(loc=0.5, scale=0.1)) for i in range(2)]
+        serving_system = ServingSystem(tracked_campaigns=campaigns)
+        depletion_minute = 100
+        for minute in range(num_minutes_in_day):
+            if minute == depletion_minute:
+                # the payment depletes the budget of the first campaign, which stops bidding from now on
+                serving_system.update_winners([AuctionWinner(bid=Bid(campaigns[0].id, 1), payment=1)])
+                bids = serving_system.get_bids(AuctionFP({}))
+                self.assertListEqual([bid.campaign_id for bid in bids], [campaigns[1].id])
+            serving_system.end_iteration()
+            Clock.advance()
+        self.assertListEqual(campaigns[0].minutes_alive_history(), [depletion_minute + 1])
+        self.assertListEqual(campaigns[1].minutes_alive_history(), [num_minutes_in_day])
+        # the depleted campaign is restored for the new day
+        self.assertEqual(len(serving_system.get_bids(AuctionFP({}))), 2)
+
     def test_with_mystique_budget_pacing(self):
         config.factor_untracked_bids = 0
         campaign = create_campaigns(1)[0]
@@ -120,8 +150,9 @@ class TestServingSystem(unittest.TestCase):
         self.assertEqual(len(bids), 1, "expected to see a single bid")
         # test with a targeting group different from that of the auction
         property_name = 'Property1'
-        # set targeting group for the campaign
+        # set targeting group for the campaign (targeting groups are indexed when campaigns are added)
         campaign._targeting_groups = {property_name: {4, 5, 6}}
+        serving_system = ServingSystem(pacing_system=None, tracked_campaigns=[campaign])
         bids = serving_system.get_bids(AuctionFP({property_name: 1}))
         self.assertEqual(len(bids), 0, "expected to see no bids for the auction")
         # check that all valid values for the target property produce a bid from the campaign
@@ -260,20 +291,48 @@ class TestServingSystem(unittest.TestCase):
             self.assertEqual(len(campaign_stats[field]), num_days)
             self.assertGreater(len(campaign_stats[field][0]), 0)
 
+    def test_default_batch_pacing_methods(self):
+        campaigns = create_campaigns(3)
+        pacing_system = MockPacingSystem(pacing_signal=0.5)
+        serving_system = ServingSystem(pacing_system=pacing_system, tracked_campaigns=campaigns)
+        self.assertListEqual(pacing_system.get_pacing_signals(np.array([0, 2, 2])).tolist(), [0.5] * 3)
+        serving_system.update_winners_batch(campaigns, payments=np.array([0, 0.1, 0]), num_wins=np.array([0, 1, 0]))
+        serving_system.end_iteration()
+        # the spends of the batch are given to the pacing system campaign by campaign
+        self.assertDictEqual(pacing_system.spends, {'campaign_0': 0, 'campaign_1': 0.1, 'campaign_2': 0})
+
+    def test_get_bids_uses_batch_pacing_signals(self):
+        config.factor_untracked_bids = 0
+        campaigns = create_campaigns(3)
+        pacing_system = MockPacingSystem(pacing_signal=0.5)
+        serving_system = ServingSystem(pacing_system=pacing_system, tracked_campaigns=campaigns)
+        bids = serving_system.get_bids(AuctionFP({}))
+        # a single request for the pacing signals of all the bidding campaigns
+        self.assertEqual(len(pacing_system.requested_campaign_indices), 1)
+        self.assertListEqual(pacing_system.requested_campaign_indices[0].tolist(), [0, 1, 2])
+        self.assertListEqual([bid.campaign_id for bid in bids], [campaign.id for campaign in campaigns])
+        for bid in bids:
+            self.assertLessEqual(bid.amount, 0.5 * (config.campaign_minimal_bid + 0.05))
 
 class MockPacingSystem(PacingSystemInterface):
     def __init__(self, pacing_signal=0):
         self.pacing_signal = pacing_signal
+        self.spends = {}
+        self.requested_campaign_indices = []
 
     def add_campaign(self, campaign):
         pass
 
     def end_iteration(self, campaign_id, spend_since_last_iteration):
-        pass
+        self.spends[campaign_id] = self.spends.get(campaign_id, 0) + spend_since_last_iteration
 
     def get_pacing_signal(self, campaign_id):
         return self.pacing_signal
 
+    def get_pacing_signals(self, campaign_indices):
+        self.requested_campaign_indices.append(campaign_indices)
+        return super().get_pacing_signals(campaign_indices)
+
     def get_pacing_statistics(self, campaign_id: str) -> dict[str, object]:
         pass
 
@@ -0,0 +1,83 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import unittest
+
+import numpy as np
+
+import src.configuration as config
+from src import constants
+from src.constants import AuctionEngine
+from src.system.budget_pacing.mystique.mystique import MystiquePacingSystem
+from src.system.budget_pacing.mystique.target_slope import TargetSpendStrategyType
+from src.system.campaign import Campaign
+from src.system.clock import Clock, SimulationClock
+from src.system.marketplace import Marketplace
+from src.system.serving_system import ServingSystem
+from src.system.simulation_context import SimulationContext, default_context
+from scipy import stats
+
+
+def build_marketplace(context: SimulationContext) -> Marketplace:
+    campaigns = [Campaign(campaign_id=f'campaign_{i}', total_budget=70, run_period=7,
+                          bids_distribution=stats.uniform(loc=0.001, scale=0.05), context=context)
+                 for i in range(5)]
+    pacing_system = MystiquePacingSystem(TargetSpendStrategyType.LINEAR, context=context)
+    serving_system = ServingSystem(pacing_system=pacing_system, tracked_campaigns=campaigns, context=context)
+    return Marketplace(serving_system=serving_system, auction_engine=AuctionEngine.BATCHED)
+
+
+class TestSimulationContext(unittest.TestCase):
+    def setUp(self):
+        Clock.reset()
+
+    def test_clock_time_fields(self):
+        clock = SimulationClock()
+        for _ in range(constants.num_minutes_in_day + 2 * constants.num_minutes_in_hour + 5):
+            clock.advance()
+        self.assertEqual(clock.days(), 1)
+        self.assertEqual(clock.hour_in_day(), 2)
+        self.assertEqual(clock.minute_in_hour(), 5)
+        self.assertEqual(clock.minute_in_day(), 2 * constants.num_minutes_in_hour + 5)
+        clock.reset()
+        self.assertEqual(clock.minute_in_day(), 0)
+        self.assertEqual(clock.days(), 0)
+
+    def test_global_clock_is_the_default_context_clock(self):
+        Clock._iterations = constants.num_minutes_in_day + 3
+        self.assertEqual(default_context().clock.days(), 1)
+        self.assertEqual(default_context().clock.minute_in_day(), 3)
+        Clock.advance()
+        self.assertEqual(Clock._iterations, constants.num_minutes_in_day + 4)
+
+    def test_generators(self):
+        context = SimulationContext(seed=5)
+        draws = context.generator('campaign', 'campaign_0').random(10)
+        np.testing.assert_array_equal(draws, SimulationContext(seed=5).generator('campaign', 'campaign_0').random(10))
+        self.assertFalse(np.array_equal(draws, context.generator('campaign', 'campaign_1').random(10)))
+        self.assertFalse(np.array_equal(draws,
+                                        SimulationContext(seed=6).generator('campaign', 'campaign_0').random(10)))
+        # contexts of spawned seed sequences have different streams
+        spawned_contexts = [SimulationContext(seed=seed_sequence)
+                            for seed_sequence in np.random.SeedSequence(5).spawn(2)]
+        self.assertFalse(np.array_equal(spawned_contexts[0].generator('traffic').random(10),
+                                        spawned_contexts[1].generator('traffic').random(10)))
+
+    def test_independent_simulations(self):
+        config.factor_untracked_bids = 2
+        contexts = [SimulationContext(seed=seed) for seed in [1, 1, 2]]
+        marketplaces = [build_marketplace(context) for context in contexts]
+        # interleave the iterations of the simulations
+        for _ in range(20):
+            for marketplace in marketplaces:
+                marketplace.run_iteration()
+        self.assertEqual(Clock._iterations, 0, "the global clock should not advance")
+        for context in contexts:
+            self.assertEqual(context.clock.minute_in_day(), 20)
+        spend = [[campaign.spent_today() for campaign in marketplace.serving_system.tracked_campaigns.values()]
+                 for marketplace in marketplaces]
+        self.assertListEqual(spend[0], spend[1], "simulations with the same seed should have the same results")
+        self.assertNotEqual(spend[0], spend[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import csv
+import os
+import tempfile
+import unittest
+
+import src.configuration as config
+from src import constants, simulation_runner, system_generation_utils
+from src.compare_pacing_systems import run_pacing_comparison
+from src.constants import BudgetPacingAlgorithms
+from src.statistics_store import StatisticsStore
+from src.system.clock import Clock
+from src.system.daily_cosine import DailyCosineWave
+
+
+class TestSimulationRunner(unittest.TestCase):
+    def setUp(self):
+        Clock.reset()
+        self.original_traffic_mean_cos_wave = config.traffic_mean_cos_wave
+        self.original_num_campaigns = config.num_campaigns
+        # a small and quiet marketplace, so that a whole day runs quickly
+        config.traffic_mean_cos_wave = DailyCosineWave(dc=5, amplitude=0.5, phase=0)
+        config.num_campaigns = 5
+        self.output_folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        config.traffic_mean_cos_wave = self.original_traffic_mean_cos_wave
+        config.num_campaigns = self.original_num_campaigns
+        self.output_folder.cleanup()
+
+    def _read_overall_row(self, output_file_path: str) -> list[str]:
+        with open(output_file_path) as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[-1][0], constants.OVERALL_STATISTICS_ROW_NAME)
+        return rows[-1]
+
+    def test_run_and_write_statistics(self):
+        campaign_configurations = system_generation_utils.generate_campaign_configurations(config.num_campaigns)
+        trial_folder = simulation_runner.create_trial_folder(self.output_folder.name)
+        output_file_path = simulation_runner.run_and_write_statistics(
+            pacing_algorithm=BudgetPacingAlgorithms.MYSTIQUE_LINEAR, campaign_configurations=campaign_configurations,
+            trial_folder=trial_folder, num_iterations=config.num_iterations_per_day)
+        self.assertEqual(output_file_path, f'{trial_folder}/{BudgetPacingAlgorithms.MYSTIQUE_LINEAR.value}.csv')
+        self._read_overall_row(output_file_path)
+        store = StatisticsStore(simulation_runner.get_statistics_store_path(
+            trial_folder, BudgetPacingAlgorithms.MYSTIQUE_LINEAR))
+        self.assertEqual(len(store.campaign_ids), config.num_campaigns)
+        self.assertEqual(Clock._iterations, 0, "the simulation should run in a context of its own")
+
+    def test_run_and_write_streamed_statistics(self):
+        campaign_configurations = system_generation_utils.generate_campaign_configurations(config.num_campaigns)
+        trial_folder = simulation_runner.create_trial_folder(self.output_folder.name)
+        with simulation_runner.configuration_overrides({'stream_statistics': True}):
+            simulation_runner.run_and_write_statistics(
+                pacing_algorithm=BudgetPacingAlgorithms.MYSTIQUE_LINEAR,
+                campaign_configurations=campaign_configurations, trial_folder=trial_folder,
+                num_iterations=config.num_iterations_per_day)
+        store_path = simulation_runner.get_statistics_store_path(trial_folder, BudgetPacingAlgorithms.MYSTIQUE_LINEAR)
+        store = StatisticsStore(store_path)
+        self.assertEqual(store[constants.FIELD_BUDGET_UTILIZATION].shape, (config.num_campaigns, 1))
+        self.assertFalse(os.path.exists(f'{store_path}/{simulation_runner.STATISTICS_SINK_FOLDER_NAME}'))
+
+    def test_pacing_comparison(self):
+        pacing_algorithms = [None, BudgetPacingAlgorithms.MYSTIQUE_LINEAR]
+        output_file_paths = run_pacing_comparison(pacing_algorithms=pacing_algorithms, max_workers=2,
+                                                  output_folder_path=self.output_folder.name,
+                                                  num_iterations=config.num_iterations_per_day)
+        self.assertSetEqual(set(output_file_paths.keys()), set(pacing_algorithms))
+        self.assertTrue(output_file_paths[None].endswith('/No_Pacing.csv'))
+        for output_file_path in output_file_paths.values():
+            self._read_overall_row(output_file_path)
+
+    def test_pacing_comparison_with_common_random_numbers(self):
+        pacing_algorithms = [None, BudgetPacingAlgorithms.MYSTIQUE_LINEAR]
+        output_file_paths = run_pacing_comparison(pacing_algorithms=pacing_algorithms, max_workers=2,
+                                                  output_folder_path=self.output_folder.name,
+                                                  num_iterations=config.num_iterations_per_day,
+                                                  common_random_numbers=True)
+        self.assertSetEqual(set(output_file_paths.keys()), set(pacing_algorithms))
+        for output_file_path in output_file_paths.values():
+            self._read_overall_row(output_file_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import tempfile
+import unittest
+
+import numpy as np
+from scipy import stats
+
+import src.configuration as config
+import src.system.budget_pacing.mystique.mystique_constants as mystique_constants
+from src import constants
+from src.statistics_store import StatisticsStore, write_statistics_store, write_statistics_store_from_sink
+from src.system import statistics_sink
+from src.system.budget_pacing.mystique.mystique import MystiquePacingSystem
+from src.system.budget_pacing.mystique.target_slope import TargetSpendStrategyType
+from src.system.campaign import Campaign
+from src.system.daily_cosine import DailyCosineWave
+from src.system.marketplace import Marketplace
+from src.system.serving_system import ServingSystem
+from src.system.simulation_context import SimulationContext
+from src.system.statistics_sink import StatisticsSink
+
+_num_days = 3
+
+
+def run_simulation(sink: StatisticsSink = None) -> ServingSystem:
+    context = SimulationContext(seed=1)
+    # campaigns with different run periods, so that some of them end before the simulation does
+    campaigns = [Campaign(campaign_id=f'campaign_{i}', total_budget=(i + 1) * (i % 3 + 1), run_period=i % 3 + 1,
+                          bids_distribution=stats.uniform(loc=0, scale=0.05), context=context)
+                 for i in range(4)]
+    serving_system = ServingSystem(pacing_system=MystiquePacingSystem(TargetSpendStrategyType.LINEAR, context=context),
+                                   tracked_campaigns=campaigns, context=context, statistics_sink=sink)
+    marketplace = Marketplace(serving_system=serving_system,
+                              traffic_mean_cos_wave=DailyCosineWave(dc=5, amplitude=0.5, phase=0))
+    for _ in range(_num_days * config.num_iterations_per_day):
+        marketplace.run_iteration()
+    return serving_system
+
+
+class TestStatisticsSink(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        cls.sink_folder_path = f'{cls.folder.name}/days'
+        cls.serving_system = run_simulation()
+        cls.streamed_serving_system = run_simulation(StatisticsSink(cls.sink_folder_path))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def test_written_days(self):
+        self.assertListEqual(statistics_sink.written_days(self.sink_folder_path), list(range(_num_days)))
+        campaign_ids, day_statistics = statistics_sink.load_day_statistics(self.sink_folder_path, 0)
+        self.assertEqual(len(campaign_ids), 4)
+        self.assertEqual(day_statistics[mystique_constants.FIELD_SPEND_HISTORY].shape,
+                         (4, constants.num_minutes_in_day))
+        # only the campaigns that were still running are written in the last day
+        campaign_ids, _ = statistics_sink.load_day_statistics(self.sink_folder_path, _num_days - 1)
+        self.assertListEqual(campaign_ids, ['campaign_2'])
+
+    def test_histories_are_released(self):
+        pacing_system = self.streamed_serving_system.pacing_system
+        for campaign_id, campaign in pacing_system.mystique_tracked_campaigns.items():
+            self.assertEqual(len(campaign.spend_history), 0)
+            self.assertEqual(len(campaign.ps_history), 0)
+        self.assertListEqual(self.streamed_serving_system.get_global_statistics_csv_rows(),
+                             self.serving_system.get_global_statistics_csv_rows())
+
+    def test_store_from_sink(self):
+        write_statistics_store(self.serving_system, f'{self.folder.name}/store')
+        write_statistics_store_from_sink(self.streamed_serving_system, self.sink_folder_path,
+                                         f'{self.folder.name}/streamed_store')
+        store = StatisticsStore(f'{self.folder.name}/store')
+        streamed_store = StatisticsStore(f'{self.folder.name}/streamed_store')
+        self.assertListEqual(streamed_store.campaign_ids, store.campaign_ids)
+        self.assertListEqual(sorted(streamed_store.fields()), sorted(store.fields()))
+        for field in store.fields():
+            self.assertListEqual(streamed_store.axes(field), store.axes(field), field)
+            np.testing.assert_array_equal(streamed_store[field], store[field], err_msg=field)
+        self.assertListEqual(streamed_store.global_statistics, store.global_statistics)
+
+
+if __name__ == '__main__':
+    unittest.main()
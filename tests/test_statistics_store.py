@@ -0,0 +1,82 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import tempfile
+import unittest
+
+import numpy as np
+from scipy import stats
+
+import src.configuration as config
+import src.system.budget_pacing.mystique.mystique_constants as mystique_constants
+from src import constants
+from src.statistics_store import StatisticsStore, write_statistics_store, AXIS_CAMPAIGN, AXIS_DAY, AXIS_MINUTE
+from src.system.budget_pacing.mystique.mystique import MystiquePacingSystem
+from src.system.budget_pacing.mystique.target_slope import TargetSpendStrategyType
+from src.system.campaign import Campaign
+from src.system.daily_cosine import DailyCosineWave
+from src.system.marketplace import Marketplace
+from src.system.serving_system import ServingSystem
+from src.system.simulation_context import SimulationContext
+
+
+class TestStatisticsStore(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = tempfile.TemporaryDirectory()
+        context = SimulationContext(seed=1)
+        campaigns = [Campaign(campaign_id=f'campaign_{i}', total_budget=7 * (i + 1), run_period=7,
+                              bids_distribution=stats.uniform(loc=0, scale=0.05), context=context)
+                     for i in range(3)]
+        cls.serving_system = ServingSystem(pacing_system=MystiquePacingSystem(TargetSpendStrategyType.LINEAR,
+                                                                              context=context),
+                                           tracked_campaigns=campaigns, context=context)
+        marketplace = Marketplace(serving_system=cls.serving_system,
+                                  traffic_mean_cos_wave=DailyCosineWave(dc=5, amplitude=0.5, phase=0))
+        for _ in range(2 * config.num_iterations_per_day):
+            marketplace.run_iteration()
+        cls.rows = cls.serving_system.get_statistics_per_campaign_csv_rows()
+        write_statistics_store(cls.serving_system, cls.folder.name)
+        cls.store = StatisticsStore(cls.folder.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.folder.cleanup()
+
+    def test_campaigns_and_axes(self):
+        self.assertListEqual(self.store.campaign_ids, [row[constants.FIELD_CAMPAIGN_ID] for row in self.rows])
+        self.assertEqual(self.store.num_days, 2)
+        self.assertListEqual(self.store.axes(constants.FIELD_DAILY_BUDGET), [AXIS_CAMPAIGN])
+        self.assertListEqual(self.store.axes(constants.FIELD_CPM), [AXIS_CAMPAIGN, AXIS_DAY])
+        self.assertListEqual(self.store.axes(mystique_constants.FIELD_SPEND_HISTORY),
+                             [AXIS_CAMPAIGN, AXIS_DAY, AXIS_MINUTE])
+        self.assertEqual(self.store[mystique_constants.FIELD_SPEND_HISTORY].shape,
+                         (3, 2, constants.num_minutes_in_day))
+
+    def test_values(self):
+        for row in self.rows:
+            campaign_id = row[constants.FIELD_CAMPAIGN_ID]
+            self.assertEqual(self.store.campaign_metric(constants.FIELD_DAILY_BUDGET, campaign_id),
+                             row[constants.FIELD_DAILY_BUDGET])
+            self.assertTrue(np.isnan(self.store.campaign_metric(constants.FIELD_DAY_ENDED, campaign_id)))
+            np.testing.assert_allclose(self.store.campaign_metric(constants.FIELD_BUDGET_UTILIZATION, campaign_id),
+                                       row[constants.FIELD_BUDGET_UTILIZATION])
+            np.testing.assert_allclose(self.store.campaign_metric(mystique_constants.FIELD_SPEND_HISTORY, campaign_id),
+                                       row[mystique_constants.FIELD_SPEND_HISTORY])
+            np.testing.assert_allclose(
+                self.store.campaign_metric(mystique_constants.FIELD_PACING_SIGNAL_HISTORY, campaign_id),
+                row[mystique_constants.FIELD_PACING_SIGNAL_HISTORY])
+        self.assertEqual(self.store.global_statistics[-1][constants.FIELD_SPEND],
+                         self.serving_system.get_global_statistics_csv_rows()[-1][constants.FIELD_SPEND])
+
+    def test_lazy_loading(self):
+        store = StatisticsStore(self.folder.name)
+        self.assertDictEqual(store._loaded_metrics, {})
+        spend_history = store[mystique_constants.FIELD_SPEND_HISTORY]
+        self.assertIsInstance(spend_history, np.memmap)
+        self.assertListEqual(list(store._loaded_metrics), [mystique_constants.FIELD_SPEND_HISTORY])
+        with self.assertRaises(Exception):
+            store['missing metric']
+
+
+if __name__ == '__main__':
+    unittest.main()
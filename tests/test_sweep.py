@@ -0,0 +1,64 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import csv
+import os
+import tempfile
+import unittest
+
+import src.configuration as config
+from src import simulation_runner
+from src.sweep import SweepResultStore, cell_key, estimate_run_cost, expand_grid, run_sweep
+
+
+class TestSweep(unittest.TestCase):
+    def setUp(self):
+        self.store_folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.store_folder.cleanup()
+
+    def test_expand_grid(self):
+        cells = expand_grid({'num_campaigns': [1, 2], 'traffic_dc': [10, 20, 30]})
+        self.assertEqual(len(cells), 6)
+        self.assertIn({'num_campaigns': 2, 'traffic_dc': 30}, cells)
+
+    def test_cell_key(self):
+        self.assertEqual(cell_key({'num_campaigns': 1, 'pacing_algorithm': None}),
+                         cell_key({'pacing_algorithm': None, 'num_campaigns': 1}))
+        self.assertNotEqual(cell_key({'num_campaigns': 1}), cell_key({'num_campaigns': 2}))
+
+    def test_estimate_run_cost(self):
+        self.assertGreater(estimate_run_cost({'num_campaigns': 10, 'traffic_dc': 100}),
+                           estimate_run_cost({'num_campaigns': 10, 'traffic_dc': 10}))
+
+    def test_configuration_overrides(self):
+        original_traffic_mean_cos_wave = config.traffic_mean_cos_wave
+        with simulation_runner.configuration_overrides({'num_campaigns': 3, 'traffic_dc': 7}):
+            self.assertEqual(config.num_campaigns, 3)
+            self.assertEqual(config.traffic_mean_cos_wave.dc, 7)
+            self.assertEqual(config.traffic_mean_cos_wave.amplitude, original_traffic_mean_cos_wave.amplitude)
+        self.assertIs(config.traffic_mean_cos_wave, original_traffic_mean_cos_wave)
+        with self.assertRaises(Exception):
+            with simulation_runner.configuration_overrides({'no_such_variable': 1}):
+                pass
+
+    def test_run_and_resume_sweep(self):
+        grid = {'num_campaigns': [3], 'traffic_dc': [3, 6], 'pacing_algorithm': [None]}
+        summary_file_path = run_sweep(grid, store_folder_path=self.store_folder.name, max_workers=2,
+                                      num_iterations=config.num_iterations_per_day)
+        with open(summary_file_path) as f:
+            rows = list(csv.DictReader(f))
+        self.assertListEqual([row['traffic_dc'] for row in rows], ['3', '6'])
+        store = SweepResultStore(self.store_folder.name)
+        result_file_paths = [f'{self.store_folder.name}/{cell_key(cell)}.json' for cell in expand_grid(grid)]
+        modification_times = [os.stat(path).st_mtime_ns for path in result_file_paths]
+        # resuming the sweep with an additional cell runs only the new cell
+        grid['traffic_dc'].append(1)
+        run_sweep(grid, store_folder_path=self.store_folder.name, max_workers=2,
+                  num_iterations=config.num_iterations_per_day)
+        self.assertListEqual([os.stat(path).st_mtime_ns for path in result_file_paths], modification_times)
+        self.assertTrue(store.contains(cell_key({'num_campaigns': 3, 'traffic_dc': 1, 'pacing_algorithm': None})))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import itertools
+import random
+import unittest
+
+from src.system.campaign import Campaign
+from src.system.targeting_index import TargetingIndex
+
+
+def create_campaign(campaign_id: str, targeting_groups: dict[str, set[int]]) -> Campaign:
+    return Campaign(campaign_id=campaign_id, total_budget=1000, run_period=7, targeting_groups=targeting_groups)
+
+
+class TestTargetingIndex(unittest.TestCase):
+    def setUp(self):
+        self.user_properties = {'Gender': [0, 1], 'Location': [0, 1, 2], 'Device': [0, 1, 2, 3]}
+        random.seed(7)
+        self.campaigns = [create_campaign(f'campaign_{i}', {
+            feature: set(random.sample(values, k=random.randint(1, len(values))))
+            for feature, values in self.user_properties.items() if random.random() < 0.6
+        }) for i in range(40)]
+        self.index = TargetingIndex()
+        for campaign in self.campaigns:
+            self.index.add_campaign(campaign)
+
+    def all_segments(self):
+        features = list(self.user_properties.keys())
+        for values in itertools.product(*self.user_properties.values()):
+            yield dict(zip(features, values))
+
+    def assert_segments_match_campaigns(self, campaigns: list[Campaign]):
+        for user_properties in self.all_segments():
+            expected = [campaign for campaign in campaigns if campaign.is_relevant_user_properties(user_properties)]
+            segment = self.index.get_segment(user_properties)
+            self.assertListEqual(segment.campaigns, expected, f'wrong campaigns for segment {user_properties}')
+            self.assertEqual(segment.num_relevant_campaigns(), len(expected))
+
+    def test_segments(self):
+        self.assert_segments_match_campaigns(self.campaigns)
+        # a missing feature only matches campaigns that don't target it
+        segment = self.index.get_segment({'Gender': 0})
+        for campaign in segment.campaigns:
+            self.assertNotIn('Location', campaign.targeting_groups())
+            self.assertNotIn('Device', campaign.targeting_groups())
+
+    def test_add_and_remove_campaigns(self):
+        # fill the cache, then change the set of campaigns
+        self.assert_segments_match_campaigns(self.campaigns)
+        removed_campaigns = self.campaigns[::3]
+        for campaign in removed_campaigns:
+            self.index.remove_campaign(campaign)
+        new_campaigns = [create_campaign('new_campaign_0', {}),
+                         create_campaign('new_campaign_1', {'Location': {2}, 'Browser': {1}}),
+                         create_campaign('new_campaign_2', {'Device': {3}})]
+        for campaign in new_campaigns:
+            self.index.add_campaign(campaign)
+        remaining_campaigns = [campaign for campaign in self.campaigns if campaign not in removed_campaigns]
+        self.assert_segments_match_campaigns(remaining_campaigns + new_campaigns)
+        self.assertEqual(len(self.index.tracked_campaign_indices()), len(remaining_campaigns) + len(new_campaigns))
+        segment = self.index.get_segment({'Location': 2, 'Browser': 1})
+        self.assertIn(new_campaigns[1], segment.campaigns)
+
+    def test_deplete_and_restore_campaigns(self):
+        # fill the cache for some of the segments before depleting campaigns, and for the rest of them after
+        segments = list(self.all_segments())
+        for user_properties in segments[::2]:
+            self.index.get_segment(user_properties)
+        depleted_campaigns = self.campaigns[::4]
+        for campaign in depleted_campaigns:
+            self.index.deplete_campaign(campaign)
+        self.assertListEqual(self.index.depleted_campaign_indices().tolist(), list(range(0, len(self.campaigns), 4)))
+        for user_properties in segments:
+            segment = self.index.get_segment(user_properties)
+            expected = [campaign for campaign in segment.campaigns if campaign not in depleted_campaigns]
+            self.assertListEqual(segment.active_campaigns, expected, f'wrong active campaigns for {user_properties}')
+            self.assertListEqual(segment.active_campaign_indices.tolist(),
+                                 [self.index.campaign_index(campaign.id) for campaign in expected])
+        # depleted campaigns are still relevant
+        self.assert_segments_match_campaigns(self.campaigns)
+        self.index.restore_depleted_campaigns()
+        self.assertEqual(self.index.depleted_campaign_indices().size, 0)
+        for user_properties in segments:
+            segment = self.index.get_segment(user_properties)
+            self.assertListEqual(segment.active_campaigns, segment.campaigns)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# Copyright Yahoo, Licensed under the terms of the Apache license . See LICENSE file in project root for terms.
+
+import unittest
+
+import numpy as np
+from scipy.special import softmax
+
+from src import constants
+from src.system.clock import Clock
+from src.system.daily_cosine import DailyCosineWave
+from src.system.traffic_schedule import TrafficSchedule
+
+
+class TestTrafficSchedule(unittest.TestCase):
+    def setUp(self):
+        Clock.reset()
+        self.traffic_mean_cos_wave = DailyCosineWave(dc=100, amplitude=0.6, phase=0.5)
+        self.user_properties = {
+            'Gender': {0: DailyCosineWave(1, 0.5, 0.2), 1: DailyCosineWave(1, 0.5, 0.8)},
+            'Location': {0: DailyCosineWave(5, 0.4, 0), 1: DailyCosineWave(5, 0.2, 0.5), 2: DailyCosineWave(6, 0.5, 0.4)}
+        }
+        self.schedule = TrafficSchedule.from_cosine_waves(traffic_mean_cos_wave=self.traffic_mean_cos_wave,
+                                                          user_properties=self.user_properties)
+
+    def test_tables_match_cosine_waves(self):
+        for minute in [0, 1, constants.num_minutes_in_day // 3, constants.num_minutes_in_day - 1]:
+            self.assertAlmostEqual(self.schedule.mean_num_of_auctions_at(minute),
+                                   self.traffic_mean_cos_wave.calculate_value(minute))
+            probabilities = self.schedule.user_properties_probabilities_at(minute)
+            for feature, cos_waves in self.user_properties.items():
+                expected = softmax([cos_wave.calculate_value(minute) for cos_wave in cos_waves.values()])
+                np.testing.assert_allclose(probabilities[feature], expected)
+
+    def test_num_of_auctions_drawn_once_per_day(self):
+        num_auctions = [self.schedule.num_of_auctions_at(day=0, minute_in_day=minute)
+                        for minute in range(constants.num_minutes_in_day)]
+        self.assertListEqual(num_auctions, [self.schedule.num_of_auctions_at(day=0, minute_in_day=minute)
+                                            for minute in range(constants.num_minutes_in_day)])
+        # the daily total of a Poisson process with a mean of 100 per minute is very close to its mean
+        self.assertAlmostEqual(sum(num_auctions) / self.schedule.mean_num_of_auctions.sum(), 1, delta=0.01)
+        next_day_num_auctions = [self.schedule.num_of_auctions_at(day=1, minute_in_day=minute)
+                                 for minute in range(constants.num_minutes_in_day)]
+        self.assertNotEqual(num_auctions, next_day_num_auctions, "the numbers of auctions should be drawn every day")
+
+    def test_recorded_profile(self):
+        mean_num_of_auctions = np.arange(constants.num_minutes_in_day, dtype=float)
+        probabilities = np.zeros((constants.num_minutes_in_day, 2))
+        probabilities[:, 1] = 1
+        schedule = TrafficSchedule(mean_num_of_auctions=mean_num_of_auctions,
+                                   user_property_values={'Gender': np.array([3, 7])},
+                                   user_properties_probabilities={'Gender': probabilities})
+        self.assertEqual(schedule.mean_num_of_auctions_at(5), 5)
+        self.assertEqual(schedule.num_of_auctions_at(day=0, minute_in_day=0), 0)
+        self.assertListEqual(schedule.user_properties_probabilities_at(5)['Gender'].tolist(), [0, 1])
+        with self.assertRaises(Exception):
+            TrafficSchedule(mean_num_of_auctions=mean_num_of_auctions[:-1], user_property_values={},
+                            user_properties_probabilities={})
+        with self.assertRaises(Exception):
+            TrafficSchedule(mean_num_of_auctions=mean_num_of_auctions,
+                            user_property_values={'Gender': np.array([3, 7])},
+                            user_properties_probabilities={'Gender': probabilities / 2})
+
+
+if __name__ == '__main__':
+    unittest.main()